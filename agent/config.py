@@ -4,40 +4,41 @@ Loads and validates environment variables
 """
 
 import os
-from typing import Optional
+from functools import lru_cache
 from dotenv import load_dotenv
 
-# Load environment variables from .env file (local development only)
-# In production (Railway), env vars are injected directly by the platform
-load_dotenv(override=False)  # Don't override existing env vars from Railway
-
 
 class Config:
-    """Application configuration"""
+    """Application configuration (read from the environment when created; use get_config())"""
+
+    def __init__(self):
+        # Load environment variables from .env file (local development only)
+        # In production (Railway), env vars are injected directly by the platform
+        load_dotenv(override=False)  # Don't override existing env vars from Railway
 
-    # Salesforce
-    SF_USERNAME: str = os.getenv("SF_USERNAME", "")
-    SF_PASSWORD: str = os.getenv("SF_PASSWORD", "")
-    SF_SECURITY_TOKEN: str = os.getenv("SF_SECURITY_TOKEN", "")
+        # Salesforce
+        self.SF_USERNAME: str = os.getenv("SF_USERNAME", "")
+        self.SF_PASSWORD: str = os.getenv("SF_PASSWORD", "")
+        self.SF_SECURITY_TOKEN: str = os.getenv("SF_SECURITY_TOKEN", "")
 
-    # Claude API
-    ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
+        # Claude API
+        self.ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
+        self.CLAUDE_MAX_CONCURRENCY: int = int(os.getenv("CLAUDE_MAX_CONCURRENCY", 8))
 
-    # LangSmith (optional)
-    LANGCHAIN_TRACING_V2: str = os.getenv("LANGCHAIN_TRACING_V2", "false")
-    LANGCHAIN_ENDPOINT: str = os.getenv("LANGCHAIN_ENDPOINT", "https://api.smith.langchain.com")
-    LANGCHAIN_API_KEY: str = os.getenv("LANGCHAIN_API_KEY", "")
-    LANGCHAIN_PROJECT: str = os.getenv("LANGCHAIN_PROJECT", "sfdc-dedup-agent")
+        # LangSmith (optional)
+        self.LANGCHAIN_TRACING_V2: str = os.getenv("LANGCHAIN_TRACING_V2", "false")
+        self.LANGCHAIN_ENDPOINT: str = os.getenv("LANGCHAIN_ENDPOINT", "https://api.smith.langchain.com")
+        self.LANGCHAIN_API_KEY: str = os.getenv("LANGCHAIN_API_KEY", "")
+        self.LANGCHAIN_PROJECT: str = os.getenv("LANGCHAIN_PROJECT", "sfdc-dedup-agent")
 
-    # Server
-    PORT: int = int(os.getenv("PORT", 8000))
-    CORS_ORIGINS: str = os.getenv("CORS_ORIGINS", "*")
+        # Server
+        self.PORT: int = int(os.getenv("PORT", 8000))
+        self.CORS_ORIGINS: str = os.getenv("CORS_ORIGINS", "*")
 
-    # Railway
-    RAILWAY_ENVIRONMENT: str = os.getenv("RAILWAY_ENVIRONMENT", "development")
+        # Railway
+        self.RAILWAY_ENVIRONMENT: str = os.getenv("RAILWAY_ENVIRONMENT", "development")
 
-    @classmethod
-    def validate(cls) -> tuple[bool, list[str]]:
+    def validate(self) -> tuple[bool, list[str]]:
         """
         Validate required configuration
 
@@ -46,27 +47,27 @@ class Config:
         """
         missing = []
 
-        if not cls.SF_USERNAME:
+        if not self.SF_USERNAME:
             missing.append("SF_USERNAME")
-        if not cls.SF_PASSWORD:
+        if not self.SF_PASSWORD:
             missing.append("SF_PASSWORD")
-        if not cls.SF_SECURITY_TOKEN:
+        if not self.SF_SECURITY_TOKEN:
             missing.append("SF_SECURITY_TOKEN")
-        if not cls.ANTHROPIC_API_KEY:
+        if not self.ANTHROPIC_API_KEY:
             missing.append("ANTHROPIC_API_KEY")
 
         return len(missing) == 0, missing
 
-    @classmethod
-    def is_production(cls) -> bool:
+    def is_production(self) -> bool:
         """Check if running in production"""
-        return cls.RAILWAY_ENVIRONMENT == "production"
+        return self.RAILWAY_ENVIRONMENT == "production"
 
-    @classmethod
-    def langsmith_enabled(cls) -> bool:
+    def langsmith_enabled(self) -> bool:
         """Check if LangSmith is enabled"""
-        return cls.LANGCHAIN_TRACING_V2.lower() == "true" and bool(cls.LANGCHAIN_API_KEY)
+        return self.LANGCHAIN_TRACING_V2.lower() == "true" and bool(self.LANGCHAIN_API_KEY)
 
 
-# Global config instance
-config = Config()
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    """Return the process-wide Config, loading .env and reading it on first call"""
+    return Config()
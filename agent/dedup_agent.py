@@ -3,18 +3,63 @@ SFDC Deduplication Agent - Workflow Runner
 Adapted from sfdc_agent.py to work with FastAPI job management
 """
 
-import json
+import asyncio
+import io
 import os
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import chain
 from pathlib import Path
-from anthropic import Anthropic
+import orjson
+from anthropic import AsyncAnthropic
 
 from agent import tools
-from agent.config import config
+from agent.config import get_config
 from agent.langsmith_wrapper import save_cost_report, get_cost_summary
 
-
-def run_agent_workflow(job_id: str, job_config: dict, job_manager=None):
+# Characters that are unsafe in report filenames
+_SAFE_NAME_TRANS = str.maketrans({c: "_" for c in ' /\\:*?"<>|'})
+
+# One Claude client reused across jobs so its connection pool stays warm. The
+# pool is bound to the loop it runs on, so the client lives on its own loop in
+# a daemon thread and every job's duplicate detection is submitted there
+# (which also keeps that CPU-bound prep off the API loop).
+_claude_loop = None
+_claude_thread = None
+_claude_client = None
+_claude_lock = threading.Lock()
+
+
+def _get_claude_runtime():
+    """The shared Claude loop and client, started on first use"""
+    global _claude_loop, _claude_thread, _claude_client
+    with _claude_lock:
+        if _claude_loop is None:
+            _claude_loop = asyncio.new_event_loop()
+            _claude_thread = threading.Thread(target=_claude_loop.run_forever, name="claude-loop", daemon=True)
+            _claude_thread.start()
+            _claude_client = AsyncAnthropic(api_key=get_config().ANTHROPIC_API_KEY, max_retries=3)
+        return _claude_loop, _claude_client
+
+
+def close_claude_client():
+    """Close the shared Claude client and stop its loop (call once on shutdown)"""
+    global _claude_loop, _claude_thread, _claude_client
+    with _claude_lock:
+        if _claude_loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(_claude_client.close(), _claude_loop).result()
+        finally:
+            _claude_loop.call_soon_threadsafe(_claude_loop.stop)
+            _claude_thread.join()
+            _claude_loop.close()
+            _claude_loop = _claude_thread = _claude_client = None
+
+
+def run_agent_workflow(job_id: str, job_config: dict, job_manager=None, loop=None):
     """
     Run the full agent workflow.
     This is called from FastAPI in a background thread.
@@ -23,13 +68,15 @@ def run_agent_workflow(job_id: str, job_config: dict, job_manager=None):
         job_id: Unique job identifier
         job_config: Job configuration from API request
         job_manager: JobManager instance for progress updates (optional)
+        loop: Event loop that owns job_manager (the FastAPI loop). Updates are
+              dispatched onto it from this worker thread. If omitted, updates
+              run on the worker's private loop.
 
     Returns:
         dict: Results including metrics and cost summary
     """
 
     # Initialize
-    claude_client = Anthropic(api_key=config.ANTHROPIC_API_KEY)
     sf_connection = None
     batch_size = job_config.get("batch_size")
     auto_approve = job_config.get("auto_approve", False)
@@ -46,14 +93,22 @@ def run_agent_workflow(job_id: str, job_config: dict, job_manager=None):
         "errors": []
     }
 
+    # Without an API loop, progress updates run on a private loop for this run
+    own_loop = loop is None
+    if own_loop:
+        loop = asyncio.new_event_loop()
+
+    def run_on_loop(coro):
+        """Run a JobManager coroutine on the loop that owns it"""
+        if own_loop:
+            return loop.run_until_complete(coro)
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
     def update_progress(phase: str, step: int, message: str):
         """Helper to update job progress"""
         if job_manager:
-            import asyncio
             try:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(
+                run_on_loop(
                     job_manager.update_job(job_id, {
                         "progress": {
                             "phase": phase,
@@ -63,20 +118,15 @@ def run_agent_workflow(job_id: str, job_config: dict, job_manager=None):
                         }
                     })
                 )
-                loop.close()
             except Exception as e:
                 print(f"Error updating progress: {e}")
 
     def save_phase_details(phase: str, details: dict):
         """Save detailed data for a completed phase"""
         if job_manager:
-            import asyncio
             try:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-
                 # Get current job state
-                job = loop.run_until_complete(job_manager.get_job(job_id))
+                job = run_on_loop(job_manager.get_job(job_id))
                 if job:
                     phase_details = job.get("phase_details", {})
                     phase_details[phase] = {
@@ -84,13 +134,11 @@ def run_agent_workflow(job_id: str, job_config: dict, job_manager=None):
                         "timestamp": datetime.now().isoformat()
                     }
 
-                    loop.run_until_complete(
+                    run_on_loop(
                         job_manager.update_job(job_id, {
                             "phase_details": phase_details
                         })
                     )
-
-                loop.close()
             except Exception as e:
                 print(f"Error saving phase details: {e}")
 
@@ -110,7 +158,7 @@ def run_agent_workflow(job_id: str, job_config: dict, job_manager=None):
             "status": "success",
             "message": "Connected to Salesforce successfully",
             "org_info": {
-                "username": config.SF_USERNAME.split('@')[0] + "@***",  # Partial mask
+                "username": get_config().SF_USERNAME.split('@')[0] + "@***",  # Partial mask
                 "instance": str(sf_connection.sf_instance) if hasattr(sf_connection, 'sf_instance') else "unknown"
             }
         })
@@ -171,8 +219,7 @@ def run_agent_workflow(job_id: str, job_config: dict, job_manager=None):
         # PHASE 3: Email Validation
         update_progress("phase_3_validate", 3, f"📧 Validating {metrics['total_contacts']} email addresses...")
 
-        contact_ids = list(contacts_dict.keys())
-        activities = tools.extract_email_activities(sf_connection, contact_ids)
+        activities = tools.extract_email_activities(sf_connection, contacts_dict.keys())
 
         validation_result = tools.validate_emails(
             extraction_result['all_contacts'],
@@ -203,25 +250,35 @@ def run_agent_workflow(job_id: str, job_config: dict, job_manager=None):
         # PHASE 4: Duplicate Detection
         update_progress("phase_4_detect", 4, f"🔍 Analyzing {metrics['total_contacts']} contacts for potential duplicates...")
 
-        all_duplicate_pairs = []
         duplicates_by_owner = {}
 
-        for owner_id, owner_contacts in extraction_result["contacts_by_owner"].items():
+        # Owners are independent, so analyze them concurrently on the shared Claude loop
+        claude_loop, claude_client = _get_claude_runtime()
+        owner_results = asyncio.run_coroutine_threadsafe(_detect_duplicates_all_owners(
+            extraction_result["contacts_by_owner"],
+            claude_client,
+            get_config().CLAUDE_MAX_CONCURRENCY
+        ), claude_loop).result()
+
+        for owner_id, dup_result in owner_results.items():
             owner_name = extraction_result["owner_metadata"][owner_id]["owner_name"]
 
-            dup_result = tools.detect_duplicates_for_owner(
-                owner_id,
-                owner_contacts,
-                claude_client
-            )
+            if isinstance(dup_result, Exception):
+                print(f"[ERROR] Duplicate detection failed for {owner_name}: {dup_result}")
+                metrics["errors"].append(f"{owner_name}: {dup_result}")
+                continue
 
             if dup_result["total_pairs"] > 0:
-                all_duplicate_pairs.extend(dup_result["duplicate_pairs"])
                 duplicates_by_owner[owner_id] = {
                     "owner_name": owner_name,
                     "duplicate_pairs": dup_result["duplicate_pairs"]
                 }
 
+        # Flatten once; the full list is also persisted in phase details below
+        all_duplicate_pairs = list(chain.from_iterable(
+            owner_data["duplicate_pairs"] for owner_data in duplicates_by_owner.values()
+        ))
+
         metrics["duplicates_found"] = len(all_duplicate_pairs)
 
         # Show what we found
@@ -250,44 +307,30 @@ def run_agent_workflow(job_id: str, job_config: dict, job_manager=None):
         })
 
         # PHASE 5: Prepare Duplicate Marking
-        if len(all_duplicate_pairs) > 0:
-            update_progress("phase_5_mark", 5, f"📝 Preparing to mark {len(all_duplicate_pairs)} duplicate pair(s)...")
-
         marking_result = None
         all_updates = validation_result['updates']
 
-        if len(all_duplicate_pairs) > 0:
+        if all_duplicate_pairs:
+            update_progress("phase_5_mark", 5, f"📝 Preparing to mark {len(all_duplicate_pairs)} duplicate pair(s)...")
+
             marking_result = tools.mark_duplicates_for_review(
                 all_duplicate_pairs,
                 contacts_dict
             )
 
-            # If not auto_approve, wait for human approval
-            if not auto_approve and job_manager:
+            # If not auto_approve, wait for human approval (nothing to approve if no pair resolved)
+            if not auto_approve and job_manager and marking_result['updates']:
                 update_progress("awaiting_approval", 5,
                     f"⏸️ Pausing for your approval\n" +
                     f"I found {len(all_duplicate_pairs)} duplicate pair(s) - want me to mark them?")
 
-                import asyncio
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-
-                # Store pending approval in job state
-                loop.run_until_complete(
-                    job_manager.update_job(job_id, {
-                        "status": "awaiting_approval",
-                        "pending_approval": {
-                            "stage": "duplicate_marking",
-                            "total_updates": marking_result["total_updates"],
-                            "decisions": marking_result["decisions"],
-                            "message": f"Ready to mark {marking_result['total_updates']} contacts as duplicates"
-                        }
-                    })
-                )
-
-                # Wait for approval
-                approved = wait_for_approval(job_id, job_manager, loop)
-                loop.close()
+                # Store pending approval in job state and wait for it
+                approved = wait_for_approval(job_id, job_manager, run_on_loop, {
+                    "stage": "duplicate_marking",
+                    "total_updates": marking_result["total_updates"],
+                    "decisions": marking_result["decisions"],
+                    "message": f"Ready to mark {marking_result['total_updates']} contacts as duplicates"
+                })
 
                 if not approved:
                     return {
@@ -296,32 +339,23 @@ def run_agent_workflow(job_id: str, job_config: dict, job_manager=None):
                         "metrics": metrics
                     }
 
-            # Add duplicate marking updates
-            all_updates.extend(marking_result['updates'])
+            # Add duplicate marking updates (marking wins for contacts in both)
+            all_updates = tools.merge_updates_by_id(all_updates, marking_result['updates'])
 
-        # PHASE 6: Update Salesforce
-        if len(all_updates) > 0:
+        # PHASE 6: Update Salesforce (skipping updates a previous run already applied)
+        if all_updates:
+            all_updates = tools.filter_changed_updates(sf_connection, all_updates)
+
+        if all_updates:
             update_progress("phase_6_update", 6, f"💾 Ready to update {len(all_updates)} contact(s) in Salesforce...")
 
             # If not auto_approve, wait for final approval
             if not auto_approve and job_manager:
-                import asyncio
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-
-                loop.run_until_complete(
-                    job_manager.update_job(job_id, {
-                        "status": "awaiting_approval",
-                        "pending_approval": {
-                            "stage": "salesforce_update",
-                            "total_updates": len(all_updates),
-                            "message": f"Ready to update {len(all_updates)} contacts in Salesforce"
-                        }
-                    })
-                )
-
-                approved = wait_for_approval(job_id, job_manager, loop)
-                loop.close()
+                approved = wait_for_approval(job_id, job_manager, run_on_loop, {
+                    "stage": "salesforce_update",
+                    "total_updates": len(all_updates),
+                    "message": f"Ready to update {len(all_updates)} contacts in Salesforce"
+                })
 
                 if not approved:
                     update_progress("phase_6_update", 6, "❌ Update cancelled by user")
@@ -347,12 +381,16 @@ def run_agent_workflow(job_id: str, job_config: dict, job_manager=None):
         # PHASE 7: Generate Reports
         update_progress("phase_7_reports", 7, "📄 Generating reports...")
 
-        if len(all_duplicate_pairs) > 0:
+        # One timestamp shared by every report from this run
+        generated_at = datetime.now()
+
+        # Skip owner reports when no pair produced a decision
+        if duplicates_by_owner and marking_result and marking_result["decisions"]:
             _generate_owner_reports(
                 duplicates_by_owner,
-                contacts_dict,
                 marking_result,
-                output_dir
+                output_dir,
+                generated_at.strftime('%Y-%m-%d %H:%M:%S')
             )
 
         _generate_master_summary(
@@ -360,7 +398,8 @@ def run_agent_workflow(job_id: str, job_config: dict, job_manager=None):
             validation_result,
             marking_result if len(all_duplicate_pairs) > 0 else None,
             metrics,
-            output_dir
+            output_dir,
+            generated_at.isoformat()
         )
 
         # Save cost report
@@ -388,96 +427,160 @@ def run_agent_workflow(job_id: str, job_config: dict, job_manager=None):
         metrics["errors"].append(str(e))
         raise
 
+    finally:
+        if own_loop:
+            loop.close()
+
 
-def wait_for_approval(job_id: str, job_manager, loop, timeout=3600):
+async def _detect_duplicates_all_owners(contacts_by_owner, claude_client, max_concurrency):
+    """
+    Run duplicate detection for every owner (and every account) concurrently.
+    One semaphore shared by all Claude calls keeps us under rate limits.
+
+    Returns:
+        dict: owner_id -> detection result, or the exception that owner raised
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    owner_ids = list(contacts_by_owner)
+    results = await asyncio.gather(
+        *(
+            tools.detect_duplicates_for_owner_async(
+                owner_id,
+                contacts_by_owner[owner_id],
+                claude_client,
+                semaphore
+            )
+            for owner_id in owner_ids
+        ),
+        return_exceptions=True
+    )
+    return dict(zip(owner_ids, results))
+
+
+def wait_for_approval(job_id: str, job_manager, run_on_loop, pending: dict, timeout=3600):
     """
     Wait for user approval via API.
-    Polls job state for approval decision.
+    Publishes the pending approval and blocks on the job's approval event
+    in a single round-trip to the JobManager loop.
 
     Args:
         job_id: Job ID
         job_manager: JobManager instance
-        loop: asyncio event loop
+        run_on_loop: Callable that runs a JobManager coroutine to completion
+        pending: Pending approval payload shown to the user
         timeout: Timeout in seconds (default 1 hour)
 
     Returns:
         bool: True if approved, False if rejected
     """
-    import time
+    decision = run_on_loop(job_manager.await_approval(job_id, pending, timeout))
 
-    start_time = time.time()
+    # Timeout - reject by default
+    if not decision:
+        return False
 
-    while time.time() - start_time < timeout:
-        # Check for approval decision
-        job = loop.run_until_complete(job_manager.get_job(job_id))
+    return decision.get("approved", False)
 
-        if job and job.get("approval_decision"):
-            decision = job["approval_decision"]
-            return decision.get("approved", False)
 
-        # Poll every 2 seconds
-        time.sleep(2)
+def _generate_owner_reports(duplicates_by_owner, marking_result, output_dir, generated_at):
+    """Generate Markdown report for each Account Owner"""
 
-    # Timeout - reject by default
-    return False
+    # Group decisions by the owner tag carried from detection
+    decisions_by_owner = defaultdict(list)
+    for d in marking_result["decisions"]:
+        decisions_by_owner[d['owner_id']].append(d)
 
+    # Resolve the output directory once; each report is then opened relative to it
+    dir_fd = None
+    if os.open in os.supports_dir_fd:
+        dir_fd = os.open(output_dir, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
 
-def _generate_owner_reports(duplicates_by_owner, contacts_dict, marking_result, output_dir):
-    """Generate Markdown report for each Account Owner"""
+    try:
+        # Reports are independent files, so overlap their writes
+        with ThreadPoolExecutor(max_workers=min(8, len(duplicates_by_owner)) or 1) as executor:
+            futures = [
+                executor.submit(
+                    _write_owner_report,
+                    owner_data,
+                    decisions_by_owner.get(owner_id, []),
+                    output_dir,
+                    generated_at,
+                    dir_fd
+                )
+                for owner_id, owner_data in duplicates_by_owner.items()
+            ]
+            for future in futures:
+                future.result()
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
 
-    for owner_id, owner_data in duplicates_by_owner.items():
-        owner_name = owner_data["owner_name"]
-        safe_name = owner_name.replace(" ", "_").replace("/", "_")
-        report_file = output_dir / f"{safe_name}_duplicates.md"
-
-        report = []
-        report.append(f"# Duplicate Contacts Report - {owner_name}")
-        report.append(f"\nGenerated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        report.append(f"\nTotal Duplicate Groups: {len(owner_data['duplicate_pairs'])}")
-        report.append("\n---\n")
-
-        # Find decisions for this owner
-        owner_decisions = [
-            d for d in marking_result["decisions"]
-            if any(
-                contacts_dict.get(d['contact_1']['id'], {}).get('AccountOwnerId') == owner_id
-                for d in marking_result["decisions"]
-            )
-        ]
-
-        for idx, decision in enumerate(owner_decisions, 1):
-            report.append(f"## Duplicate Group {idx}: {decision['canonical_name']}")
-            report.append(f"\n**Account:** {decision['account_name']}")
-            report.append(f"**Confidence:** {decision['confidence'].upper()}")
-            report.append(f"\n**AI Reasoning:** {decision['reasoning']}")
-            report.append("\n### Side-by-Side Comparison\n")
-
-            # Contact A
-            report.append("| Field | Contact A | Contact B |")
-            report.append("|-------|-----------|-----------|")
-            report.append(f"| Name | {decision['contact_1']['name']} | {decision['contact_2']['name']} |")
-            report.append(f"| Email | {decision['contact_1']['email']} | {decision['contact_2']['email']} |")
-            report.append(f"| Phone | {decision['contact_1']['phone']} | {decision['contact_2']['phone']} |")
-            report.append(f"| Title | {decision['contact_1']['title']} | {decision['contact_2']['title']} |")
-            report.append(f"| Suggested Action | **{decision['contact_1']['suggested_action']}** | **{decision['contact_2']['suggested_action']}** |")
-            report.append(f"| Justification | {decision['contact_1']['justification']} | {decision['contact_2']['justification']} |")
-
-            report.append("\n### Review Instructions\n")
-            report.append("1. Review both contacts in Salesforce")
-            report.append("2. Verify the suggested action is correct")
-            report.append("3. Update `Suggested_Action__c` field if needed")
-            report.append("4. Check `Duplicate_Reviewed__c` checkbox to mark as reviewed")
-            report.append("\n---\n")
-
-        with open(report_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(report))
-
-
-def _generate_master_summary(extraction_result, validation_result, marking_result, metrics, output_dir):
+
+def _write_owner_report(owner_data, owner_decisions, output_dir, generated_at, dir_fd=None):
+    """Render and write one owner's Markdown report (relative to dir_fd when given)"""
+    owner_name = owner_data["owner_name"]
+    safe_name = owner_name.translate(_SAFE_NAME_TRANS)
+    report_name = f"{safe_name}_duplicates.md"
+
+    buf = io.StringIO()
+    buf.write(f"""# Duplicate Contacts Report - {owner_name}
+
+Generated: {generated_at}
+
+Total Duplicate Groups: {len(owner_data['duplicate_pairs'])}
+
+---
+""")
+
+    for idx, decision in enumerate(owner_decisions, 1):
+        c1 = decision['contact_1']
+        c2 = decision['contact_2']
+        buf.write(f"""
+## Duplicate Group {idx}: {decision['canonical_name']}
+
+**Account:** {decision['account_name']}
+**Confidence:** {decision['confidence'].upper()}
+
+**AI Reasoning:** {decision['reasoning']}
+
+### Side-by-Side Comparison
+
+| Field | Contact A | Contact B |
+|-------|-----------|-----------|
+| Name | {c1['name']} | {c2['name']} |
+| Email | {c1['email']} | {c2['email']} |
+| Phone | {c1['phone']} | {c2['phone']} |
+| Title | {c1['title']} | {c2['title']} |
+| Suggested Action | **{c1['suggested_action']}** | **{c2['suggested_action']}** |
+| Justification | {c1['justification']} | {c2['justification']} |
+
+### Review Instructions
+
+1. Review both contacts in Salesforce
+2. Verify the suggested action is correct
+3. Update `Suggested_Action__c` field if needed
+4. Check `Duplicate_Reviewed__c` checkbox to mark as reviewed
+
+---
+""")
+
+    # Encode once and hand the whole report to os.write (no text-layer buffering)
+    data = memoryview(buf.getvalue().encode('utf-8'))
+    report_file = report_name if dir_fd is not None else output_dir / report_name
+    fd = os.open(report_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644, dir_fd=dir_fd)
+    try:
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+
+def _generate_master_summary(extraction_result, validation_result, marking_result, metrics, output_dir, generated_at):
     """Generate master summary JSON"""
 
     summary = {
-        "generated_at": datetime.now().isoformat(),
+        "generated_at": generated_at,
         "metrics": metrics,
         "account_owners": extraction_result["owner_metadata"],
         "email_validation_stats": validation_result["stats"],
@@ -488,16 +591,13 @@ def _generate_master_summary(extraction_result, validation_result, marking_resul
     }
 
     summary_file = output_dir / "master_summary.json"
-    with open(summary_file, 'w') as f:
-        json.dump(summary, f, indent=2, default=str)
+    summary_file.write_bytes(orjson.dumps(summary, option=orjson.OPT_INDENT_2, default=str))
 
 
 def _count_by_confidence(decisions):
     """Count duplicate pairs by confidence level"""
     counts = {"high": 0, "medium": 0, "low": 0}
-    for decision in decisions:
-        confidence = decision.get("confidence", "low").lower()
-        counts[confidence] = counts.get(confidence, 0) + 1
+    counts.update(Counter(decision.get("confidence", "low").lower() for decision in decisions))
     return counts
 
 
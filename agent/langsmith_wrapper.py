@@ -3,11 +3,15 @@ LangSmith Observability Wrapper
 Instruments all Claude API calls with cost tracking, QA validation, and performance monitoring
 """
 
+import asyncio
 import os
-import json
+import re
+import threading
+import time
+import orjson
 from datetime import datetime
 from functools import wraps
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List, Tuple
 from langsmith import Client, traceable
 from langsmith.run_helpers import get_current_run_tree
 from dotenv import load_dotenv
@@ -33,36 +37,64 @@ CLAUDE_PRICING = {
 }
 
 
-class CostTracker:
-    """Track costs across all Claude API calls"""
+class _CostTally:
+    """One thread's share of the cost totals"""
+
+    __slots__ = ("input_tokens", "output_tokens", "cost", "calls_by_phase")
 
     def __init__(self):
-        self.total_input_tokens = 0
-        self.total_output_tokens = 0
-        self.total_cost = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
         self.calls_by_phase = {
             "duplicate_detection": {"count": 0, "cost": 0.0, "tokens": 0},
             "email_validation": {"count": 0, "cost": 0.0, "tokens": 0},
             "other": {"count": 0, "cost": 0.0, "tokens": 0}
         }
-        self.start_time = datetime.now()
 
-    def track_call(self, model: str, input_tokens: int, output_tokens: int, phase: str = "other"):
-        """Track a single API call"""
+
+class CostTracker:
+    """
+    Track costs across all Claude API calls.
+    Each thread adds to its own tally, so concurrent calls never race on a
+    shared counter; get_summary() sums the tallies.
+    """
+
+    __slots__ = ("start_time", "_local", "_tallies", "_tallies_lock")
+
+    def __init__(self):
+        self.start_time = datetime.now()
+        self._local = threading.local()
+        self._tallies = []
+        self._tallies_lock = threading.Lock()
+
+    def _tally(self) -> _CostTally:
+        """This thread's tally, registered on its first call"""
+        tally = getattr(self._local, "tally", None)
+        if tally is None:
+            tally = self._local.tally = _CostTally()
+            with self._tallies_lock:
+                self._tallies.append(tally)
+        return tally
+
+    def track_call(self, model: str, input_tokens: int, output_tokens: int, phase: str = "other",
+                   price_multiplier: float = 1.0):
+        """Track a single API call (price_multiplier=0.5 for Message Batches requests)"""
         pricing = CLAUDE_PRICING.get(model, CLAUDE_PRICING["claude-3-5-haiku-20241022"])
 
         input_cost = input_tokens * pricing["input"]
         output_cost = output_tokens * pricing["output"]
-        total_call_cost = input_cost + output_cost
+        total_call_cost = (input_cost + output_cost) * price_multiplier
 
-        self.total_input_tokens += input_tokens
-        self.total_output_tokens += output_tokens
-        self.total_cost += total_call_cost
+        tally = self._tally()
+        tally.input_tokens += input_tokens
+        tally.output_tokens += output_tokens
+        tally.cost += total_call_cost
 
-        if phase in self.calls_by_phase:
-            self.calls_by_phase[phase]["count"] += 1
-            self.calls_by_phase[phase]["cost"] += total_call_cost
-            self.calls_by_phase[phase]["tokens"] += (input_tokens + output_tokens)
+        if phase in tally.calls_by_phase:
+            tally.calls_by_phase[phase]["count"] += 1
+            tally.calls_by_phase[phase]["cost"] += total_call_cost
+            tally.calls_by_phase[phase]["tokens"] += (input_tokens + output_tokens)
 
         return total_call_cost
 
@@ -70,14 +102,26 @@ class CostTracker:
         """Get cost summary"""
         runtime = (datetime.now() - self.start_time).total_seconds()
 
+        with self._tallies_lock:
+            tallies = list(self._tallies)
+
+        total = _CostTally()
+        for tally in tallies:
+            total.input_tokens += tally.input_tokens
+            total.output_tokens += tally.output_tokens
+            total.cost += tally.cost
+            for phase, stats in tally.calls_by_phase.items():
+                for key, value in stats.items():
+                    total.calls_by_phase[phase][key] += value
+
         return {
-            "total_cost": round(self.total_cost, 4),
-            "total_input_tokens": self.total_input_tokens,
-            "total_output_tokens": self.total_output_tokens,
-            "total_tokens": self.total_input_tokens + self.total_output_tokens,
+            "total_cost": round(total.cost, 4),
+            "total_input_tokens": total.input_tokens,
+            "total_output_tokens": total.output_tokens,
+            "total_tokens": total.input_tokens + total.output_tokens,
             "runtime_seconds": round(runtime, 2),
-            "calls_by_phase": self.calls_by_phase,
-            "cost_per_minute": round((self.total_cost / runtime) * 60, 4) if runtime > 0 else 0
+            "calls_by_phase": total.calls_by_phase,
+            "cost_per_minute": round((total.cost / runtime) * 60, 4) if runtime > 0 else 0
         }
 
 
@@ -85,29 +129,9 @@ class CostTracker:
 cost_tracker = CostTracker()
 
 
-@traceable(name="detect_duplicates_claude", tags=["duplicate-detection", "ai"])
-def traced_duplicate_detection(owner_id: str, owner_name: str, formatted_contacts: List[Dict],
-                                 claude_client, account_name: str) -> Dict[str, Any]:
-    """
-    Wrapped duplicate detection with LangSmith tracing.
-    Captures inputs, outputs, costs, and metadata.
-    """
-    # Log inputs
-    run = get_current_run_tree()
-    if run:
-        run.add_metadata({
-            "owner_id": owner_id,
-            "owner_name": owner_name,
-            "account_name": account_name,
-            "contact_count": len(formatted_contacts),
-            "phase": "duplicate_detection"
-        })
-
-    prompt = f"""You are analyzing contacts from the Salesforce account "{account_name}" to identify DUPLICATE RECORDS OF THE SAME PERSON.
-
-Here are the contacts:
-
-{json.dumps(formatted_contacts, indent=2)}
+# Static duplicate-detection rubric, sent as the system prompt. It is well under
+# Haiku's 2048-token minimum for prompt caching, so it is not marked cacheable.
+_DUPLICATE_RUBRIC = """You identify DUPLICATE RECORDS OF THE SAME PERSON among the contacts of a single Salesforce account.
 
 CRITICAL: Only flag contacts as duplicates if they are likely THE SAME PERSON with multiple records.
 
@@ -129,55 +153,209 @@ For each potential duplicate pair you find, provide:
 - confidence: "high", "medium", or "low"
 - reasoning: Why you think they're THE SAME PERSON (be specific)
 
-Return your response as a JSON array of duplicate pairs. If no duplicates found, return an empty array.
+IMPORTANT: Return ONLY JSON in the format requested, no additional text."""
 
-IMPORTANT: Return ONLY the JSON array, no additional text."""
+# Per-account parts of the prompt, built once at import
+_DUPLICATE_PROMPT_HEAD = 'Salesforce account: "'
+_DUPLICATE_PROMPT_MID = '"\n\nHere are the contacts:\n\n'
+_DUPLICATE_PROMPT_TAIL = (
+    "\n\nReturn your response as a JSON array of duplicate pairs. "
+    "If no duplicates found, return an empty array."
+)
 
-    # Make Claude API call
-    response = claude_client.messages.create(
-        model="claude-3-5-haiku-20241022",
-        max_tokens=2000,
-        messages=[{"role": "user", "content": prompt}]
-    )
+# Several small accounts marshaled into one prompt, one <account> block each
+_MULTI_ACCOUNT_PROMPT_HEAD = (
+    "Contacts from several Salesforce accounts follow, one <account> block per account. "
+    "Only compare contacts within the same account.\n\n"
+)
+_MULTI_ACCOUNT_PROMPT_TAIL = (
+    'Return your response as a JSON array with one object per account: '
+    '{"account_id": "<id from the account tag>", "duplicates": [<duplicate pairs>]}. '
+    'Use an empty duplicates array for accounts without duplicates.'
+)
+
+# A pack is one Claude request's worth of accounts: (account_id, account_name, formatted_contacts)
+AccountPack = List[Tuple[str, str, List[Dict]]]
+
+
+def _build_duplicate_prompt(account_name: str, formatted_contacts: List[Dict]) -> str:
+    """Build the per-account part of the duplicate-detection prompt"""
+    return "".join((
+        _DUPLICATE_PROMPT_HEAD,
+        account_name,
+        _DUPLICATE_PROMPT_MID,
+        orjson.dumps(formatted_contacts, option=orjson.OPT_INDENT_2).decode(),
+        _DUPLICATE_PROMPT_TAIL
+    ))
+
+
+def _build_multi_account_prompt(accounts: AccountPack) -> str:
+    """Build the user prompt for a pack of several accounts"""
+    parts = [_MULTI_ACCOUNT_PROMPT_HEAD]
+    for account_id, account_name, formatted_contacts in accounts:
+        parts.append(f'<account id="{account_id}">\nAccount name: {account_name}\n')
+        parts.append(orjson.dumps(formatted_contacts, option=orjson.OPT_INDENT_2).decode())
+        parts.append("\n</account>\n\n")
+    parts.append(_MULTI_ACCOUNT_PROMPT_TAIL)
+    return "".join(parts)
+
+
+def _duplicate_request_params(account_name: str, formatted_contacts: List[Dict]) -> Dict[str, Any]:
+    """Messages API parameters for one account's duplicate-detection call"""
+    return {
+        "model": "claude-3-5-haiku-20241022",
+        "max_tokens": 2000,
+        "system": _DUPLICATE_RUBRIC,
+        "messages": [{"role": "user", "content": _build_duplicate_prompt(account_name, formatted_contacts)}]
+    }
+
+
+def _pack_request_params(accounts: AccountPack) -> Dict[str, Any]:
+    """Messages API parameters for a pack (single-account packs use the plain prompt)"""
+    if len(accounts) == 1:
+        _, account_name, formatted_contacts = accounts[0]
+        return _duplicate_request_params(account_name, formatted_contacts)
+    return {
+        "model": "claude-3-5-haiku-20241022",
+        "max_tokens": 2000,
+        "system": _DUPLICATE_RUBRIC,
+        "messages": [{"role": "user", "content": _build_multi_account_prompt(accounts)}]
+    }
+
+
+class _AsyncRateLimiter:
+    """
+    Leaky-bucket limiter allowing max_rate units per period seconds.
+    acquire(amount) waits until the bucket has room for amount units.
+    Safe to share between event loops on different threads (one per API job).
+    """
+
+    __slots__ = ("max_rate", "period", "_rate_per_sec", "_level", "_last_check", "_lock")
+
+    def __init__(self, max_rate: float, period: float = 60.0):
+        self.max_rate = max_rate
+        self.period = period
+        self._rate_per_sec = max_rate / period
+        self._level = 0.0
+        self._last_check = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _leak(self):
+        now = time.monotonic()
+        self._level = max(self._level - (now - self._last_check) * self._rate_per_sec, 0.0)
+        self._last_check = now
+
+    async def acquire(self, amount: float = 1):
+        # A single request larger than the bucket still has to go through eventually
+        amount = min(amount, self.max_rate)
+        while True:
+            with self._lock:
+                self._leak()
+                if self._level + amount <= self.max_rate:
+                    self._level += amount
+                    return
+                wait = (self._level + amount - self.max_rate) / self._rate_per_sec
+            await asyncio.sleep(wait)
+
+
+# Client-side throttle for async Claude calls, kept at 95% of the account's
+# requests/input-tokens per minute quota (0 disables a limiter)
+_RATE_LIMIT_HEADROOM = 0.95
+_CLAUDE_RPM = int(os.getenv("CLAUDE_RPM", "50"))
+_CLAUDE_TPM = int(os.getenv("CLAUDE_TPM", "50000"))
+rpm_limiter = _AsyncRateLimiter(_CLAUDE_RPM * _RATE_LIMIT_HEADROOM, 60) if _CLAUDE_RPM > 0 else None
+tpm_limiter = _AsyncRateLimiter(_CLAUDE_TPM * _RATE_LIMIT_HEADROOM, 60) if _CLAUDE_TPM > 0 else None
+
+# Rough input-token estimate for a duplicate-detection request (~4 chars/token)
+_RUBRIC_TOKEN_ESTIMATE = len(_DUPLICATE_RUBRIC) // 4
+_TOKENS_PER_CONTACT_ESTIMATE = 120
+
+
+async def _throttle_duplicate_detection(contact_count: int):
+    """Wait for token and request budget before a duplicate-detection call"""
+    if tpm_limiter:
+        await tpm_limiter.acquire(_RUBRIC_TOKEN_ESTIMATE + contact_count * _TOKENS_PER_CONTACT_ESTIMATE)
+    if rpm_limiter:
+        await rpm_limiter.acquire()
+
+
+def _log_duplicate_detection_inputs(owner_id: str, owner_name: str, account_name: str,
+                                    formatted_contacts: List[Dict]):
+    """Attach input metadata to the current LangSmith run (if any) and return it"""
+    run = get_current_run_tree()
+    if run:
+        run.add_metadata({
+            "owner_id": owner_id,
+            "owner_name": owner_name,
+            "account_name": account_name,
+            "contact_count": len(formatted_contacts),
+            "phase": "duplicate_detection"
+        })
+    return run
 
-    # Track costs
-    input_tokens = response.usage.input_tokens
-    output_tokens = response.usage.output_tokens
+
+def _track_duplicate_usage(response, price_multiplier: float = 1.0) -> Dict[str, Any]:
+    """Record a duplicate-detection call's token usage and cost"""
+    usage = response.usage
     call_cost = cost_tracker.track_call(
         "claude-3-5-haiku-20241022",
-        input_tokens,
-        output_tokens,
-        phase="duplicate_detection"
+        usage.input_tokens,
+        usage.output_tokens,
+        phase="duplicate_detection",
+        price_multiplier=price_multiplier
     )
+    return {
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+        "cost": call_cost,
+        "model": "claude-3-5-haiku-20241022"
+    }
 
-    # Parse response
-    response_text = response.content[0].text.strip()
 
-    duplicates = []
+def _parse_json_array(response, run, streamed_items: List[Dict] = None) -> List:
+    """
+    Parse the JSON array in Claude's response text.
+    If streamed_items is given (objects already parsed while streaming), the
+    response text is only re-parsed when streaming produced nothing.
+    """
+    if streamed_items:
+        return streamed_items
+
+    response_text = response.content[0].text.strip()
     try:
         if response_text.startswith('['):
-            duplicates = json.loads(response_text)
-        else:
-            start_idx = response_text.find('[')
-            end_idx = response_text.rfind(']') + 1
-            if start_idx != -1 and end_idx > start_idx:
-                json_str = response_text[start_idx:end_idx]
-                duplicates = json.loads(json_str)
-    except json.JSONDecodeError as e:
+            return orjson.loads(response_text)
+        start_idx = response_text.find('[')
+        end_idx = response_text.rfind(']') + 1
+        if start_idx != -1 and end_idx > start_idx:
+            return orjson.loads(response_text[start_idx:end_idx])
+    except orjson.JSONDecodeError as e:
         # Log parse error
         if run:
             run.add_metadata({"parse_error": str(e), "raw_response": response_text[:500]})
+    return []
+
 
-    # Add metadata to run
+def _add_usage_metadata(run, usage: Dict[str, Any], duplicates_found: int):
+    """Record a call's token usage and cost on the run (if any)"""
     if run:
         run.add_metadata({
-            "duplicates_found": len(duplicates),
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "call_cost_usd": round(call_cost, 6),
-            "model": "claude-3-5-haiku-20241022"
+            "duplicates_found": duplicates_found,
+            "input_tokens": usage["input_tokens"],
+            "output_tokens": usage["output_tokens"],
+            "call_cost_usd": round(usage["cost"], 6),
+            "model": usage["model"]
         })
 
+
+def _process_duplicate_response(response, run, streamed_pairs: List[Dict] = None,
+                                price_multiplier: float = 1.0) -> Dict[str, Any]:
+    """Track cost, parse Claude's JSON array of pairs and record outputs on the run"""
+    usage = _track_duplicate_usage(response, price_multiplier)
+    duplicates = _parse_json_array(response, run, streamed_pairs)
+
+    _add_usage_metadata(run, usage, len(duplicates))
+    if run:
         # Add output validation
         run.add_outputs({
             "duplicates": duplicates,
@@ -188,14 +366,281 @@ IMPORTANT: Return ONLY the JSON array, no additional text."""
     return {
         "duplicates": duplicates,
         "metadata": {
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "cost": call_cost,
-            "model": "claude-3-5-haiku-20241022"
+            "input_tokens": usage["input_tokens"],
+            "output_tokens": usage["output_tokens"],
+            "cost": usage["cost"],
+            "model": usage["model"]
         }
     }
 
 
+def _process_multi_account_response(response, run, accounts: AccountPack, streamed_items: List[Dict] = None,
+                                    price_multiplier: float = 1.0) -> Dict[str, Dict[str, Any]]:
+    """
+    Track cost and split a multi-account response back into per-account results.
+    Accounts Claude left out of its answer get an empty duplicates list.
+    """
+    usage = _track_duplicate_usage(response, price_multiplier)
+    items = _parse_json_array(response, run, streamed_items)
+
+    duplicates_by_account = {
+        item.get("account_id"): item.get("duplicates") or []
+        for item in items
+        if isinstance(item, dict)
+    }
+    metadata = {
+        "input_tokens": usage["input_tokens"],
+        "output_tokens": usage["output_tokens"],
+        "cost": usage["cost"],
+        "model": usage["model"],
+        "accounts_in_request": len(accounts)
+    }
+    results = {
+        account_id: {"duplicates": duplicates_by_account.get(account_id, []), "metadata": metadata}
+        for account_id, _, _ in accounts
+    }
+
+    duplicates_found = sum(len(result["duplicates"]) for result in results.values())
+    _add_usage_metadata(run, usage, duplicates_found)
+    if run:
+        run.add_outputs({
+            "duplicates_by_account": {account_id: r["duplicates"] for account_id, r in results.items()},
+            "duplicate_count": duplicates_found,
+            "response_valid": isinstance(items, list)
+        })
+
+    return results
+
+
+def _process_pack_response(response, run, accounts: AccountPack, streamed_items: List[Dict] = None,
+                           price_multiplier: float = 1.0) -> Dict[str, Dict[str, Any]]:
+    """Per-account results for a pack, whichever prompt shape it was sent with"""
+    if len(accounts) == 1:
+        return {accounts[0][0]: _process_duplicate_response(response, run, streamed_items, price_multiplier)}
+    return _process_multi_account_response(response, run, accounts, streamed_items, price_multiplier)
+
+
+# Message Batches requests are billed at half the standard token price
+BATCH_PRICE_MULTIPLIER = 0.5
+
+# Batches may take up to 24h; give up (and cancel) after this many seconds
+BATCH_TIMEOUT = float(os.getenv("CLAUDE_BATCH_TIMEOUT", "1800"))
+
+
+@traceable(name="detect_duplicates_claude_batch", tags=["duplicate-detection", "ai", "batch"])
+def traced_duplicate_detection_batch(owner_id: str, owner_name: str, packs: Dict[str, AccountPack],
+                                     claude_client, poll_interval: float = 10.0,
+                                     timeout: float = BATCH_TIMEOUT) -> Dict[str, Any]:
+    """
+    Duplicate detection for many accounts through the Message Batches API.
+    Submits one request per pack, polls until the batch ends, then parses
+    each result like the per-request detection functions. Raises TimeoutError
+    (after cancelling the batch) if it hasn't ended within timeout seconds.
+
+    Args:
+        packs: custom_id -> pack of (account_id, account_name, formatted_contacts)
+
+    Returns:
+        dict: "results" (account_id -> {"duplicates", "metadata"}) and
+              "errors" (custom_id -> result type for requests that did not succeed)
+    """
+    run = get_current_run_tree()
+    if run:
+        run.add_metadata({
+            "owner_id": owner_id,
+            "owner_name": owner_name,
+            "request_count": len(packs),
+            "account_count": sum(len(pack) for pack in packs.values()),
+            "phase": "duplicate_detection"
+        })
+
+    batch = claude_client.messages.batches.create(requests=[
+        {"custom_id": custom_id, "params": _pack_request_params(pack)}
+        for custom_id, pack in packs.items()
+    ])
+
+    deadline = time.monotonic() + timeout
+    while batch.processing_status != "ended":
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            try:
+                claude_client.messages.batches.cancel(batch.id)
+            except Exception as e:
+                print(f"[WARNING] Could not cancel Claude batch {batch.id}: {str(e)[:100]}")
+            raise TimeoutError(f"batch {batch.id} still {batch.processing_status} after {timeout:.0f}s")
+        time.sleep(min(poll_interval, remaining))
+        batch = claude_client.messages.batches.retrieve(batch.id)
+
+    results = {}
+    errors = {}
+    for entry in claude_client.messages.batches.results(batch.id):
+        if entry.result.type == "succeeded":
+            results.update(_process_pack_response(
+                entry.result.message, None, packs[entry.custom_id], price_multiplier=BATCH_PRICE_MULTIPLIER
+            ))
+        else:
+            errors[entry.custom_id] = entry.result.type
+
+    if run:
+        run.add_metadata({
+            "batch_id": batch.id,
+            "succeeded": len(packs) - len(errors),
+            "failed": len(errors),
+            "duplicates_found": sum(len(r["duplicates"]) for r in results.values())
+        })
+
+    return {"results": results, "errors": errors}
+
+
+class _DuplicatePairStreamParser:
+    """
+    Incrementally extract the objects of a streamed top-level JSON array.
+    Tracks brace depth (string- and escape-aware) and parses each object with
+    orjson as soon as it closes. Objects that fail to parse are skipped.
+    """
+
+    def __init__(self):
+        self.pairs: List[Dict] = []
+        self._buf = []
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str):
+        for char in text:
+            if self._done:
+                return
+            if not self._in_array:
+                self._in_array = char == '['
+                continue
+
+            if self._depth == 0:
+                if char == '{':
+                    self._depth = 1
+                    self._buf = [char]
+                elif char == ']':
+                    self._done = True
+                continue
+
+            self._buf.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        self.pairs.append(orjson.loads(''.join(self._buf)))
+                    except orjson.JSONDecodeError:
+                        pass
+
+
+@traceable(name="detect_duplicates_claude", tags=["duplicate-detection", "ai"])
+def traced_duplicate_detection(owner_id: str, owner_name: str, formatted_contacts: List[Dict],
+                                 claude_client, account_name: str) -> Dict[str, Any]:
+    """
+    Wrapped duplicate detection with LangSmith tracing.
+    Captures inputs, outputs, costs, and metadata.
+    """
+    run = _log_duplicate_detection_inputs(owner_id, owner_name, account_name, formatted_contacts)
+
+    # Make Claude API call
+    response = claude_client.messages.create(**_duplicate_request_params(account_name, formatted_contacts))
+
+    return _process_duplicate_response(response, run)
+
+
+@traceable(name="detect_duplicates_claude", tags=["duplicate-detection", "ai"])
+async def traced_duplicate_detection_async(owner_id: str, owner_name: str, formatted_contacts: List[Dict],
+                                           claude_client, account_name: str) -> Dict[str, Any]:
+    """
+    Async variant of traced_duplicate_detection for use with AsyncAnthropic.
+    Lets callers keep several Claude requests in flight at once.
+    """
+    run = _log_duplicate_detection_inputs(owner_id, owner_name, account_name, formatted_contacts)
+
+    await _throttle_duplicate_detection(len(formatted_contacts))
+
+    # Stream the Claude response and parse each pair as soon as its object closes
+    parser = _DuplicatePairStreamParser()
+    async with claude_client.messages.stream(
+        **_duplicate_request_params(account_name, formatted_contacts)
+    ) as stream:
+        async for text in stream.text_stream:
+            parser.feed(text)
+        response = await stream.get_final_message()
+
+    return _process_duplicate_response(response, run, parser.pairs)
+
+
+def _log_multi_account_inputs(owner_id: str, owner_name: str, accounts: AccountPack):
+    """Attach pack metadata to the current LangSmith run (if any) and return it"""
+    run = get_current_run_tree()
+    if run:
+        run.add_metadata({
+            "owner_id": owner_id,
+            "owner_name": owner_name,
+            "account_names": [account_name for _, account_name, _ in accounts],
+            "account_count": len(accounts),
+            "contact_count": sum(len(contacts) for _, _, contacts in accounts),
+            "phase": "duplicate_detection"
+        })
+    return run
+
+
+@traceable(name="detect_duplicates_claude_multi", tags=["duplicate-detection", "ai"])
+def traced_multi_account_detection(owner_id: str, owner_name: str, accounts: AccountPack,
+                                   claude_client) -> Dict[str, Dict[str, Any]]:
+    """
+    Duplicate detection for several small accounts in a single Claude request.
+
+    Returns:
+        dict: account_id -> {"duplicates", "metadata"}
+    """
+    run = _log_multi_account_inputs(owner_id, owner_name, accounts)
+
+    response = claude_client.messages.create(**_pack_request_params(accounts))
+
+    return _process_multi_account_response(response, run, accounts)
+
+
+@traceable(name="detect_duplicates_claude_multi", tags=["duplicate-detection", "ai"])
+async def traced_multi_account_detection_async(owner_id: str, owner_name: str, accounts: AccountPack,
+                                               claude_client) -> Dict[str, Dict[str, Any]]:
+    """Async variant of traced_multi_account_detection for use with AsyncAnthropic"""
+    run = _log_multi_account_inputs(owner_id, owner_name, accounts)
+
+    await _throttle_duplicate_detection(sum(len(contacts) for _, _, contacts in accounts))
+
+    # Each top-level object of the streamed array is one account's result
+    parser = _DuplicatePairStreamParser()
+    async with claude_client.messages.stream(**_pack_request_params(accounts)) as stream:
+        async for text in stream.text_stream:
+            parser.feed(text)
+        response = await stream.get_final_message()
+
+    return _process_multi_account_response(response, run, accounts, parser.pairs)
+
+
+# Activity statuses that mean the email went out (case-insensitive substring match)
+_SUCCESSFUL_SEND_SEARCH = re.compile(r"completed|sent", re.IGNORECASE).search
+
+
+def _is_successful_send(status) -> bool:
+    """True if an email activity status means the email went out"""
+    return bool(status) and _SUCCESSFUL_SEND_SEARCH(status) is not None
+
+
 @traceable(name="validate_emails", tags=["email-validation"])
 def traced_email_validation(contacts: List[Dict], activities: Dict) -> Dict[str, Any]:
     """
@@ -215,53 +660,51 @@ def traced_email_validation(contacts: List[Dict], activities: Dict) -> Dict[str,
             return None
         return date_str[:10] if len(date_str) > 10 else date_str
 
+    # Latest successful send per contact, computed once up front
+    last_send = {}
+    for contact_id, contact_activities in activities.items():
+        successful_sends = [
+            activity['date'] for activity in contact_activities
+            if _is_successful_send(activity.get('status'))
+        ]
+        if successful_sends:
+            last_send[contact_id] = max(successful_sends)
+
+    today = datetime.now().strftime('%Y-%m-%d')
     updates = []
     stats = {'Valid': 0, 'Invalid': 0, 'Unknown': 0}
 
+    # Bind hot lookups to locals once for the per-contact loop
+    get_last_send = last_send.get
+    append_update = updates.append
+
     for contact in contacts:
-        # Check SFDC native bounce fields FIRST
-        has_bounced = bool(contact.get('EmailBouncedReason'))
-        bounce_date = contact.get('EmailBouncedDate')
+        get = contact.get
+        contact_id = contact['Id']
 
-        if has_bounced:
+        # Check SFDC native bounce fields FIRST
+        verified_date = None
+        if get('EmailBouncedReason'):
             # Email bounced
-            update = {
-                'Id': contact['Id'],
-                'Email_Status__c': 'Invalid',
-                'email_last_updated_date__c': datetime.now().strftime('%Y-%m-%d'),
-                'Email_Verified_Date__c': None
-            }
-            stats['Invalid'] += 1
+            status = 'Invalid'
         else:
-            # Check activity for successful sends
-            contact_activities = activities.get(contact['Id'], [])
-
-            successful_sends = []
-            for activity in contact_activities:
-                status = activity.get('status', '').lower()
-                if 'completed' in status or 'sent' in status:
-                    successful_sends.append(activity['date'])
-
-            if successful_sends:
-                update = {
-                    'Id': contact['Id'],
-                    'Email_Status__c': 'Valid',
-                    'email_last_updated_date__c': datetime.now().strftime('%Y-%m-%d'),
-                    'Email_Verified_Date__c': format_date(max(successful_sends))
-                }
-                stats['Valid'] += 1
+            sent_date = get_last_send(contact_id)
+            if sent_date is not None:
+                # Activity shows a successful send
+                status = 'Valid'
+                verified_date = format_date(sent_date)
             else:
-                update = {
-                    'Id': contact['Id'],
-                    'Email_Status__c': 'Unknown',
-                    'email_last_updated_date__c': datetime.now().strftime('%Y-%m-%d'),
-                    'Email_Verified_Date__c': None
-                }
-                stats['Unknown'] += 1
+                status = 'Unknown'
+        stats[status] += 1
 
         # Only update if status changed
-        if contact.get('Email_Status__c') != update['Email_Status__c']:
-            updates.append(update)
+        if get('Email_Status__c') != status:
+            append_update({
+                'Id': contact_id,
+                'Email_Status__c': status,
+                'email_last_updated_date__c': today,
+                'Email_Verified_Date__c': verified_date
+            })
 
     result = {
         "status": "success",
@@ -281,66 +724,107 @@ def traced_email_validation(contacts: List[Dict], activities: Dict) -> Dict[str,
     return result
 
 
+# Suggested actions for (contact_1, contact_2), indexed by _score_pairs action code
+_PAIR_ACTIONS = (
+    ("Delete", "Keep - Not a duplicate"),
+    ("Merge into other record", "Merge into other record"),
+    ("Keep - Not a duplicate", "Delete"),
+)
+
+
+def _score_pairs(score_base: List[int], name_len: List[int],
+                 idx_a: List[int], idx_b: List[int]) -> List[int]:
+    """
+    Score each (idx_a[k], idx_b[k]) pair from the per-contact feature arrays.
+    score_base is the per-contact completeness score (phone + title - 2 * bounced);
+    the longer name earns one extra point within the pair.
+    Returns action codes sign(score_a - score_b) + 1:
+    0 = delete A, 1 = merge (tie), 2 = delete B.
+    """
+    codes = []
+    for a, b in zip(idx_a, idx_b):
+        score_a = score_base[a] + (name_len[a] > name_len[b])
+        score_b = score_base[b] + (name_len[b] > name_len[a])
+        codes.append((score_a > score_b) - (score_a < score_b) + 1)
+    return codes
+
+
 @traceable(name="mark_duplicates_for_review", tags=["duplicate-marking"])
-def traced_duplicate_marking(duplicate_pairs: List[Dict], contacts_dict: Dict) -> Dict[str, Any]:
+def traced_duplicate_marking(duplicate_pairs: Iterable[Dict], contacts_dict: Dict) -> Dict[str, Any]:
     """
     Wrapped duplicate marking with LangSmith tracing.
     Tracks marking decisions and justifications.
+    duplicate_pairs may be any iterable; it is consumed in a single pass.
     """
     run = get_current_run_tree()
-    if run:
-        run.add_metadata({
-            "duplicate_pairs": len(duplicate_pairs),
-            "phase": "duplicate_marking"
-        })
+
+    # Per-contact features as parallel arrays (struct-of-arrays), filled once
+    # per contact since contacts recur across pairs
+    id_to_idx = {}
+    names = []
+    names_lower = []
+    name_len = []
+    has_phone = []
+    has_title = []
+    is_bounced = []
+    score_base = []
+    canonical_score = []
+
+    def contact_fields(contact):
+        """Read the scoring fields of a contact in one pass (missing keys -> None)"""
+        get = contact.get
+        return get('FirstName'), get('LastName'), get('Phone'), get('Title'), get('EmailBouncedReason')
+
+    def feature_index(contact_id, contact):
+        """Return the feature-array index for a contact, adding it on first sight"""
+        idx = id_to_idx.get(contact_id)
+        if idx is None:
+            idx = id_to_idx[contact_id] = len(names)
+            first_name, last_name, phone, title, bounced = contact_fields(contact)
+            name = f"{first_name or ''} {last_name or ''}".strip()
+            contact_has_phone = int(bool(phone))
+            contact_has_title = int(bool(title))
+            contact_is_bounced = int(bool(bounced))
+
+            names.append(name)
+            names_lower.append(name.lower())
+            name_len.append(len(name))
+            has_phone.append(contact_has_phone)
+            has_title.append(contact_has_title)
+            is_bounced.append(contact_is_bounced)
+            score_base.append(contact_has_phone + contact_has_title - 2 * contact_is_bounced)
+            canonical_score.append(len(name) + 10 * contact_has_phone + 10 * contact_has_title)
+        return idx
 
     # Helper functions
-    def determine_canonical_name(contact1, contact2):
+    def determine_canonical_name(i1, i2):
         """Determine the best/canonical name for duplicate group"""
-        name1 = f"{contact1.get('FirstName', '')} {contact1.get('LastName', '')}".strip()
-        name2 = f"{contact2.get('FirstName', '')} {contact2.get('LastName', '')}".strip()
-
-        score1 = len(name1)
-        score2 = len(name2)
-
-        if contact1.get('Phone'): score1 += 10
-        if contact2.get('Phone'): score2 += 10
-        if contact1.get('Title'): score1 += 10
-        if contact2.get('Title'): score2 += 10
-
-        return name1 if score1 >= score2 else name2
+        return names[i1] if canonical_score[i1] >= canonical_score[i2] else names[i2]
 
-    def generate_justification(contact, other_contact, is_suggested_delete):
+    def generate_justification(i, other, is_suggested_delete):
         """Generate narrative justification for duplicate marking"""
-        name1 = f"{contact.get('FirstName', '')} {contact.get('LastName', '')}".strip()
-        name2 = f"{other_contact.get('FirstName', '')} {other_contact.get('LastName', '')}".strip()
-
-        has_phone = bool(contact.get('Phone'))
-        has_title = bool(contact.get('Title'))
-        is_bounced = bool(contact.get('EmailBouncedReason'))
-
-        other_has_phone = bool(other_contact.get('Phone'))
-        other_has_title = bool(other_contact.get('Title'))
+        name1 = names[i]
+        name2 = names[other]
 
         if is_suggested_delete:
             parts = []
 
             if name1 != name2:
-                if name1.lower() == name2.lower():
+                if names_lower[i] == names_lower[other]:
                     parts.append(f"Name capitalization differs from '{name2}'")
                 else:
                     parts.append(f"Likely typo/variant of '{name2}'")
 
             missing = []
-            if not has_phone and other_has_phone:
+            if not has_phone[i] and has_phone[other]:
                 missing.append("phone")
-            if not has_title and other_has_title:
+            if not has_title[i] and has_title[other]:
                 missing.append("title")
 
             if missing:
                 parts.append(f"missing {' and '.join(missing)}")
 
-            if is_bounced:
+            if is_bounced[i]:
                 parts.append("email bounced")
 
             if not parts:
@@ -351,18 +835,18 @@ def traced_duplicate_marking(duplicate_pairs: List[Dict], contacts_dict: Dict) -
             parts = []
 
             has_data = []
-            if has_phone:
+            if has_phone[i]:
                 has_data.append("phone")
-            if has_title:
+            if has_title[i]:
                 has_data.append("title")
 
             if has_data:
                 parts.append(f"Has {' and '.join(has_data)}")
 
-            if name1 != name2 and len(name1) > len(name2):
+            if name1 != name2 and name_len[i] > name_len[other]:
                 parts.append("more complete name")
 
-            if not is_bounced:
+            if not is_bounced[i]:
                 parts.append("valid email")
 
             if not parts:
@@ -372,57 +856,51 @@ def traced_duplicate_marking(duplicate_pairs: List[Dict], contacts_dict: Dict) -
 
         return justification[:255]
 
-    # Marking logic
-    updates = []
-    decisions = []
+    # Resolve pairs to feature indices, skipping pairs with unknown contacts
+    resolved = []
+    idx_a = []
+    idx_b = []
+    pair_count = 0
 
     for pair in duplicate_pairs:
-        contact_id_1 = pair['contact_id_1']
-        contact_id_2 = pair['contact_id_2']
-
-        contact1 = contacts_dict.get(contact_id_1)
-        contact2 = contacts_dict.get(contact_id_2)
+        pair_count += 1
+        contact1 = contacts_dict.get(pair['contact_id_1'])
+        contact2 = contacts_dict.get(pair['contact_id_2'])
 
         if not contact1 or not contact2:
             continue
 
-        # Determine canonical name
-        canonical_name = determine_canonical_name(contact1, contact2)
+        resolved.append((pair, contact1, contact2))
+        idx_a.append(feature_index(pair['contact_id_1'], contact1))
+        idx_b.append(feature_index(pair['contact_id_2'], contact2))
+
+    # Score every pair in one pass over the feature arrays
+    action_codes = _score_pairs(score_base, name_len, idx_a, idx_b)
 
-        # Score contacts for suggested action
-        score1 = 0
-        score2 = 0
+    # Marking logic
+    today = datetime.now().strftime('%Y-%m-%d')
+    updates = []
+    decisions = []
 
-        if contact1.get('Phone'): score1 += 1
-        if contact2.get('Phone'): score2 += 1
-        if contact1.get('Title'): score1 += 1
-        if contact2.get('Title'): score2 += 1
-        if contact1.get('EmailBouncedReason'): score1 -= 2
-        if contact2.get('EmailBouncedReason'): score2 -= 2
+    for (pair, contact1, contact2), i1, i2, action_code in zip(resolved, idx_a, idx_b, action_codes):
+        contact_id_1 = pair['contact_id_1']
+        contact_id_2 = pair['contact_id_2']
+        name1 = names[i1]
+        name2 = names[i2]
 
-        name1 = f"{contact1.get('FirstName', '')} {contact1.get('LastName', '')}".strip()
-        name2 = f"{contact2.get('FirstName', '')} {contact2.get('LastName', '')}".strip()
-        if len(name1) > len(name2): score1 += 1
-        elif len(name2) > len(name1): score2 += 1
+        # Determine canonical name
+        canonical_name = determine_canonical_name(i1, i2)
 
         # Determine suggested actions
-        if score1 < score2:
-            suggested_action_1 = "Delete"
-            suggested_action_2 = "Keep - Not a duplicate"
-        elif score2 < score1:
-            suggested_action_1 = "Keep - Not a duplicate"
-            suggested_action_2 = "Delete"
-        else:
-            suggested_action_1 = "Merge into other record"
-            suggested_action_2 = "Merge into other record"
+        suggested_action_1, suggested_action_2 = _PAIR_ACTIONS[action_code]
 
         # Generate justifications
         justification_1 = generate_justification(
-            contact1, contact2,
+            i1, i2,
             is_suggested_delete=(suggested_action_1 == "Delete")
         )
         justification_2 = generate_justification(
-            contact2, contact1,
+            i2, i1,
             is_suggested_delete=(suggested_action_2 == "Delete")
         )
 
@@ -430,7 +908,7 @@ def traced_duplicate_marking(duplicate_pairs: List[Dict], contacts_dict: Dict) -
         update1 = {
             'Id': contact_id_1,
             'Email_Status__c': 'Duplicate',
-            'email_last_updated_date__c': datetime.now().strftime('%Y-%m-%d'),
+            'email_last_updated_date__c': today,
             'Duplicate_Group_Name__c': canonical_name,
             'Duplicate_Justification__c': justification_1,
             'Suggested_Action__c': suggested_action_1,
@@ -440,7 +918,7 @@ def traced_duplicate_marking(duplicate_pairs: List[Dict], contacts_dict: Dict) -
         update2 = {
             'Id': contact_id_2,
             'Email_Status__c': 'Duplicate',
-            'email_last_updated_date__c': datetime.now().strftime('%Y-%m-%d'),
+            'email_last_updated_date__c': today,
             'Duplicate_Group_Name__c': canonical_name,
             'Duplicate_Justification__c': justification_2,
             'Suggested_Action__c': suggested_action_2,
@@ -451,6 +929,7 @@ def traced_duplicate_marking(duplicate_pairs: List[Dict], contacts_dict: Dict) -
 
         # Track decision
         decisions.append({
+            'owner_id': pair.get('owner_id'),
             'account_name': pair.get('account_name', 'Unknown'),
             'confidence': pair['confidence'],
             'reasoning': pair['reasoning'],
@@ -475,6 +954,12 @@ def traced_duplicate_marking(duplicate_pairs: List[Dict], contacts_dict: Dict) -
             }
         })
 
+    if run:
+        run.add_metadata({
+            "duplicate_pairs": pair_count,
+            "phase": "duplicate_marking"
+        })
+
     result = {
         "status": "success",
         "total_updates": len(updates),
@@ -538,18 +1023,19 @@ def traced_salesforce_update(sf, updates: List[Dict], batch_size: int = 200) ->
     print(f"[INFO] Updating {len(updates)} contacts in batches of {batch_size}...")
 
     try:
-        for i in range(0, len(updates), batch_size):
-            batch = updates[i:i + batch_size]
-            results = sf.bulk.Contact.update(batch)
-
-            for idx, result in enumerate(results):
-                if result['success']:
-                    success_count += 1
-                else:
-                    errors.append({
-                        'contact_id': batch[idx]['Id'],
-                        'error': result.get('errors', 'Unknown error')
-                    })
+        # One bulk job for all batches: Salesforce processes the batches in
+        # parallel and simple_salesforce polls them concurrently. Results come
+        # back in input order.
+        results = sf.bulk.Contact.update(updates, batch_size=batch_size, use_serial=False)
+
+        for update, result in zip(updates, results):
+            if result['success']:
+                success_count += 1
+            else:
+                errors.append({
+                    'contact_id': update['Id'],
+                    'error': result.get('errors', 'Unknown error')
+                })
 
         print(f"[OK] Successfully updated {success_count} contacts")
         if errors:
@@ -597,8 +1083,7 @@ def save_cost_report(output_dir: str = "reports"):
     cost_summary["timestamp"] = datetime.now().isoformat()
 
     output_path = pathlib.Path(output_dir) / "cost_report.json"
-    with open(output_path, 'w') as f:
-        json.dump(cost_summary, f, indent=2)
+    output_path.write_bytes(orjson.dumps(cost_summary, option=orjson.OPT_INDENT_2))
 
     print(f"[OK] Cost report saved to {output_path}")
 
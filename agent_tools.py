@@ -4,14 +4,22 @@ Refactored tools from phase scripts for use with Claude Agent SDK
 Integrated with LangSmith for observability
 """
 
-import json
+import asyncio
 import os
+import threading
 from datetime import datetime, timedelta
 from collections import defaultdict
-from simple_salesforce import Salesforce
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations, islice
+from simple_salesforce.exceptions import SalesforceError
 from dotenv import load_dotenv
+from sf_session import connect_with_cached_session
 from langsmith_wrapper import (
     traced_duplicate_detection,
+    traced_duplicate_detection_async,
+    traced_duplicate_detection_batch,
+    traced_multi_account_detection,
+    traced_multi_account_detection_async,
     traced_email_validation,
     traced_duplicate_marking,
     traced_salesforce_update
@@ -25,25 +33,34 @@ load_dotenv()
 # TOOL 1: Connect to Salesforce
 # ============================================================================
 
+# Logged-in connection reused across jobs (SOAP login costs several hundred ms)
+_sf_connection = None
+_sf_lock = threading.Lock()
+
+
 def connect_to_salesforce():
     """
     Connect to Salesforce using credentials from environment variables.
+    Reuses the previous connection (or the session cached on disk by an
+    earlier process); an expired session is renewed on its first 401.
 
     Returns:
         dict: Connection status and Salesforce connection object
     """
-    try:
-        sf = Salesforce(
-            username=os.getenv('SF_USERNAME'),
-            password=os.getenv('SF_PASSWORD'),
-            security_token=os.getenv('SF_SECURITY_TOKEN')
-        )
+    global _sf_connection
 
-        return {
-            "status": "success",
-            "message": "Connected to Salesforce successfully",
-            "connection": sf
-        }
+    try:
+        if _sf_connection is None:
+            with _sf_lock:
+                if _sf_connection is None:
+                    _sf_connection, _ = connect_with_cached_session(
+                        os.getenv('SF_USERNAME'),
+                        os.getenv('SF_PASSWORD'),
+                        os.getenv('SF_SECURITY_TOKEN'),
+                        # Decode responses into plain dicts on json's C fast path
+                        # (the default OrderedDict hook builds every object in Python)
+                        object_pairs_hook=None
+                    )
     except Exception as e:
         return {
             "status": "error",
@@ -51,12 +68,18 @@ def connect_to_salesforce():
             "connection": None
         }
 
+    return {
+        "status": "success",
+        "message": "Connected to Salesforce successfully",
+        "connection": _sf_connection
+    }
+
 
 # ============================================================================
 # TOOL 2: Extract Contacts (with Account Owner grouping)
 # ============================================================================
 
-def extract_contacts(sf, batch_size=None, owner_filter=None):
+def extract_contacts(sf, batch_size=None, owner_filter=None, on_contact_ids=None):
     """
     Extract contacts from Salesforce grouped by Account Owner.
 
@@ -64,6 +87,8 @@ def extract_contacts(sf, batch_size=None, owner_filter=None):
         sf: Salesforce connection object
         batch_size: Optional limit on number of contacts
         owner_filter: Optional list of OwnerId to filter by
+        on_contact_ids: Optional callable given each chunk of ACTIVITY_QUERY_CHUNK_SIZE
+                        contact IDs as records stream in (e.g. EmailActivityFetcher.add)
 
     Returns:
         dict: Contacts grouped by OwnerId with metadata
@@ -72,10 +97,7 @@ def extract_contacts(sf, batch_size=None, owner_filter=None):
     query = """
         SELECT Id, FirstName, LastName, Email, Phone, MobilePhone, Title,
                AccountId, Account.Name, Account.OwnerId, Account.Owner.Name,
-               OwnerId, Owner.Name, LastModifiedDate,
-               Email_Status__c, email_last_updated_date__c,
-               Email_Verified_Date__c,
-               EmailBouncedReason, EmailBouncedDate, IsEmailBounced
+               LastModifiedDate, Email_Status__c, EmailBouncedReason
         FROM Contact
         WHERE AccountId != NULL
     """
@@ -90,31 +112,30 @@ def extract_contacts(sf, batch_size=None, owner_filter=None):
         query += f" LIMIT {batch_size}"
 
     try:
-        result = sf.query(query)
-        contacts = result['records']
+        # Follow nextRecordsUrl so results past the first page are included
+        # and flatten each record as it streams in
+        contacts = []
+        pending_ids = []
+        for record in sf.query_all_iter(query):
+            contact = _flatten_contact(record)
+            contacts.append(contact)
+            if on_contact_ids:
+                pending_ids.append(contact['Id'])
+                if len(pending_ids) == ACTIVITY_QUERY_CHUNK_SIZE:
+                    on_contact_ids(pending_ids)
+                    pending_ids = []
+        if pending_ids:
+            on_contact_ids(pending_ids)
 
         print(f"[OK] Retrieved {len(contacts)} contacts")
 
-        # Clean up nested fields
-        for contact in contacts:
-            # Extract Account info
-            if contact.get('Account'):
-                contact['AccountName'] = contact['Account'].get('Name', '')
-                contact['AccountOwnerId'] = contact['Account'].get('OwnerId', '')
-                if contact['Account'].get('Owner'):
-                    contact['AccountOwnerName'] = contact['Account']['Owner'].get('Name', '')
-                del contact['Account']
-
-            # Extract Contact Owner info
-            if contact.get('Owner'):
-                contact['OwnerName'] = contact['Owner'].get('Name', '')
-                del contact['Owner']
-
-        # Group by Account Owner
+        # Group by Account Owner, collecting each owner's distinct accounts in the same pass
         grouped_by_owner = defaultdict(list)
+        owner_accounts = defaultdict(dict)
         for contact in contacts:
             owner_id = contact.get('AccountOwnerId', 'NO_OWNER')
             grouped_by_owner[owner_id].append(contact)
+            owner_accounts[owner_id][contact.get('AccountName', '')] = None
 
         # Create owner metadata
         owner_metadata = {}
@@ -123,7 +144,7 @@ def extract_contacts(sf, batch_size=None, owner_filter=None):
             owner_metadata[owner_id] = {
                 'owner_name': first_contact.get('AccountOwnerName', 'Unknown'),
                 'contact_count': len(owner_contacts),
-                'accounts': list(set(c.get('AccountName', '') for c in owner_contacts))
+                'accounts': list(owner_accounts[owner_id])
             }
 
         return {
@@ -143,17 +164,45 @@ def extract_contacts(sf, batch_size=None, owner_filter=None):
         }
 
 
+# Scalar Contact fields copied straight from each SOQL record
+_CONTACT_FIELDS = (
+    'Id', 'FirstName', 'LastName', 'Email', 'Phone', 'MobilePhone', 'Title',
+    'AccountId', 'LastModifiedDate', 'Email_Status__c', 'EmailBouncedReason'
+)
+
+
+def _flatten_contact(record):
+    """Build a flat contact dict, reading only the nested Account leaves we use"""
+    contact = {field: record.get(field) for field in _CONTACT_FIELDS}
+
+    # Extract Account info
+    account = record.get('Account')
+    if account:
+        contact['AccountName'] = account.get('Name', '')
+        contact['AccountOwnerId'] = account.get('OwnerId', '')
+        account_owner = account.get('Owner')
+        if account_owner:
+            contact['AccountOwnerName'] = account_owner.get('Name', '')
+
+    return contact
+
+
 # ============================================================================
 # TOOL 3: Extract Email Activities
 # ============================================================================
 
+# Contact IDs per Task query and number of chunk queries in flight
+ACTIVITY_QUERY_CHUNK_SIZE = 200
+ACTIVITY_QUERY_WORKERS = 8
+
+
 def extract_email_activities(sf, contact_ids, days_back=90):
     """
     Extract email activity data for contacts.
 
     Args:
         sf: Salesforce connection object
-        contact_ids: List of contact IDs to query
+        contact_ids: Contact IDs to query (any sized iterable, e.g. dict keys)
         days_back: Number of days of history to pull
 
     Returns:
@@ -162,6 +211,74 @@ def extract_email_activities(sf, contact_ids, days_back=90):
     if not contact_ids:
         return {}
 
+    fetcher = EmailActivityFetcher(sf)
+    fetcher.add(contact_ids)
+    return fetcher.result()
+
+
+class EmailActivityFetcher:
+    """
+    Queries email Tasks in the background as contact IDs become known, so the
+    activity fetch can overlap contact extraction.
+    Call add() with IDs as they arrive, then result() once for the activities.
+    """
+
+    def __init__(self, sf):
+        self.sf = sf
+        self._executor = ThreadPoolExecutor(max_workers=ACTIVITY_QUERY_WORKERS)
+        self._futures = []
+
+    def add(self, contact_ids):
+        """Start Task queries for contact IDs, in chunks so no SOQL IN list grows unbounded"""
+        for chunk in _batched(contact_ids, ACTIVITY_QUERY_CHUNK_SIZE):
+            self._futures.append(self._executor.submit(_query_email_tasks, self.sf, chunk))
+
+    def cancel(self):
+        """Drop queries that haven't started"""
+        self._executor.shutdown(cancel_futures=True)
+
+    def result(self):
+        """
+        Wait for every query and group the Tasks by contact.
+
+        Returns:
+            dict: Email activities by contact ID
+        """
+        activities = defaultdict(list)
+
+        task_count = 0
+        for future in self._futures:
+            for record in future.result():
+                task_count += 1
+                activities[record['WhoId']].append({
+                    'type': 'Task',
+                    'status': record.get('Status'),
+                    'date': record.get('CreatedDate'),
+                    'subject': record.get('Subject'),
+                    'description': record.get('Description', '')
+                })
+        self._executor.shutdown()
+
+        if task_count > 0:
+            print(f"[OK] Found {task_count} email Task records")
+        else:
+            print("  No email Task records found")
+
+        return dict(activities)
+
+
+def _batched(iterable, size):
+    """Yield successive lists of up to size items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _query_email_tasks(sf, contact_ids):
+    """Fetch email Task records for one chunk of contact IDs (empty list on failure)"""
     # Convert to comma-separated string
     id_list = "','".join(contact_ids)
 
@@ -173,30 +290,14 @@ def extract_email_activities(sf, contact_ids, days_back=90):
         WHERE WhoId IN ('{id_list}')
         AND TaskSubtype = 'Email'
         ORDER BY CreatedDate DESC
-        LIMIT 10000
     """
 
-    activities = defaultdict(list)
-
     try:
-        result = sf.query(task_query)
-        if result['totalSize'] > 0:
-            print(f"[OK] Found {result['totalSize']} email Task records")
-            for record in result['records']:
-                contact_id = record['WhoId']
-                activities[contact_id].append({
-                    'type': 'Task',
-                    'status': record.get('Status'),
-                    'date': record.get('CreatedDate'),
-                    'subject': record.get('Subject'),
-                    'description': record.get('Description', '')
-                })
-        else:
-            print("  No email Task records found")
+        # Stream every page (no LIMIT) instead of capping the chunk's results
+        return list(sf.query_all_iter(task_query))
     except Exception as e:
         print(f"  Task query failed: {str(e)[:100]}")
-
-    return dict(activities)
+        return []
 
 
 # ============================================================================
@@ -222,10 +323,28 @@ def validate_emails(contacts, activities):
 # TOOL 5: Detect Duplicates (with LangSmith tracing)
 # ============================================================================
 
+# In-flight Claude calls per owner when the caller doesn't share a semaphore
+DEFAULT_CLAUDE_CONCURRENCY = 8
+
+# Accounts with at least this many contacts get a Claude request of their own
+# (long answers risk truncation); smaller accounts are packed into one prompt,
+# up to ACCOUNTS_PER_PROMPT accounts and CONTACTS_PER_PROMPT contacts
+# (~3k input tokens) per request
+SOLO_ACCOUNT_MIN_CONTACTS = 8
+ACCOUNTS_PER_PROMPT = 8
+CONTACTS_PER_PROMPT = 25
+
+# Owners needing at least this many Claude requests go through the
+# Message Batches API (half price, no per-request round trips)
+BATCH_MIN_REQUESTS = 4
+
+
 def detect_duplicates_for_owner(owner_id, owner_contacts, claude_client):
     """
     Detect duplicates within a single account owner's contacts.
     Uses LangSmith tracing wrapper for observability and cost tracking.
+    Owners needing BATCH_MIN_REQUESTS or more Claude requests are analyzed in
+    one Message Batches submission; smaller owners call Claude per request.
 
     Args:
         owner_id: Account Owner ID
@@ -235,57 +354,140 @@ def detect_duplicates_for_owner(owner_id, owner_contacts, claude_client):
     Returns:
         dict: Duplicate pairs detected for this owner
     """
-    # Group by account first
-    contacts_by_account = defaultdict(list)
-    for contact in owner_contacts:
-        account_id = contact.get('AccountId', 'NO_ACCOUNT')
-        contacts_by_account[account_id].append(contact)
+    owner_name = owner_contacts[0].get('AccountOwnerName', 'Unknown') if owner_contacts else 'Unknown'
+    # Exact email/name matches are resolved locally; Claude only sees the rest
+    exact_duplicates, accounts = _resolve_exact_duplicates(owner_id, owner_contacts)
+    packs = _pack_accounts(accounts)
+
+    all_duplicates = None
+    if len(packs) >= BATCH_MIN_REQUESTS:
+        all_duplicates = _detect_duplicates_batched(owner_id, owner_name, packs, claude_client)
+
+    if all_duplicates is None:
+        all_duplicates = []
+
+        # One Claude call per pack of accounts
+        for pack in packs:
+            try:
+                # Call traced version
+                if len(pack) == 1:
+                    account_id, account_name, formatted_contacts = pack[0]
+                    results = {account_id: traced_duplicate_detection(
+                        owner_id=owner_id,
+                        owner_name=owner_name,
+                        formatted_contacts=formatted_contacts,
+                        claude_client=claude_client,
+                        account_name=account_name
+                    )}
+                else:
+                    results = traced_multi_account_detection(
+                        owner_id=owner_id,
+                        owner_name=owner_name,
+                        accounts=pack,
+                        claude_client=claude_client
+                    )
+
+                all_duplicates.extend(_tag_pack_duplicates(results, owner_id, pack))
+
+            except Exception as e:
+                print(f"[ERROR] Claude API failed for {_pack_label(pack)}: {e}")
+                continue
+
+    all_duplicates = _merge_exact_duplicates(exact_duplicates, all_duplicates)
+
+    return {
+        "status": "success",
+        "owner_id": owner_id,
+        "duplicate_pairs": all_duplicates,
+        "total_pairs": len(all_duplicates)
+    }
+
+
+def _detect_duplicates_batched(owner_id, owner_name, packs, claude_client):
+    """
+    Run duplicate detection for all of an owner's packs as one message batch.
+
+    Returns:
+        list: Tagged duplicate pairs, or None if the batch could not be run
+    """
+    packs_by_id = {f"pack-{index}": pack for index, pack in enumerate(packs)}
+
+    try:
+        batch_result = traced_duplicate_detection_batch(
+            owner_id=owner_id,
+            owner_name=owner_name,
+            packs=packs_by_id,
+            claude_client=claude_client
+        )
+    except Exception as e:
+        print(f"[ERROR] Claude batch failed for {owner_name}, falling back to per-request calls: {e}")
+        return None
+
+    for custom_id, error in batch_result["errors"].items():
+        print(f"[ERROR] Claude API failed for {_pack_label(packs_by_id[custom_id])}: batch request {error}")
 
     all_duplicates = []
+    for pack in packs:
+        all_duplicates.extend(_tag_pack_duplicates(batch_result["results"], owner_id, pack))
+    return all_duplicates
 
-    # Analyze each account
-    for account_id, account_contacts in contacts_by_account.items():
-        if len(account_contacts) < 2:
-            continue
 
-        account_name = account_contacts[0].get('AccountName', 'Unknown')
-        owner_name = account_contacts[0].get('AccountOwnerName', 'Unknown')
-
-        # Format for Claude
-        formatted_contacts = []
-        for c in account_contacts:
-            formatted_contacts.append({
-                'Id': c['Id'],
-                'Name': f"{c.get('FirstName', '')} {c.get('LastName', '')}".strip(),
-                'Email': c.get('Email', ''),
-                'Phone': c.get('Phone', ''),
-                'MobilePhone': c.get('MobilePhone', ''),
-                'Title': c.get('Title', ''),
-                'LastModified': c.get('LastModifiedDate', '')
-            })
+async def detect_duplicates_for_owner_async(owner_id, owner_contacts, claude_client, semaphore=None):
+    """
+    Async variant of detect_duplicates_for_owner.
+    Analyzes the owner's account packs concurrently with an AsyncAnthropic client.
+
+    Args:
+        owner_id: Account Owner ID
+        owner_contacts: List of contacts for this owner
+        claude_client: AsyncAnthropic client for AI analysis
+        semaphore: Optional asyncio.Semaphore bounding in-flight Claude calls
+                   (share one across owners to respect rate limits;
+                   defaults to DEFAULT_CLAUDE_CONCURRENCY for this owner)
 
+    Returns:
+        dict: Duplicate pairs detected for this owner
+    """
+    owner_name = owner_contacts[0].get('AccountOwnerName', 'Unknown') if owner_contacts else 'Unknown'
+
+    async def analyze_pack(pack):
         try:
             # Call traced version
-            result = traced_duplicate_detection(
-                owner_id=owner_id,
-                owner_name=owner_name,
-                formatted_contacts=formatted_contacts,
-                claude_client=claude_client,
-                account_name=account_name
-            )
+            async with semaphore:
+                if len(pack) == 1:
+                    account_id, account_name, formatted_contacts = pack[0]
+                    results = {account_id: await traced_duplicate_detection_async(
+                        owner_id=owner_id,
+                        owner_name=owner_name,
+                        formatted_contacts=formatted_contacts,
+                        claude_client=claude_client,
+                        account_name=account_name
+                    )}
+                else:
+                    results = await traced_multi_account_detection_async(
+                        owner_id=owner_id,
+                        owner_name=owner_name,
+                        accounts=pack,
+                        claude_client=claude_client
+                    )
+
+            return _tag_pack_duplicates(results, owner_id, pack)
 
-            duplicates = result.get('duplicates', [])
+        except Exception as e:
+            print(f"[ERROR] Claude API failed for {_pack_label(pack)}: {e}")
+            return []
 
-            # Add account context to each duplicate
-            for dup in duplicates:
-                dup['account_id'] = account_id
-                dup['account_name'] = account_name
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(DEFAULT_CLAUDE_CONCURRENCY)
 
-            all_duplicates.extend(duplicates)
+    # Exact email/name matches are resolved locally; Claude only sees the rest
+    exact_duplicates, accounts = _resolve_exact_duplicates(owner_id, owner_contacts)
+    pack_results = await asyncio.gather(*(analyze_pack(pack) for pack in _pack_accounts(accounts)))
 
-        except Exception as e:
-            print(f"[ERROR] Claude API failed for {account_name}: {e}")
-            continue
+    all_duplicates = _merge_exact_duplicates(
+        exact_duplicates,
+        [dup for pack_duplicates in pack_results for dup in pack_duplicates]
+    )
 
     return {
         "status": "success",
@@ -295,87 +497,201 @@ def detect_duplicates_for_owner(owner_id, owner_contacts, claude_client):
     }
 
 
-# ============================================================================
-# HELPER FUNCTIONS (used by tools)
-# ============================================================================
+def _resolve_exact_duplicates(owner_id, owner_contacts):
+    """
+    Pair up contacts that share a normalized email or an exact first + last
+    name within the same account, without asking Claude.
+    Phone numbers are not used: colleagues often share a company line.
+    Only contacts sharing a key directly are paired. When a group is only
+    linked through a third record (e.g. two people each sharing a generic
+    mailbox or a common name with it), the whole group goes to Claude.
+
+    Returns:
+        tuple: (tagged duplicate pairs, account_id -> contacts still to send to
+                Claude: one representative per fully matched group, every
+                member of a transitively linked group, plus the unmatched
+                contacts, for accounts where at least 2 remain)
+    """
+    exact_duplicates = []
+    remaining_accounts = {}
+
+    for account_id, account_contacts in _group_contacts_by_account(owner_contacts).items():
+        # Accounts with a single contact can't have duplicates
+        if len(account_contacts) < 2:
+            continue
+
+        account_name = account_contacts[0].get('AccountName', 'Unknown')
+        keys = [_exact_match_keys(contact) for contact in account_contacts]
+
+        # Union contacts sharing any key; parent[i] ends up as the group's first member
+        parent = list(range(len(account_contacts)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        first_with_key = {}
+        for i, contact in enumerate(account_contacts):
+            # Earlier contacts this one shares a key with directly
+            matches = {}
+            for key in keys[i]:
+                j = first_with_key.setdefault(key, i)
+                if j != i:
+                    matches.setdefault(j, set()).add(key)
+
+            for j, shared in matches.items():
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j:
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+
+                if any(key[0] == 'email' for key in shared):
+                    reasoning = "Exact match: same email address"
+                else:
+                    reasoning = "Exact match: same first and last name"
+
+                exact_duplicates.append({
+                    'contact_id_1': account_contacts[j]['Id'],
+                    'contact_id_2': contact['Id'],
+                    'confidence': 'high',
+                    'reasoning': reasoning,
+                    'owner_id': owner_id,
+                    'account_id': account_id,
+                    'account_name': account_name
+                })
+
+        groups = defaultdict(list)
+        for i in range(len(account_contacts)):
+            groups[find(i)].append(i)
+
+        remaining = []
+        for members in groups.values():
+            fully_matched = all(keys[i] & keys[j] for i, j in combinations(members, 2))
+            remaining.extend(account_contacts[i] for i in (members[:1] if fully_matched else members))
+
+        if len(remaining) >= 2:
+            remaining_accounts[account_id] = remaining
+
+    return exact_duplicates, remaining_accounts
+
 
-def determine_canonical_name(contact1, contact2):
-    """Determine the best/canonical name for duplicate group"""
-    name1 = f"{contact1.get('FirstName', '')} {contact1.get('LastName', '')}".strip()
-    name2 = f"{contact2.get('FirstName', '')} {contact2.get('LastName', '')}".strip()
+def _merge_exact_duplicates(exact_duplicates, claude_duplicates):
+    """Exact pairs plus Claude's pairs, leaving out any pair already matched exactly"""
+    exact_pairs = {frozenset((dup['contact_id_1'], dup['contact_id_2'])) for dup in exact_duplicates}
+    return exact_duplicates + [
+        dup for dup in claude_duplicates
+        if frozenset((dup.get('contact_id_1'), dup.get('contact_id_2'))) not in exact_pairs
+    ]
 
-    score1 = len(name1)
-    score2 = len(name2)
 
-    if contact1.get('Phone'): score1 += 10
-    if contact2.get('Phone'): score2 += 10
-    if contact1.get('Title'): score1 += 10
-    if contact2.get('Title'): score2 += 10
+def _exact_match_keys(contact):
+    """Normalized email and full-name keys that identify the same person outright"""
+    get = contact.get
+    keys = set()
 
-    return name1 if score1 >= score2 else name2
+    email = (get('Email') or '').strip().lower()
+    if email:
+        keys.add(('email', email))
 
+    first = (get('FirstName') or '').strip().lower()
+    last = (get('LastName') or '').strip().lower()
+    if first and last:
+        keys.add(('name', first, last))
 
-def generate_justification(contact, other_contact, is_suggested_delete):
-    """Generate narrative justification for duplicate marking"""
-    name1 = f"{contact.get('FirstName', '')} {contact.get('LastName', '')}".strip()
-    name2 = f"{other_contact.get('FirstName', '')} {other_contact.get('LastName', '')}".strip()
+    return keys
 
-    has_phone = bool(contact.get('Phone'))
-    has_title = bool(contact.get('Title'))
-    is_bounced = bool(contact.get('EmailBouncedReason'))
 
-    other_has_phone = bool(other_contact.get('Phone'))
-    other_has_title = bool(other_contact.get('Title'))
+def _pack_accounts(accounts):
+    """
+    Split an owner's accounts into Claude requests.
+    Large accounts go alone and small ones are packed together.
+
+    Args:
+        accounts: account_id -> contacts to analyze (at least 2 each)
 
-    if is_suggested_delete:
-        parts = []
+    Returns:
+        list: Packs, each a list of (account_id, account_name, formatted_contacts)
+    """
+    packs = []
+    pack = []
+    pack_contacts = 0
 
-        if name1 != name2:
-            if name1.lower() == name2.lower():
-                parts.append(f"Name capitalization differs from '{name2}'")
-            else:
-                parts.append(f"Likely typo/variant of '{name2}'")
+    for account_id, account_contacts in accounts.items():
+        contact_count = len(account_contacts)
+
+        entry = (
+            account_id,
+            account_contacts[0].get('AccountName', 'Unknown'),
+            _format_contacts_for_claude(account_contacts)
+        )
+
+        if contact_count >= SOLO_ACCOUNT_MIN_CONTACTS:
+            packs.append([entry])
+            continue
 
-        missing = []
-        if not has_phone and other_has_phone:
-            missing.append("phone")
-        if not has_title and other_has_title:
-            missing.append("title")
+        if pack and (len(pack) >= ACCOUNTS_PER_PROMPT or pack_contacts + contact_count > CONTACTS_PER_PROMPT):
+            packs.append(pack)
+            pack = []
+            pack_contacts = 0
 
-        if missing:
-            parts.append(f"missing {' and '.join(missing)}")
+        pack.append(entry)
+        pack_contacts += contact_count
 
-        if is_bounced:
-            parts.append("email bounced")
+    if pack:
+        packs.append(pack)
 
-        if not parts:
-            parts.append("less complete than other record")
+    return packs
 
-        justification = "; ".join(parts).capitalize()
-    else:
-        parts = []
 
-        has_data = []
-        if has_phone:
-            has_data.append("phone")
-        if has_title:
-            has_data.append("title")
+def _pack_label(pack):
+    """Account names in a pack, for error messages"""
+    return ", ".join(account_name for _, account_name, _ in pack)
 
-        if has_data:
-            parts.append(f"Has {' and '.join(has_data)}")
 
-        if name1 != name2 and len(name1) > len(name2):
-            parts.append("more complete name")
+def _tag_pack_duplicates(results, owner_id, pack):
+    """Tag and flatten the per-account results of one pack"""
+    duplicates = []
+    for account_id, account_name, _ in pack:
+        result = results.get(account_id)
+        if result:
+            duplicates.extend(_tag_duplicates(result, owner_id, account_id, account_name))
+    return duplicates
 
-        if not is_bounced:
-            parts.append("valid email")
 
-        if not parts:
-            parts.append("More complete record")
+def _group_contacts_by_account(owner_contacts):
+    """Group an owner's contacts by AccountId"""
+    contacts_by_account = defaultdict(list)
+    for contact in owner_contacts:
+        account_id = contact.get('AccountId', 'NO_ACCOUNT')
+        contacts_by_account[account_id].append(contact)
+    return contacts_by_account
+
+
+def _format_contacts_for_claude(account_contacts):
+    """Format an account's contacts for the duplicate-detection prompt"""
+    return [
+        {
+            'Id': c['Id'],
+            'Name': f"{c.get('FirstName', '')} {c.get('LastName', '')}".strip(),
+            'Email': c.get('Email', ''),
+            'Phone': c.get('Phone', ''),
+            'MobilePhone': c.get('MobilePhone', ''),
+            'Title': c.get('Title', ''),
+            'LastModified': c.get('LastModifiedDate', '')
+        }
+        for c in account_contacts
+    ]
 
-        justification = "; ".join(parts)
 
-    return justification[:255]
+def _tag_duplicates(result, owner_id, account_id, account_name):
+    """Add owner and account context to each duplicate pair returned by Claude"""
+    duplicates = result.get('duplicates', [])
+    for dup in duplicates:
+        dup['owner_id'] = owner_id
+        dup['account_id'] = account_id
+        dup['account_name'] = account_name
+    return duplicates
 
 
 # ============================================================================
@@ -388,7 +704,7 @@ def mark_duplicates_for_review(duplicate_pairs, contacts_dict):
     Uses LangSmith tracing wrapper for QA validation.
 
     Args:
-        duplicate_pairs: List of detected duplicate pairs
+        duplicate_pairs: Iterable of detected duplicate pairs
         contacts_dict: Contact lookup by ID
 
     Returns:
@@ -415,3 +731,66 @@ def update_salesforce_contacts(sf, updates, batch_size=200):
         dict: Success/error counts
     """
     return traced_salesforce_update(sf, updates, batch_size)
+
+
+# Contact IDs per current-value query when diffing updates (the IDs go in the
+# GET URI, which Salesforce caps at about 16 KB)
+UPDATE_DIFF_CHUNK_SIZE = 200
+
+# Stamped on every update, so not a reason to send one
+_UPDATE_STAMP_FIELDS = frozenset(('Id', 'email_last_updated_date__c'))
+
+
+def merge_updates_by_id(*update_lists):
+    """
+    Combine update payloads into one per contact; for a contact in several
+    lists, fields from later lists win (pass duplicate marking last so its
+    Email_Status__c replaces the validation status).
+
+    Returns:
+        list: One update payload per contact ID, in first-seen order
+    """
+    merged = {}
+    for updates in update_lists:
+        for update in updates:
+            merged.setdefault(update['Id'], {}).update(update)
+    return list(merged.values())
+
+
+def filter_changed_updates(sf, updates):
+    """
+    Drop updates whose fields already hold the target values in Salesforce,
+    so re-runs and partial-failure retries only send what still differs.
+    Falls back to the full list if the current values can't be queried.
+
+    Args:
+        sf: Salesforce connection object
+        updates: List of contact update payloads
+
+    Returns:
+        list: Updates that still change at least one field
+    """
+    if not updates:
+        return updates
+
+    fields = sorted({field for update in updates for field in update} - _UPDATE_STAMP_FIELDS)
+    if not fields:
+        return updates
+
+    current = {}
+    try:
+        for chunk in _batched(dict.fromkeys(update['Id'] for update in updates), UPDATE_DIFF_CHUNK_SIZE):
+            id_list = "','".join(chunk)
+            query = f"SELECT Id, {', '.join(fields)} FROM Contact WHERE Id IN ('{id_list}')"
+            for record in sf.query_all_iter(query):
+                current[record['Id']] = record
+    except SalesforceError as e:
+        print(f"[WARNING] Could not read current contact values, sending all updates: {str(e)[:100]}")
+        return updates
+
+    return [
+        update for update in updates
+        if update['Id'] not in current
+        or any(value != current[update['Id']].get(field)
+               for field, value in update.items() if field not in _UPDATE_STAMP_FIELDS)
+    ]
@@ -4,11 +4,18 @@ Extracts SFDC contacts, validates emails from activities, detects duplicates usi
 """
 
 from simple_salesforce import Salesforce
-import json
+import atexit
+import logging
+import logging.handlers
+import orjson
 import os
+import queue
+import re
+import sys
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 # Load credentials
 load_dotenv()
@@ -18,6 +25,34 @@ SF_PASSWORD = os.getenv('SF_PASSWORD')
 SF_SECURITY_TOKEN = os.getenv('SF_SECURITY_TOKEN')
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
 
+logger = logging.getLogger(__name__)
+
+# Activity keyword matchers (case-insensitive substring search)
+BOUNCE_RE = re.compile(r'bounce|failed|undeliverable|invalid', re.IGNORECASE)
+SEND_RE = re.compile(r'sent|delivered|completed', re.IGNORECASE)
+
+# Contact IDs per activity query, and how many chunk queries run at once
+ACTIVITY_QUERY_CHUNK_SIZE = 200
+ACTIVITY_QUERY_WORKERS = 4
+
+
+def start_background_logging():
+    """
+    Route log output through a queue drained by a background thread, so
+    progress messages never block extraction on a slow stdout pipe.
+    """
+    log_queue = queue.Queue(-1)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    # Flush whatever is still queued on exit
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+
 
 def connect_to_salesforce():
     """Connect to Salesforce"""
@@ -27,15 +62,15 @@ def connect_to_salesforce():
             password=SF_PASSWORD,
             security_token=SF_SECURITY_TOKEN
         )
-        print("[OK] Connected to Salesforce")
+        logger.info("[OK] Connected to Salesforce")
         return sf
     except Exception as e:
-        print(f"[ERROR] Connection failed: {e}")
+        logger.error(f"[ERROR] Connection failed: {e}")
         return None
 
 
-def extract_contacts(sf):
-    """Extract contacts with custom fields and Account data"""
+def iter_contacts(sf):
+    """Stream contacts with custom fields and Account data, flattening each record as it arrives"""
     query = """
         SELECT Id, FirstName, LastName, Email, Phone, MobilePhone, Title,
                AccountId, Account.Name, LastModifiedDate,
@@ -47,22 +82,22 @@ def extract_contacts(sf):
         ORDER BY Account.Name, LastName, FirstName
     """
 
-    try:
-        result = sf.query(query)
-        contacts = result['records']
-        print(f"[OK] Retrieved {len(contacts)} contacts")
-
+    # query_all_iter follows nextRecordsUrl, so results past the first page are included
+    for contact in sf.query_all_iter(query):
         # Clean up nested Account field
-        for contact in contacts:
-            if contact.get('Account'):
-                contact['AccountName'] = contact['Account']['Name']
-                del contact['Account']
-            else:
-                contact['AccountName'] = 'No Account'
+        account = contact.pop('Account', None)
+        contact['AccountName'] = account['Name'] if account else 'No Account'
+        yield contact
+
 
+def extract_contacts(sf):
+    """Extract contacts with custom fields and Account data"""
+    try:
+        contacts = list(iter_contacts(sf))
+        logger.info(f"[OK] Retrieved {len(contacts)} contacts")
         return contacts
     except Exception as e:
-        print(f"[ERROR] Query failed: {e}")
+        logger.error(f"[ERROR] Query failed: {e}")
         return []
 
 
@@ -70,20 +105,80 @@ def extract_email_activities(sf, contact_ids, days_back=90):
     """Extract email activity data for contacts (last N days)"""
 
     # Simplified queries without date filter (can add back if needed)
-    # Convert contact IDs to comma-separated string for SOQL IN clause
-    id_list = "','".join(contact_ids)
+    # Query in chunks of IDs so each SOQL IN clause stays small, running the
+    # chunk queries concurrently
+    chunks = [contact_ids[i:i + ACTIVITY_QUERY_CHUNK_SIZE]
+              for i in range(0, len(contact_ids), ACTIVITY_QUERY_CHUNK_SIZE)]
+    if not chunks:
+        return {}
+
+    activities = defaultdict(list)
+
+    with ThreadPoolExecutor(max_workers=min(ACTIVITY_QUERY_WORKERS, len(chunks))) as executor:
+        # Try EmailMessage first (if org has email tracking enabled)
+        email_results = list(executor.map(lambda chunk: query_email_messages(sf, chunk), chunks))
+        if all(records is None for records in email_results):
+            logger.info("  EmailMessage query skipped")
+        else:
+            email_count = 0
+            for records in email_results:
+                for record in records or ():
+                    email_count += 1
+                    activities[record['RelatedToId']].append({
+                        'type': 'EmailMessage',
+                        'status': record.get('Status'),
+                        'date': record.get('MessageDate') or record.get('CreatedDate'),
+                        'subject': record.get('Subject')
+                    })
+            if email_count > 0:
+                logger.info(f"[OK] Found {email_count} EmailMessage records")
+            else:
+                logger.info("  No EmailMessage records found")
+
+        # Try Task objects
+        task_results = list(executor.map(lambda chunk: query_email_tasks(sf, chunk), chunks))
+        if all(records is None for records in task_results):
+            logger.info("  Task query skipped")
+        else:
+            task_count = 0
+            for records in task_results:
+                for record in records or ():
+                    task_count += 1
+                    activities[record['WhoId']].append({
+                        'type': 'Task',
+                        'status': record.get('Status'),
+                        'date': record.get('CreatedDate'),
+                        'subject': record.get('Subject'),
+                        'description': record.get('Description', '')
+                    })
+            if task_count > 0:
+                logger.info(f"[OK] Found {task_count} email Task records")
+            else:
+                logger.info("  No email Task records found")
+
+    return dict(activities)
+
 
-    # Query EmailMessage objects (if org has email tracking enabled)
+def query_email_messages(sf, contact_ids):
+    """Fetch EmailMessage records for one chunk of contact IDs (None if the query fails)"""
+    id_list = "','".join(contact_ids)
     email_query = f"""
         SELECT Id, RelatedToId, Status, CreatedDate, MessageDate,
                HasAttachment, Incoming, Subject
         FROM EmailMessage
         WHERE RelatedToId IN ('{id_list}')
         ORDER BY CreatedDate DESC
-        LIMIT 1000
     """
+    try:
+        return list(sf.query_all_iter(email_query))
+    except Exception as e:
+        logger.warning(f"  EmailMessage query failed: {str(e)[:100]}")
+        return None
 
-    # Query Task objects for email tasks
+
+def query_email_tasks(sf, contact_ids):
+    """Fetch email Task records for one chunk of contact IDs (None if the query fails)"""
+    id_list = "','".join(contact_ids)
     task_query = f"""
         SELECT Id, WhoId, Subject, Status, ActivityDate, CreatedDate,
                TaskSubtype, Description
@@ -91,49 +186,12 @@ def extract_email_activities(sf, contact_ids, days_back=90):
         WHERE WhoId IN ('{id_list}')
         AND TaskSubtype = 'Email'
         ORDER BY CreatedDate DESC
-        LIMIT 1000
     """
-
-    activities = defaultdict(list)
-
-    # Try EmailMessage first
-    try:
-        result = sf.query(email_query)
-        if result['totalSize'] > 0:
-            print(f"[OK] Found {result['totalSize']} EmailMessage records")
-            for record in result['records']:
-                contact_id = record['RelatedToId']
-                activities[contact_id].append({
-                    'type': 'EmailMessage',
-                    'status': record.get('Status'),
-                    'date': record.get('MessageDate') or record.get('CreatedDate'),
-                    'subject': record.get('Subject')
-                })
-        else:
-            print("  No EmailMessage records found")
-    except Exception as e:
-        print(f"  EmailMessage query skipped: {str(e)[:100]}")
-
-    # Try Task objects
     try:
-        result = sf.query(task_query)
-        if result['totalSize'] > 0:
-            print(f"[OK] Found {result['totalSize']} email Task records")
-            for record in result['records']:
-                contact_id = record['WhoId']
-                activities[contact_id].append({
-                    'type': 'Task',
-                    'status': record.get('Status'),
-                    'date': record.get('CreatedDate'),
-                    'subject': record.get('Subject'),
-                    'description': record.get('Description', '')
-                })
-        else:
-            print("  No email Task records found")
+        return list(sf.query_all_iter(task_query))
     except Exception as e:
-        print(f"  Task query skipped: {str(e)[:100]}")
-
-    return dict(activities)
+        logger.warning(f"  Task query failed: {str(e)[:100]}")
+        return None
 
 
 def validate_email_from_activities(contact, activities):
@@ -154,18 +212,18 @@ def validate_email_from_activities(contact, activities):
     bounces = []
     successful_sends = []
 
+    bounce_search = BOUNCE_RE.search
+    send_search = SEND_RE.search
+
     for activity in contact_activities:
-        status = activity.get('status', '').lower()
-        description = activity.get('description', '').lower()
+        status = activity.get('status') or ''
 
         # Check for bounce indicators
-        if any(keyword in status or keyword in description
-               for keyword in ['bounce', 'failed', 'undeliverable', 'invalid']):
+        if bounce_search(status) or bounce_search(activity.get('description') or ''):
             bounces.append(activity['date'])
 
         # Check for successful sends
-        elif any(keyword in status
-                for keyword in ['sent', 'delivered', 'completed']):
+        elif send_search(status):
             successful_sends.append(activity['date'])
 
     # Determine status (most recent activity wins)
@@ -201,25 +259,27 @@ def group_contacts_by_account(contacts):
         account_id = contact.get('AccountId', 'NO_ACCOUNT')
         grouped[account_id].append(contact)
 
-    print(f"[OK] Grouped contacts into {len(grouped)} accounts")
+    logger.info(f"[OK] Grouped contacts into {len(grouped)} accounts")
 
     # Show distribution
     for account_id, account_contacts in list(grouped.items())[:5]:
         account_name = account_contacts[0].get('AccountName', 'Unknown')
-        print(f"  {account_name}: {len(account_contacts)} contacts")
+        logger.info(f"  {account_name}: {len(account_contacts)} contacts")
 
     return dict(grouped)
 
 
 def save_checkpoint(data, filename):
     """Save intermediate data"""
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=2, default=str)
-    print(f"[OK] Saved checkpoint to {filename}")
+    with open(filename, 'wb') as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str))
+    logger.info(f"[OK] Saved checkpoint to {filename}")
 
 
 if __name__ == '__main__':
-    print("=== PHASE 1: Data Extraction ===\n")
+    start_background_logging()
+
+    logger.info("=== PHASE 1: Data Extraction ===\n")
 
     # Connect
     sf = connect_to_salesforce()
@@ -229,16 +289,16 @@ if __name__ == '__main__':
     # Extract contacts
     contacts = extract_contacts(sf)
     if not contacts:
-        print("No contacts found")
+        logger.info("No contacts found")
         exit(1)
 
     # Extract activities
-    print("\nExtracting email activities...")
+    logger.info("\nExtracting email activities...")
     contact_ids = [c['Id'] for c in contacts]
     activities = extract_email_activities(sf, contact_ids)
 
     # Group by account
-    print("\nGrouping contacts by account...")
+    logger.info("\nGrouping contacts by account...")
     grouped_contacts = group_contacts_by_account(contacts)
 
     # Save checkpoint
@@ -252,7 +312,7 @@ if __name__ == '__main__':
     }
     save_checkpoint(checkpoint_data, 'phase1_extraction.json')
 
-    print("\n[OK] Phase 1 complete! Data extracted and grouped.")
-    print(f"  Total contacts: {len(contacts)}")
-    print(f"  Contacts with activity: {len(activities)}")
-    print(f"  Accounts: {len(grouped_contacts)}")
+    logger.info("\n[OK] Phase 1 complete! Data extracted and grouped.")
+    logger.info(f"  Total contacts: {len(contacts)}")
+    logger.info(f"  Contacts with activity: {len(activities)}")
+    logger.info(f"  Accounts: {len(grouped_contacts)}")
@@ -4,20 +4,29 @@ Provides REST API and WebSocket endpoints for production deployment on Railway.a
 """
 
 import asyncio
-import json
 import logging
 import os
+import time
 import uuid
 from datetime import datetime
+from collections import defaultdict
+from itertools import dropwhile, islice
 from typing import Dict, List, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, BackgroundTasks
+import orjson
+import redis.asyncio as aioredis
+
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
+from agent.dedup_agent import close_claude_client, run_agent_workflow
+from agent.tools import test_salesforce_connection
+
 # Load environment variables
 load_dotenv()
 
@@ -28,6 +37,52 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Salesforce I/O from endpoints runs on its own small pool so a slow org can't
+# starve the default executor shared with the agent jobs
+SF_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sf-io")
+HEALTH_SF_TIMEOUT = 3.0
+
+
+# /api/dashboard result, reused for a few seconds and dropped whenever a job changes
+DASHBOARD_CACHE_TTL = 5.0
+_dashboard_cache: Dict[str, Any] = {"value": None, "expires": 0.0}
+
+# Seconds between server-sent WebSocket pings
+WEBSOCKET_PING_INTERVAL = 15.0
+
+# Job statuses after which a job never changes again
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+# Job updates are coalesced and sent at most once per interval (latest state wins)
+BROADCAST_INTERVAL = 0.1
+
+# Second-precision timestamp for responses, formatted at most once per second
+_timestamp_cache: Dict[str, Any] = {"second": None, "value": ""}
+
+
+def _now_iso() -> str:
+    """Current local time as an ISO string (second precision)"""
+    second = int(time.time())
+    if second != _timestamp_cache["second"]:
+        _timestamp_cache["second"] = second
+        _timestamp_cache["value"] = datetime.fromtimestamp(second).isoformat()
+    return _timestamp_cache["value"]
+
+
+def invalidate_dashboard():
+    """Force the next dashboard request to recompute its metrics"""
+    _dashboard_cache["expires"] = 0.0
+
+
+def _dumps(payload: Dict) -> str:
+    """Serialize a WebSocket message (orjson also handles datetimes natively)"""
+    return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS, default=str).decode()
+
+
+def _job_message(message_type: str, job_id: str, encoded_job: str) -> str:
+    """Wrap an already-serialized job in a WebSocket message envelope"""
+    return f'{{"type":"{message_type}","job_id":{orjson.dumps(job_id).decode()},"data":{encoded_job}}}'
+
 # ============================================================================
 # Pydantic Models
 # ============================================================================
@@ -97,116 +152,444 @@ class HealthResponse(BaseModel):
     langsmith_configured: bool
 
 # ============================================================================
-# Job State Management (In-Memory)
+# Job State Management (In-Memory, or Redis when REDIS_URL is set)
 # ============================================================================
 
+def _new_job_state(job_id: str, config: StartJobRequest) -> Dict:
+    """Initial state of a freshly created job"""
+    return {
+        "job_id": job_id,
+        "status": "pending",
+        "config": config.dict(),
+        "progress": {
+            "phase": "initializing",
+            "current_step": 0,
+            "total_steps": 7,
+            "message": "Job created"
+        },
+        "metrics": {
+            "total_contacts": 0,
+            "total_owners": 0,
+            "emails_validated": 0,
+            "duplicates_found": 0,
+            "sfdc_updates": 0
+        },
+        "phase_details": {
+            # Stores detailed data for each completed phase
+            # e.g. "phase_1_connect": {...}, "phase_2_extract": {...}
+        },
+        "pending_approval": None,
+        "results": None,
+        "error": None,
+        "created_at": datetime.now().isoformat(),
+        "updated_at": datetime.now().isoformat()
+    }
+
+
 class JobManager:
     """Manages job state and lifecycle"""
 
     def __init__(self):
         self.jobs: Dict[str, Dict] = {}
         self.websocket_clients: Dict[str, List[WebSocket]] = {}
-        self.lock = asyncio.Lock()
+        self.approval_events: Dict[str, asyncio.Event] = {}
+        # One lock per job so updates to independent jobs never wait on each other;
+        # a lock only exists while some coroutine holds or waits for it
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self._lock_users: Dict[str, int] = {}
+        # Latest unsent update per job, flushed by the broadcast loop
+        self._pending_updates: Dict[str, Any] = {}
+        self._broadcaster: Optional[asyncio.Task] = None
+        # Serialized job state for jobs with connected clients, dropped on every change
+        self._encoded_jobs: Dict[str, str] = {}
 
     async def create_job(self, config: StartJobRequest) -> str:
         """Create a new job"""
         job_id = str(uuid.uuid4())
 
-        async with self.lock:
-            self.jobs[job_id] = {
-                "job_id": job_id,
-                "status": "pending",
-                "config": config.dict(),
-                "progress": {
-                    "phase": "initializing",
-                    "current_step": 0,
-                    "total_steps": 7,
-                    "message": "Job created"
-                },
-                "metrics": {
-                    "total_contacts": 0,
-                    "total_owners": 0,
-                    "emails_validated": 0,
-                    "duplicates_found": 0,
-                    "sfdc_updates": 0
-                },
-                "phase_details": {
-                    # Stores detailed data for each completed phase
-                    # e.g. "phase_1_connect": {...}, "phase_2_extract": {...}
-                },
-                "pending_approval": None,
-                "results": None,
-                "error": None,
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat()
-            }
+        async with self._job_lock(job_id):
+            self.jobs[job_id] = _new_job_state(job_id, config)
             self.websocket_clients[job_id] = []
+        invalidate_dashboard()
 
         logger.info(f"Created job {job_id}")
         return job_id
 
     async def update_job(self, job_id: str, updates: Dict):
         """Update job state"""
-        async with self.lock:
+        async with self._job_lock(job_id):
             if job_id not in self.jobs:
                 raise ValueError(f"Job {job_id} not found")
 
             self.jobs[job_id].update(updates)
             self.jobs[job_id]["updated_at"] = datetime.now().isoformat()
+            self._encoded_jobs.pop(job_id, None)
+        invalidate_dashboard()
 
         # Notify WebSocket clients
         await self.broadcast_update(job_id, self.jobs[job_id])
 
+        if updates.get("status") in TERMINAL_STATUSES:
+            self._release_job(job_id)
+
+    def _release_job(self, job_id: str):
+        """Drop the approval event once a job has finished"""
+        self.approval_events.pop(job_id, None)
+
+    @asynccontextmanager
+    async def _job_lock(self, job_id: str):
+        """Hold the job's lock, dropping it once nothing else holds or waits for it"""
+        lock = self.locks.get(job_id)
+        if lock is None:
+            lock = self.locks[job_id] = asyncio.Lock()
+        self._lock_users[job_id] = self._lock_users.get(job_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            users = self._lock_users.pop(job_id) - 1
+            if users:
+                self._lock_users[job_id] = users
+            else:
+                del self.locks[job_id]
+
     async def get_job(self, job_id: str) -> Optional[Dict]:
         """Get job state"""
-        async with self.lock:
+        # Unknown IDs return early so lookups don't create locks for them
+        if job_id not in self.jobs:
+            return None
+        async with self._job_lock(job_id):
             return self.jobs.get(job_id)
 
-    async def list_jobs(self) -> List[Dict]:
-        """List all jobs"""
-        async with self.lock:
-            return list(self.jobs.values())
+    async def get_encoded_job(self, job_id: str) -> Optional[str]:
+        """Serialized job state, reused until the job next changes (None if unknown)"""
+        encoded = self._encoded_jobs.get(job_id)
+        if encoded is None:
+            job = await self.get_job(job_id)
+            if job is None:
+                return None
+            encoded = _dumps(job)
+            # Only worth keeping while this process has clients watching the job
+            if self.websocket_clients.get(job_id):
+                self._encoded_jobs[job_id] = encoded
+        return encoded
+
+    async def list_jobs(self, limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict]:
+        """
+        List jobs newest first, optionally only `limit` of them created before
+        the `before` job (a shallow snapshot; no lock needed on a single event loop)
+        """
+        if before is not None and before not in self.jobs:
+            return []
+
+        # Jobs are stored in creation order
+        jobs = reversed(self.jobs.values())
+        if before is not None:
+            jobs = dropwhile(lambda job: job["job_id"] != before, jobs)
+            next(jobs)  # the cursor job itself
+        return list(jobs if limit is None else islice(jobs, limit))
+
+    async def submit_approval(self, job_id: str, decision: Dict):
+        """Record an approval decision and wake the waiting job"""
+        await self.update_job(job_id, {
+            "approval_decision": decision,
+            "status": "running"  # Resume job
+        })
+
+        # Only a job waiting in await_approval has an event to wake
+        event = self.approval_events.get(job_id)
+        if event is not None:
+            event.set()
+
+    async def await_approval(self, job_id: str, pending: Dict, timeout: float) -> Optional[Dict]:
+        """Publish a pending approval and wait for the decision (None on timeout)"""
+        async with self._job_lock(job_id):
+            event = self.approval_events.setdefault(job_id, asyncio.Event())
+            # Drop any earlier signal so this stage waits for its own decision
+            event.clear()
+
+        await self.update_job(job_id, {
+            "status": "awaiting_approval",
+            "pending_approval": pending
+        })
+
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+        job = await self.get_job(job_id)
+        return job.get("approval_decision") if job else None
 
     async def add_websocket(self, job_id: str, websocket: WebSocket):
         """Add WebSocket client for job updates"""
-        async with self.lock:
+        async with self._job_lock(job_id):
             if job_id not in self.websocket_clients:
                 self.websocket_clients[job_id] = []
             self.websocket_clients[job_id].append(websocket)
 
     async def remove_websocket(self, job_id: str, websocket: WebSocket):
         """Remove WebSocket client"""
-        async with self.lock:
+        async with self._job_lock(job_id):
             if job_id in self.websocket_clients:
                 try:
                     self.websocket_clients[job_id].remove(websocket)
                 except ValueError:
                     pass
+                if not self.websocket_clients[job_id]:
+                    self._encoded_jobs.pop(job_id, None)
+
+        # Drop a finished (or unknown) job's client list with its last client
+        if not self.websocket_clients.get(job_id):
+            job = await self.get_job(job_id)
+            if job is None or job.get("status") in TERMINAL_STATUSES:
+                self.websocket_clients.pop(job_id, None)
+                self._release_job(job_id)
+
+    async def start(self):
+        """Start the broadcast loop"""
+        self._broadcaster = asyncio.create_task(self._broadcast_loop())
+
+    async def stop(self):
+        """Stop the broadcast loop, sending any updates still pending"""
+        if self._broadcaster:
+            self._broadcaster.cancel()
+            try:
+                await self._broadcaster
+            except asyncio.CancelledError:
+                pass
+        await self._flush_updates()
 
     async def broadcast_update(self, job_id: str, data: Dict):
-        """Broadcast update to all WebSocket clients for this job"""
-        if job_id not in self.websocket_clients:
+        """Queue an update for this job's WebSocket clients (sent on the next tick)"""
+        if not self.websocket_clients.get(job_id):
             return
 
-        # Create a copy of the client list to avoid modification during iteration
-        async with self.lock:
-            clients = self.websocket_clients[job_id].copy()
+        # Only the latest state is kept; earlier unsent updates are dropped
+        self._pending_updates[job_id] = data
+
+    async def _broadcast_loop(self):
+        while True:
+            await asyncio.sleep(BROADCAST_INTERVAL)
+            await self._flush_updates()
+
+    async def _flush_updates(self):
+        """Send every pending update, one serialization per job"""
+        if not self._pending_updates:
+            return
+
+        pending, self._pending_updates = self._pending_updates, {}
+        results = await asyncio.gather(
+            *(self._send_update(job_id, data) for job_id, data in pending.items()),
+            return_exceptions=True
+        )
+        for job_id, result in zip(pending, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error broadcasting update for job {job_id}: {result}")
+
+    async def _send_update(self, job_id: str, data: Dict):
+        # Serialize once for all clients (and for later initial_state messages)
+        encoded = await self.get_encoded_job(job_id)
+        if encoded is not None:
+            await self._send_to_clients(job_id, _job_message("job_update", job_id, encoded))
+
+    async def _send_to_clients(self, job_id: str, message: str):
+        """Send a serialized message to this process's WebSocket clients for a job"""
+        clients = self.websocket_clients.get(job_id)
+        if not clients:
+            return
+
+        # Copy the client list to avoid modification during iteration (no await, so no lock)
+        clients = clients.copy()
+
+        # Send to all clients concurrently; one slow or dead socket doesn't hold up the rest
+        results = await asyncio.gather(
+            *(websocket.send_text(message) for websocket in clients),
+            return_exceptions=True
+        )
+
+        for websocket, result in zip(clients, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error sending WebSocket message: {result}")
+                await self.remove_websocket(job_id, websocket)
 
-        message = json.dumps({
-            "type": "job_update",
-            "job_id": job_id,
-            "data": data
+
+class RedisJobManager(JobManager):
+    """
+    JobManager backed by Redis so several replicas can serve the same jobs.
+    Each job is a hash with one orjson-encoded value per top-level field.
+    Updates and approval decisions are published on pub/sub channels; every
+    replica forwards updates to its own WebSocket clients and wakes its own
+    approval waiters.
+    """
+
+    JOB_IDS_KEY = "jobs:created"  # sorted set of job IDs scored by creation time
+    JOB_QUEUE_KEY = "dedup:jobs"
+    PROCESSING_KEY_PREFIX = "dedup:jobs:processing:"  # + worker ID; jobs a worker has taken
+    UPDATES_CHANNEL = "job-updates"
+    APPROVALS_CHANNEL = "job-approvals"
+
+    def __init__(self, redis_url: str):
+        super().__init__()
+        self.redis = aioredis.Redis.from_url(redis_url)
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _job_key(job_id: str) -> str:
+        return f"job:{job_id}"
+
+    async def _save_fields(self, job_id: str, fields: Dict):
+        await self.redis.hset(self._job_key(job_id), mapping={
+            field: orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS, default=str)
+            for field, value in fields.items()
         })
 
-        for websocket in clients:
+    @staticmethod
+    def _decode_job(raw: Dict[bytes, bytes]) -> Optional[Dict]:
+        if not raw:
+            return None
+        return {field.decode(): orjson.loads(value) for field, value in raw.items()}
+
+    async def create_job(self, config: StartJobRequest) -> str:
+        """Create a new job"""
+        job_id = str(uuid.uuid4())
+
+        await self._save_fields(job_id, _new_job_state(job_id, config))
+        await self.redis.zadd(self.JOB_IDS_KEY, {job_id: time.time()})
+        self.websocket_clients.setdefault(job_id, [])
+        invalidate_dashboard()
+
+        logger.info(f"Created job {job_id}")
+        return job_id
+
+    async def update_job(self, job_id: str, updates: Dict):
+        """Update job state"""
+        if not await self.redis.exists(self._job_key(job_id)):
+            raise ValueError(f"Job {job_id} not found")
+
+        # Only the changed fields are written, so concurrent updates from other
+        # replicas to other fields are never overwritten
+        await self._save_fields(job_id, {**updates, "updated_at": datetime.now().isoformat()})
+        self._encoded_jobs.pop(job_id, None)
+
+        # Notify WebSocket clients on every replica (coalesced by the broadcast loop)
+        self._pending_updates[job_id] = None
+
+        if updates.get("status") in TERMINAL_STATUSES:
+            self._release_job(job_id)
+
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        """Get job state"""
+        return self._decode_job(await self.redis.hgetall(self._job_key(job_id)))
+
+    async def list_jobs(self, limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict]:
+        """List jobs newest first, optionally only `limit` of them created before the `before` job"""
+        if before is None:
+            job_ids = await self.redis.zrevrange(self.JOB_IDS_KEY, 0, -1 if limit is None else limit - 1)
+        else:
+            created = await self.redis.zscore(self.JOB_IDS_KEY, before)
+            if created is None:
+                return []
+            job_ids = await self.redis.zrevrangebyscore(
+                self.JOB_IDS_KEY, f"({created}", "-inf",
+                start=0 if limit is not None else None, num=limit
+            )
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for job_id in job_ids:
+                pipe.hgetall(self._job_key(job_id.decode()))
+            raw_jobs = await pipe.execute()
+
+        return [job for job in map(self._decode_job, raw_jobs) if job]
+
+    async def enqueue_job(self, job_id: str):
+        """Queue a job for a worker process (see worker.py)"""
+        await self.redis.lpush(self.JOB_QUEUE_KEY, job_id)
+
+    async def next_queued_job(self, worker_id: str, timeout: float) -> Optional[str]:
+        """
+        Move the oldest queued job ID onto this worker's processing list, waiting
+        up to timeout seconds (None if none arrived). It stays there until
+        finish_queued_job, so a crash mid-job doesn't lose it.
+        """
+        job_id = await self.redis.blmove(
+            self.JOB_QUEUE_KEY, self.PROCESSING_KEY_PREFIX + worker_id, timeout, "RIGHT", "LEFT"
+        )
+        return job_id.decode() if job_id else None
+
+    async def finish_queued_job(self, worker_id: str, job_id: str):
+        """Drop a job this worker has finished from its processing list"""
+        await self.redis.lrem(self.PROCESSING_KEY_PREFIX + worker_id, 1, job_id)
+
+    async def requeue_unfinished_jobs(self, worker_id: str) -> int:
+        """Put jobs a previous run of this worker took but never finished back at the front of the queue"""
+        count = 0
+        # Newest first onto the consuming end, so the oldest is picked up first
+        while await self.redis.lmove(self.PROCESSING_KEY_PREFIX + worker_id, self.JOB_QUEUE_KEY, "LEFT", "RIGHT"):
+            count += 1
+        return count
+
+    async def submit_approval(self, job_id: str, decision: Dict):
+        """Record an approval decision and wake the waiting job, wherever it runs"""
+        await self.update_job(job_id, {
+            "approval_decision": decision,
+            "status": "running"  # Resume job
+        })
+        await self.redis.publish(self.APPROVALS_CHANNEL, job_id)
+
+    async def _send_update(self, job_id: str, data: Optional[Dict]):
+        # Publish the job's current state once for all replicas
+        encoded = await self.get_encoded_job(job_id)
+        message = _job_message("job_update", job_id, encoded or "null")
+        await self.redis.publish(self.UPDATES_CHANNEL, f"{job_id} {message}")
+
+    async def start(self):
+        """Subscribe to update and approval messages from all replicas"""
+        self._pubsub = self.redis.pubsub()
+        await self._pubsub.subscribe(self.UPDATES_CHANNEL, self.APPROVALS_CHANNEL)
+        self._listener = asyncio.create_task(self._listen())
+        await super().start()
+
+    async def stop(self):
+        """Stop listening and close the Redis connections"""
+        await super().stop()
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        if self._pubsub:
+            await self._pubsub.aclose()
+        await self.redis.aclose()
+
+    async def _listen(self):
+        async for message in self._pubsub.listen():
+            if message["type"] != "message":
+                continue
             try:
-                await websocket.send_text(message)
+                channel = message["channel"].decode()
+                data = message["data"].decode()
+
+                if channel == self.APPROVALS_CHANNEL:
+                    # Only the replica running the job is waiting on it
+                    event = self.approval_events.get(data)
+                    if event is not None:
+                        event.set()
+                else:
+                    job_id, job_message = data.split(" ", 1)
+                    # The job changed on some replica; re-read it on next use
+                    self._encoded_jobs.pop(job_id, None)
+                    invalidate_dashboard()
+                    await self._send_to_clients(job_id, job_message)
             except Exception as e:
-                logger.error(f"Error sending WebSocket message: {e}")
-                await self.remove_websocket(job_id, websocket)
+                logger.error(f"Error handling Redis message: {e}")
 
-# Initialize job manager
-job_manager = JobManager()
+
+# Initialize job manager (Redis-backed when REDIS_URL is set, e.g. by Railway's Redis plugin)
+REDIS_URL = os.getenv("REDIS_URL")
+job_manager = RedisJobManager(REDIS_URL) if REDIS_URL else JobManager()
 
 # ============================================================================
 # Agent Runner (Async wrapper around existing agent)
@@ -236,9 +619,6 @@ async def run_agent_job(job_id: str):
             }
         })
 
-        # Import agent here to avoid circular imports
-        from agent.dedup_agent import run_agent_workflow
-
         # Run the agent workflow in a thread pool to avoid blocking
         loop = asyncio.get_event_loop()
         result = await loop.run_in_executor(
@@ -246,7 +626,8 @@ async def run_agent_job(job_id: str):
             run_agent_workflow,
             job_id,
             config,
-            job_manager  # Pass job_manager for progress updates
+            job_manager,  # Pass job_manager for progress updates
+            loop  # Progress updates are dispatched back onto this loop
         )
 
         # Update job with results
@@ -284,10 +665,14 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting SFDC Deduplication Agent API")
     logger.info(f"Environment: {os.getenv('RAILWAY_ENVIRONMENT', 'local')}")
+    logger.info(f"Job state: {'redis' if REDIS_URL else 'in-memory'}")
+    await job_manager.start()
 
     yield
 
     # Shutdown
+    await job_manager.stop()
+    await asyncio.to_thread(close_claude_client)
     logger.info("Shutting down SFDC Deduplication Agent API")
 
 app = FastAPI(
@@ -331,17 +716,19 @@ async def health_check():
     sf_connected = False
     if sf_configured:
         try:
-            from agent.tools import test_salesforce_connection
-            sf_connected = await asyncio.get_event_loop().run_in_executor(
-                None, test_salesforce_connection
+            sf_connected = await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(SF_EXECUTOR, test_salesforce_connection),
+                timeout=HEALTH_SF_TIMEOUT
             )
+        except asyncio.TimeoutError:
+            logger.warning(f"Salesforce connection test timed out after {HEALTH_SF_TIMEOUT}s")
         except Exception as e:
             logger.warning(f"Salesforce connection test failed: {e}")
 
     return HealthResponse(
         status="healthy" if sf_configured and claude_configured else "degraded",
         version="1.0.0",
-        timestamp=datetime.now().isoformat(),
+        timestamp=_now_iso(),
         salesforce_connected=sf_connected,
         claude_api_configured=claude_configured,
         langsmith_configured=langsmith_configured
@@ -355,8 +742,12 @@ async def start_dedup_job(request: StartJobRequest, background_tasks: Background
         # Create job
         job_id = await job_manager.create_job(request)
 
-        # Run agent in background
-        background_tasks.add_task(run_agent_job, job_id)
+        # With Redis, a worker process picks the job up from the queue;
+        # otherwise run the agent in the background of this process
+        if isinstance(job_manager, RedisJobManager):
+            await job_manager.enqueue_job(job_id)
+        else:
+            background_tasks.add_task(run_agent_job, job_id)
 
         return StartJobResponse(
             job_id=job_id,
@@ -389,10 +780,15 @@ async def get_job_status(job_id: str):
     )
 
 @app.get("/api/dedup/jobs")
-async def list_jobs():
-    """List all jobs"""
-    jobs = await job_manager.list_jobs()
-    return {"jobs": jobs}
+async def list_jobs(
+    limit: int = Query(100, ge=1, le=1000),
+    before: Optional[str] = Query(None, description="Cursor: return jobs created before this job ID")
+):
+    """List jobs newest first, one page at a time"""
+    jobs = await job_manager.list_jobs(limit, before)
+    # A full page may have more behind it; pass next_cursor back as `before`
+    next_cursor = jobs[-1]["job_id"] if len(jobs) == limit else None
+    return {"jobs": jobs, "next_cursor": next_cursor}
 
 @app.get("/api/dedup/{job_id}/phase/{phase_name}")
 async def get_phase_details(job_id: str, phase_name: str):
@@ -432,14 +828,11 @@ async def approve_decision(request: ApprovalRequest):
             detail=f"Job is not awaiting approval (current status: {job['status']})"
         )
 
-    # Store approval decision
-    await job_manager.update_job(request.job_id, {
-        "approval_decision": {
-            "approved": request.approved,
-            "rejected_pairs": request.rejected_pairs or [],
-            "timestamp": datetime.now().isoformat()
-        },
-        "status": "running"  # Resume job
+    # Store approval decision and resume the job
+    await job_manager.submit_approval(request.job_id, {
+        "approved": request.approved,
+        "rejected_pairs": request.rejected_pairs or [],
+        "timestamp": datetime.now().isoformat()
     })
 
     return ApprovalResponse(
@@ -448,6 +841,35 @@ async def approve_decision(request: ApprovalRequest):
         message=f"Decision {'approved' if request.approved else 'rejected'} successfully"
     )
 
+# Phase 2 contact lookups per job; phase 2 data never changes once written, so
+# indexes are built on first use and kept for the most recent jobs
+CONTACT_INDEX_CACHE_SIZE = 16
+_contact_indexes: Dict[str, tuple] = {}
+
+
+def _get_contact_indexes(job_id: str, phase_2_data: Dict) -> tuple:
+    """Return (contacts_by_id, contacts_by_prefix) for a job's phase 2 contacts"""
+    indexes = _contact_indexes.get(job_id)
+    if indexes is not None:
+        return indexes
+
+    contacts_list = phase_2_data.get("contacts", [])
+    contacts_by_id = {c["id"]: c for c in contacts_list}
+
+    # Also create case-insensitive prefix lookup for Salesforce ID variations
+    # SFDC IDs can be 15 or 18 chars, case variations exist
+    # (first 15 chars, case-insensitive, as key)
+    contacts_by_prefix = {c["id"][:15].upper(): c for c in contacts_list}
+
+    indexes = (contacts_by_id, contacts_by_prefix)
+    # Only cache once phase 2 has produced its contacts
+    if contacts_list:
+        if len(_contact_indexes) >= CONTACT_INDEX_CACHE_SIZE:
+            _contact_indexes.pop(next(iter(_contact_indexes)))
+        _contact_indexes[job_id] = indexes
+    return indexes
+
+
 @app.get("/api/dedup/pending/{job_id}", response_model=PendingApproval)
 async def get_pending_approval(job_id: str):
     """Get pending approval details for a job"""
@@ -470,18 +892,10 @@ async def get_pending_approval(job_id: str):
             # Phase 4 format: {contact_id_1, contact_id_2, confidence, reasoning, account_name}
             # Need to transform to: {contact_1: {id, name, email}, contact_2: {...}}
 
-            # Get contact details from phase_2
-            phase_2_data = phase_details.get("phase_2_extract", {})
-            contacts_list = phase_2_data.get("contacts", [])
-            contacts_by_id = {c["id"]: c for c in contacts_list}
-
-            # Also create case-insensitive prefix lookup for Salesforce ID variations
-            # SFDC IDs can be 15 or 18 chars, case variations exist
-            contacts_by_prefix = {}
-            for c in contacts_list:
-                # Use first 15 chars (case-insensitive) as key
-                prefix = c["id"][:15].upper()
-                contacts_by_prefix[prefix] = c
+            # Get contact details from phase_2 (indexed once per job)
+            contacts_by_id, contacts_by_prefix = _get_contact_indexes(
+                job_id, phase_details.get("phase_2_extract", {})
+            )
 
             def find_contact(contact_id):
                 """Find contact by ID, trying exact match then prefix match"""
@@ -492,6 +906,8 @@ async def get_pending_approval(job_id: str):
                 prefix = contact_id[:15].upper() if contact_id else ""
                 return contacts_by_prefix.get(prefix, {})
 
+            # Pairs are built from our own stored data, so skip per-model validation
+            # (FastAPI still checks the whole response once against response_model)
             duplicate_pairs = []
             for pair in phase_4_data["duplicate_pairs"]:
                 contact_1_id = pair.get("contact_id_1")
@@ -500,7 +916,7 @@ async def get_pending_approval(job_id: str):
                 contact_1_data = find_contact(contact_1_id)
                 contact_2_data = find_contact(contact_2_id)
 
-                duplicate_pairs.append(DuplicatePair(
+                duplicate_pairs.append(DuplicatePair.model_construct(
                     pair_id=f"{contact_1_id}_{contact_2_id}",
                     account_name=pair.get("account_name", "Unknown"),
                     confidence=pair.get("confidence", "unknown"),
@@ -522,7 +938,7 @@ async def get_pending_approval(job_id: str):
                     }
                 ))
 
-            return PendingApproval(
+            return PendingApproval.model_construct(
                 job_id=job_id,
                 stage="duplicate_review",
                 total_updates=len(duplicate_pairs),
@@ -536,9 +952,9 @@ async def get_pending_approval(job_id: str):
             detail=f"No pending approval or duplicates found for job {job_id}"
         )
 
-    # Standard path: use pending_approval data with decisions
+    # Standard path: use pending_approval data with decisions (unvalidated, as above)
     duplicate_pairs = [
-        DuplicatePair(
+        DuplicatePair.model_construct(
             pair_id=f"{d['contact_1']['id']}_{d['contact_2']['id']}",
             account_name=d.get("account_name", "Unknown"),
             confidence=d.get("confidence", "unknown"),
@@ -550,7 +966,7 @@ async def get_pending_approval(job_id: str):
         for d in approval_data.get("decisions", [])
     ]
 
-    return PendingApproval(
+    return PendingApproval.model_construct(
         job_id=job_id,
         stage=approval_data.get("stage", "unknown"),
         total_updates=approval_data.get("total_updates", 0),
@@ -562,28 +978,42 @@ async def get_pending_approval(job_id: str):
 async def get_dashboard_metrics():
     """Get dashboard metrics across all jobs"""
 
-    jobs = await job_manager.list_jobs()
+    if time.monotonic() < _dashboard_cache["expires"]:
+        return _dashboard_cache["value"]
 
-    total_contacts = sum(j["metrics"].get("total_contacts", 0) for j in jobs)
-    total_duplicates = sum(j["metrics"].get("duplicates_found", 0) for j in jobs)
+    jobs = await job_manager.list_jobs()
 
-    # Calculate total cost from job results
+    # Single pass over all jobs
+    status_counts = defaultdict(int)
+    total_contacts = 0
+    total_duplicates = 0
     total_cost = 0.0
     for job in jobs:
-        if job.get("results") and job["results"].get("cost_summary"):
-            total_cost += job["results"]["cost_summary"].get("total_cost", 0.0)
+        status_counts[job["status"]] += 1
+        metrics = job["metrics"]
+        total_contacts += metrics.get("total_contacts", 0)
+        total_duplicates += metrics.get("duplicates_found", 0)
 
-    return DashboardMetrics(
+        # Calculate total cost from job results
+        results = job.get("results")
+        if results and results.get("cost_summary"):
+            total_cost += results["cost_summary"].get("total_cost", 0.0)
+
+    dashboard = DashboardMetrics(
         total_jobs=len(jobs),
-        active_jobs=len([j for j in jobs if j["status"] in ["pending", "running", "awaiting_approval"]]),
-        completed_jobs=len([j for j in jobs if j["status"] == "completed"]),
-        failed_jobs=len([j for j in jobs if j["status"] == "failed"]),
+        active_jobs=status_counts["pending"] + status_counts["running"] + status_counts["awaiting_approval"],
+        completed_jobs=status_counts["completed"],
+        failed_jobs=status_counts["failed"],
         total_contacts_processed=total_contacts,
         total_duplicates_found=total_duplicates,
         total_cost=total_cost,
         last_updated=datetime.now().isoformat()
     )
 
+    _dashboard_cache["value"] = dashboard
+    _dashboard_cache["expires"] = time.monotonic() + DASHBOARD_CACHE_TTL
+    return dashboard
+
 @app.websocket("/ws/updates/{job_id}")
 async def websocket_updates(websocket: WebSocket, job_id: str):
     """WebSocket endpoint for real-time job updates"""
@@ -592,23 +1022,42 @@ async def websocket_updates(websocket: WebSocket, job_id: str):
     await job_manager.add_websocket(job_id, websocket)
 
     try:
-        # Send initial job state
-        job = await job_manager.get_job(job_id)
-        if job:
-            await websocket.send_text(json.dumps({
-                "type": "initial_state",
-                "job_id": job_id,
-                "data": job
-            }))
-
-        # Keep connection alive and listen for client messages
-        while True:
-            data = await websocket.receive_text()
-            # Echo back (can be used for heartbeat)
-            await websocket.send_text(json.dumps({
-                "type": "pong",
-                "timestamp": datetime.now().isoformat()
-            }))
+        # Send initial job state (serialized once per job change, not per connection)
+        encoded_job = await job_manager.get_encoded_job(job_id)
+        if encoded_job is not None:
+            await websocket.send_text(_job_message("initial_state", job_id, encoded_job))
+
+        async def heartbeat():
+            # Server-driven keepalive so idle sockets stay dormant between pings
+            while True:
+                await asyncio.sleep(WEBSOCKET_PING_INTERVAL)
+                await websocket.send_text(_dumps({
+                    "type": "ping",
+                    "timestamp": _now_iso()
+                }))
+
+        async def receiver():
+            # Listen for client messages; only answer explicit pings
+            while True:
+                data = await websocket.receive_text()
+                if data.strip().lower() == "ping":
+                    await websocket.send_text(_dumps({
+                        "type": "pong",
+                        "timestamp": _now_iso()
+                    }))
+
+        # Whichever side ends first (usually a disconnect) stops the other
+        tasks = {asyncio.create_task(heartbeat()), asyncio.create_task(receiver())}
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        # Surface the finished side's error (e.g. WebSocketDisconnect) to the handlers below
+        for task in done:
+            task.result()
 
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for job {job_id}")
@@ -653,7 +1102,7 @@ async def http_exception_handler(request, exc):
         content={
             "error": exc.detail,
             "status_code": exc.status_code,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         }
     )
 
@@ -665,7 +1114,7 @@ async def general_exception_handler(request, exc):
         content={
             "error": "Internal server error",
             "message": str(exc),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         }
     )
 
@@ -3,11 +3,14 @@ PHASE 2: Email Validation & SFDC Update
 Validates emails from activities and updates custom fields
 """
 
-from simple_salesforce import Salesforce
-import json
+import orjson
 import os
+import re
 from dotenv import load_dotenv
 from datetime import datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from sf_session import connect_with_cached_session
 
 # Load credentials
 load_dotenv()
@@ -16,16 +19,37 @@ SF_USERNAME = os.getenv('SF_USERNAME')
 SF_PASSWORD = os.getenv('SF_PASSWORD')
 SF_SECURITY_TOKEN = os.getenv('SF_SECURITY_TOKEN')
 
+# Completed email tasks = successful send (case-insensitive substring search)
+SEND_RE = re.compile(r'completed|sent|delivered', re.IGNORECASE)
+
+# Bulk update batches in flight at once (kept low for Salesforce API limits)
+UPDATE_WORKERS = 5
+
+
+class ContactRow:
+    """The contact fields email validation reads (slotted, no per-contact dict)"""
+    __slots__ = ("Id", "EmailBouncedReason", "EmailBouncedDate", "Email_Status__c")
+
+    def __init__(self, contact):
+        self.Id = contact['Id']
+        self.EmailBouncedReason = contact.get('EmailBouncedReason')
+        self.EmailBouncedDate = contact.get('EmailBouncedDate')
+        self.Email_Status__c = contact.get('Email_Status__c')
+
+
+def format_date(date_str):
+    """Trim a datetime string to its date part"""
+    if not date_str:
+        return None
+    # If it's already a datetime string, extract just the date part
+    return date_str[:10] if len(date_str) > 10 else date_str
+
 
 def connect_to_salesforce():
-    """Connect to Salesforce"""
+    """Connect to Salesforce, reusing the cached session from an earlier run"""
     try:
-        sf = Salesforce(
-            username=SF_USERNAME,
-            password=SF_PASSWORD,
-            security_token=SF_SECURITY_TOKEN
-        )
-        print("[OK] Connected to Salesforce")
+        sf, cached = connect_with_cached_session(SF_USERNAME, SF_PASSWORD, SF_SECURITY_TOKEN)
+        print("[OK] Connected to Salesforce" + (" (cached session)" if cached else ""))
         return sf
     except Exception as e:
         print(f"[ERROR] Connection failed: {e}")
@@ -34,69 +58,67 @@ def connect_to_salesforce():
 
 def load_checkpoint(filename='phase1_extraction.json'):
     """Load data from Phase 1"""
-    with open(filename, 'r') as f:
-        data = json.load(f)
+    with open(filename, 'rb') as f:
+        data = orjson.loads(f.read())
+    # Keep only the fields validation needs; the raw contact dicts are released
+    data['contacts'] = [ContactRow(c) for c in data['contacts']]
     print(f"[OK] Loaded checkpoint from {filename}")
     return data
 
 
-def validate_email_from_activities(contact, activities):
+def validate_email_from_activities(contact, activities, today=None):
     """Determine email status from SFDC standard bounce fields and activity history"""
 
-    # Helper to format dates
-    def format_date(date_str):
-        if not date_str:
-            return None
-        # If it's already a datetime string, extract just the date part
-        return date_str[:10] if len(date_str) > 10 else date_str
+    if today is None:
+        today = datetime.now().strftime('%Y-%m-%d')
 
     # Check SFDC standard bounce fields FIRST (most reliable)
-    has_bounced = contact.get('EmailBouncedReason')
-    bounce_date = contact.get('EmailBouncedDate')
+    has_bounced = contact.EmailBouncedReason
+    bounce_date = contact.EmailBouncedDate
 
     if has_bounced:
         # Email has bounced according to SFDC
         return {
             'Email_Status__c': 'Invalid',
-            'email_last_updated_date__c': datetime.now().strftime('%Y-%m-%d'),
-            'Email_Bounced_Date__c': format_date(bounce_date) if bounce_date else datetime.now().strftime('%Y-%m-%d'),
+            'email_last_updated_date__c': today,
+            'Email_Bounced_Date__c': format_date(bounce_date) if bounce_date else today,
             'Email_Verified_Date__c': None
         }
 
     # If no bounce, check activity history for successful sends
-    contact_id = contact['Id']
+    contact_id = contact.Id
     contact_activities = activities.get(contact_id, [])
 
     if not contact_activities:
         # No bounce and no activity = Unknown
         return {
             'Email_Status__c': 'Unknown',
-            'email_last_updated_date__c': datetime.now().strftime('%Y-%m-%d'),
+            'email_last_updated_date__c': today,
             'Email_Bounced_Date__c': None,
             'Email_Verified_Date__c': None
         }
 
-    # Look for successful sends in activities
-    successful_sends = []
-    for activity in contact_activities:
-        status = activity.get('status', '').lower()
-        # Completed email tasks = successful send
-        if 'completed' in status or 'sent' in status or 'delivered' in status:
-            successful_sends.append(activity['date'])
+    # Latest successful send in activities
+    send_search = SEND_RE.search
+    latest_send = max(
+        (activity['date'] for activity in contact_activities
+         if send_search(activity.get('status') or '')),
+        default=None
+    )
 
-    if successful_sends:
+    if latest_send is not None:
         # Has successful send activity and no bounce
         return {
             'Email_Status__c': 'Valid',
-            'email_last_updated_date__c': datetime.now().strftime('%Y-%m-%d'),
+            'email_last_updated_date__c': today,
             'Email_Bounced_Date__c': None,
-            'Email_Verified_Date__c': format_date(max(successful_sends))
+            'Email_Verified_Date__c': format_date(latest_send)
         }
 
     # Has activity but can't determine status
     return {
         'Email_Status__c': 'Unknown',
-        'email_last_updated_date__c': datetime.now().strftime('%Y-%m-%d'),
+        'email_last_updated_date__c': today,
         'Email_Bounced_Date__c': None,
         'Email_Verified_Date__c': None
     }
@@ -105,16 +127,17 @@ def validate_email_from_activities(contact, activities):
 def prepare_updates(contacts, activities):
     """Prepare update payloads for all contacts"""
     updates = []
+    today = datetime.now().strftime('%Y-%m-%d')
 
     for contact in contacts:
-        validation_result = validate_email_from_activities(contact, activities)
+        validation_result = validate_email_from_activities(contact, activities, today)
 
         # Only update if status changed or fields are empty
-        current_status = contact.get('Email_Status__c')
+        current_status = contact.Email_Status__c
 
         if current_status != validation_result['Email_Status__c'] or not current_status:
             update_payload = {
-                'Id': contact['Id'],
+                'Id': contact.Id,
                 **validation_result
             }
             updates.append(update_payload)
@@ -133,29 +156,36 @@ def batch_update_contacts(sf, updates, batch_size=200):
     success_count = 0
     errors = []
 
-    # Process in batches
-    for i in range(0, len(updates), batch_size):
-        batch = updates[i:i + batch_size]
-
+    def update_batch(i):
+        # Use bulk update; failures are returned so one batch can't stop the rest
         try:
-            # Use bulk update
-            results = sf.bulk.Contact.update(batch)
-
-            for idx, result in enumerate(results):
-                if result['success']:
-                    success_count += 1
-                else:
-                    errors.append({
-                        'contact_id': batch[idx]['Id'],
-                        'error': result.get('errors', 'Unknown error')
-                    })
-
+            return sf.bulk.Contact.update(updates[i:i + batch_size]), None
         except Exception as e:
-            print(f"[ERROR] Batch update failed: {e}")
+            return None, e
+
+    # Process in batches, several round-trips at a time
+    starts = range(0, len(updates), batch_size)
+    with ThreadPoolExecutor(max_workers=min(UPDATE_WORKERS, len(starts))) as executor:
+        batch_results = list(executor.map(update_batch, starts))
+
+    for i, (results, error) in zip(starts, batch_results):
+        if error is not None:
+            print(f"[ERROR] Batch update failed: {error}")
             errors.append({
                 'batch': f"{i}-{i+batch_size}",
-                'error': str(e)
+                'error': str(error)
             })
+            continue
+
+        batch = updates[i:i + batch_size]
+        for idx, result in enumerate(results):
+            if result['success']:
+                success_count += 1
+            else:
+                errors.append({
+                    'contact_id': batch[idx]['Id'],
+                    'error': result.get('errors', 'Unknown error')
+                })
 
     print(f"[OK] Successfully updated {success_count} contacts")
 
@@ -167,11 +197,7 @@ def batch_update_contacts(sf, updates, batch_size=200):
 
 def summarize_updates(updates):
     """Show summary of what will be updated"""
-    status_counts = {'Valid': 0, 'Invalid': 0, 'Unknown': 0}
-
-    for update in updates:
-        status = update.get('Email_Status__c', 'Unknown')
-        status_counts[status] = status_counts.get(status, 0) + 1
+    status_counts = Counter(update.get('Email_Status__c', 'Unknown') for update in updates)
 
     print("\n=== Update Summary ===")
     print(f"  Total contacts to update: {len(updates)}")
@@ -221,8 +247,8 @@ if __name__ == '__main__':
         'timestamp': datetime.now().isoformat()
     }
 
-    with open('phase2_update_results.json', 'w') as f:
-        json.dump(result_data, f, indent=2, default=str)
+    with open('phase2_update_results.json', 'wb') as f:
+        f.write(orjson.dumps(result_data, option=orjson.OPT_INDENT_2, default=str))
 
     print("\n[OK] Phase 2 complete!")
     print(f"  Updated: {len(updates) - len(errors)} contacts")
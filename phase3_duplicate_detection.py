@@ -3,21 +3,115 @@ PHASE 3: Duplicate Detection using Claude AI
 Detects potential duplicates within each account
 """
 
+import asyncio
+import hashlib
+import io
 import json
+import orjson
 import os
+import re
+import time
 from dotenv import load_dotenv
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic, NotFoundError
 from collections import defaultdict
+from difflib import SequenceMatcher
+from itertools import combinations
 
 # Load credentials
 load_dotenv()
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
 
+# Name / email local-part similarity for a pair to be worth asking Claude about
+CANDIDATE_SIMILARITY = 0.8
+
+# Accounts analyzed at once, and SDK retries (exponential backoff on 429s / overload)
+CLAUDE_CONCURRENCY = 10
+CLAUDE_MAX_RETRIES = 5
+
+# Candidate pairs classified per Claude request
+PAIRS_PER_PROMPT = 50
+
+# From this many Claude requests on, submit them as one Message Batch (half price)
+BATCH_MIN_REQUESTS = 4
+BATCH_POLL_INTERVAL = 30
+
+# Static rubric, sent as the system prompt. With the tool schema it is still well
+# under Haiku's 2048-token minimum for prompt caching, so it is not marked cacheable.
+DUPLICATE_RULES = """You are reviewing candidate pairs of Salesforce contacts to identify DUPLICATE RECORDS OF THE SAME PERSON.
+Both contacts in a pair belong to the same account.
+
+CRITICAL: Only flag contacts as duplicates if they are likely THE SAME PERSON with multiple records.
+
+DO NOT flag as duplicates:
+- Different people who work at the same company
+- Different people who share a company phone number
+- Colleagues with different names, emails, and titles
+
+DO flag as duplicates if you see:
+1. **Name variations of same person**: "Ben Fry" vs "Benjamin Fry", "Bob Smith" vs "Robert Smith", "Jon" vs "Jonathan"
+2. **Name typos**: "Ben Fry" vs "Ben Frye" (especially if titles/roles are similar)
+3. **Email variations for same person**: "ben.fry@gmail.com" vs "benjamin.fry@yahoo.com" (same person, different emails)
+4. **Email typos**: "john.smith@acme.com" vs "jon.smith@acme.com" (likely typo in first name)
+5. **Same person with updated info**: Similar names with one record clearly newer/more complete
+
+You will receive a JSON array of candidate pairs, each with a pair_id, the account name, contact_a and contact_b.
+
+For each pair that IS the same person, provide:
+- pair_id: The pair_id you were given
+- confidence: "high", "medium", or "low"
+- reasoning: Why you think they're THE SAME PERSON (be specific)
+
+Leave out pairs that are different people. Report the duplicate pairs with the report_duplicates tool. If no duplicates found, report an empty list.
+
+Example of VALID duplicate:
+{
+  "pair_id": "p3",
+  "confidence": "high",
+  "reasoning": "Same last name (Fry), first name variation (Ben vs Benjamin), similar email patterns (ben.fry vs benjamin.fry). Likely the same person with two email addresses."
+}"""
+
+# Per-request user message; only the candidate pairs change between requests
+PAIR_PROMPT_TEMPLATE = """Here are the candidate pairs:
+
+{pairs_json}"""
+
+# Claude is forced to answer through this tool, so the verdicts arrive as parsed JSON
+DUPLICATE_TOOL = {
+    "name": "report_duplicates",
+    "description": "Report the candidate pairs that are the same person.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "duplicates": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "pair_id": {"type": "string"},
+                        "confidence": {"type": "string", "enum": ["high", "medium", "low"]},
+                        "reasoning": {"type": "string"}
+                    },
+                    "required": ["pair_id", "confidence", "reasoning"]
+                }
+            }
+        },
+        "required": ["duplicates"]
+    }
+}
+
+# Claude verdicts keyed by candidate-pair hash, so re-runs on unchanged pairs skip the API.
+# Appended to as each request is answered, so an interrupted run keeps its progress
+RESPONSE_CACHE_FILE = '.claude_cache.jsonl'
+RESPONSE_CACHE_TTL = 7 * 24 * 60 * 60
+
+# Message Batch still in flight, so a restarted run collects it instead of paying for it again
+BATCH_STATE_FILE = '.claude_batch.json'
+
 
 def load_checkpoint(filename='phase1_extraction.json'):
     """Load data from Phase 1"""
-    with open(filename, 'r') as f:
-        data = json.load(f)
+    with open(filename, 'rb') as f:
+        data = orjson.loads(f.read())
     print(f"[OK] Loaded checkpoint from {filename}")
     return data
 
@@ -46,175 +140,454 @@ def format_contact_for_comparison(contact):
     }
 
 
-def detect_duplicates_in_account(account_name, contacts, client):
-    """Use Claude to detect duplicates within an account"""
+def _normalize(value):
+    """Lowercase and keep only letters and digits"""
+    return re.sub(r'[^a-z0-9]', '', (value or '').lower())
 
-    if len(contacts) < 2:
-        return []  # No duplicates possible with < 2 contacts
 
-    # Format contacts for Claude
-    formatted_contacts = [format_contact_for_comparison(c) for c in contacts]
+def _match_fields(contact):
+    """Normalized (first name, last name, email local part) of a contact"""
+    return (
+        _normalize(contact.get('FirstName')),
+        _normalize(contact.get('LastName')),
+        _normalize((contact.get('Email') or '').split('@')[0])
+    )
 
-    prompt = f"""You are analyzing contacts from the Salesforce account "{account_name}" to identify DUPLICATE RECORDS OF THE SAME PERSON.
 
-Here are the contacts:
+def generate_blocks(contacts):
+    """Group contacts sharing a cheap blocking key: last name, first-name prefix or email name part"""
+    blocks = defaultdict(list)
 
-{json.dumps(formatted_contacts, indent=2)}
+    for contact in contacts:
+        first, last, _ = _match_fields(contact)
+        if last:
+            blocks[('last', last)].append(contact)
+        if first:
+            # Prefix catches nicknames like Ben/Benjamin and Jon/Jonathan
+            blocks[('first', first[:3])].append(contact)
+        # Each name part of the email (john.smith -> john, smith) so typos in one part still block
+        email_local = (contact.get('Email') or '').split('@')[0].lower()
+        for part in set(re.split(r'[^a-z0-9]+', email_local)):
+            if len(part) >= 3:
+                blocks[('email', part)].append(contact)
+
+    return [block for block in blocks.values() if len(block) > 1]
+
+
+def _is_candidate_pair(contact1, contact2):
+    """Cheap local check that two blocked contacts could be the same person"""
+    first1, last1, local1 = _match_fields(contact1)
+    first2, last2, local2 = _match_fields(contact2)
+
+    if last1 and last1 == last2:
+        return True
+    if SequenceMatcher(None, f"{first1} {last1}", f"{first2} {last2}").ratio() >= CANDIDATE_SIMILARITY:
+        return True
+    return bool(local1 and local2) and SequenceMatcher(None, local1, local2).ratio() >= CANDIDATE_SIMILARITY
+
+
+def find_candidate_pairs(contacts):
+    """Contact pairs worth sending to Claude (most accounts have none)"""
+    seen = set()
+    pairs = []
+
+    for block in generate_blocks(contacts):
+        for contact1, contact2 in combinations(block, 2):
+            key = frozenset((contact1['Id'], contact2['Id']))
+            if key in seen:
+                continue
+            seen.add(key)
+            if _is_candidate_pair(contact1, contact2):
+                pairs.append((contact1, contact2))
+
+    return pairs
+
+
+def build_candidate_pairs(grouped_contacts):
+    """Candidate pairs across all accounts, as (account_id, account_name, contact1, contact2)"""
+    pairs = []
 
-CRITICAL: Only flag contacts as duplicates if they are likely THE SAME PERSON with multiple records.
+    for account_id, contacts in grouped_contacts.items():
+        if len(contacts) < 2:
+            continue  # No duplicates possible with < 2 contacts
 
-DO NOT flag as duplicates:
-- Different people who work at the same company
-- Different people who share a company phone number
-- Colleagues with different names, emails, and titles
+        account_name = contacts[0].get('AccountName', 'Unknown')
+        for contact1, contact2 in find_candidate_pairs(contacts):
+            pairs.append((account_id, account_name, contact1, contact2))
 
-DO flag as duplicates if you see:
-1. **Name variations of same person**: "Ben Fry" vs "Benjamin Fry", "Bob Smith" vs "Robert Smith", "Jon" vs "Jonathan"
-2. **Name typos**: "Ben Fry" vs "Ben Frye" (especially if titles/roles are similar)
-3. **Email variations for same person**: "ben.fry@gmail.com" vs "benjamin.fry@yahoo.com" (same person, different emails)
-4. **Email typos**: "john.smith@acme.com" vs "jon.smith@acme.com" (likely typo in first name)
-5. **Same person with updated info**: Similar names with one record clearly newer/more complete
+    return pairs
 
-For each potential duplicate pair you find, provide:
-- contact_id_1: ID of first contact
-- contact_id_2: ID of second contact
-- confidence: "high", "medium", or "low"
-- reasoning: Why you think they're THE SAME PERSON (be specific)
 
-Return your response as a JSON array of duplicate pairs. If no duplicates found, return an empty array.
+def format_pair_for_comparison(account_name, contact1, contact2):
+    """Format a candidate pair for Claude"""
+    return {
+        'account': account_name,
+        'contact_a': format_contact_for_comparison(contact1),
+        'contact_b': format_contact_for_comparison(contact2)
+    }
+
 
-Example of VALID duplicate:
-[
-  {{
-    "contact_id_1": "003xxx1",
-    "contact_id_2": "003xxx2",
-    "confidence": "high",
-    "reasoning": "Same last name (Fry), first name variation (Ben vs Benjamin), similar email patterns (ben.fry vs benjamin.fry). Likely the same person with two email addresses."
-  }}
-]
+def build_pair_request(formatted_pairs):
+    """Claude request params classifying a chunk of pair_id -> formatted pair"""
+    payload = [{'pair_id': pair_id, **pair} for pair_id, pair in formatted_pairs.items()]
 
-IMPORTANT: Return ONLY the JSON array, no additional text."""
+    prompt = PAIR_PROMPT_TEMPLATE.format(
+        pairs_json=orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode()
+    )
 
+    return {
+        'model': "claude-3-5-haiku-20241022",
+        'max_tokens': 4000,
+        'system': DUPLICATE_RULES,
+        'tools': [DUPLICATE_TOOL],
+        'tool_choice': {"type": "tool", "name": DUPLICATE_TOOL['name']},
+        'messages': [{"role": "user", "content": prompt}]
+    }
+
+
+def parse_duplicates(message):
+    """Duplicate pairs from the report_duplicates call in a Claude message"""
+    for block in message.content:
+        if block.type == "tool_use":
+            return block.input.get('duplicates', [])
+    return []
+
+
+def pair_key(formatted_pair):
+    """Stable hash of a candidate pair and the rubric/model that judges it"""
+    keyed = {'model': "claude-3-5-haiku-20241022", 'rules': DUPLICATE_RULES, 'pair': formatted_pair}
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True).encode()).hexdigest()
+
+
+def load_response_cache():
+    """Load cached Claude verdicts, dropping expired entries"""
+    try:
+        with open(RESPONSE_CACHE_FILE, 'rb') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return {}
+
+    cutoff = time.time() - RESPONSE_CACHE_TTL
+    cache = {}
+    for line in lines:
+        try:
+            entry = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            continue  # Partial line from an interrupted run
+        if entry.get('cached_at', 0) >= cutoff:
+            cache[entry['key']] = entry
+
+    # Rewrite without expired/superseded lines so the log doesn't grow forever
+    if len(cache) < len(lines):
+        with open(RESPONSE_CACHE_FILE, 'wb') as f:
+            f.writelines(orjson.dumps(entry) + b"\n" for entry in cache.values())
+
+    return cache
+
+
+def append_response_cache(cache_log, keyed_verdicts):
+    """Append (key, verdict) pairs to the open cache log and flush them to disk"""
+    now = time.time()
+    cache_log.writelines(
+        orjson.dumps({'key': key, 'verdict': verdict, 'cached_at': now}) + b"\n"
+        for key, verdict in keyed_verdicts
+    )
+    cache_log.flush()
+
+
+async def request_duplicates(label, params, client):
+    """Send one request to Claude (None if the call failed)"""
     try:
-        response = client.messages.create(
-            model="claude-3-5-haiku-20241022",
-            max_tokens=2000,
-            messages=[{"role": "user", "content": prompt}]
+        response = await client.messages.create(**params)
+        return parse_duplicates(response)
+    except Exception as e:
+        print(f"[ERROR] Claude API call failed for {label}: {e}")
+        return None
+
+
+async def collect_batch(batch, client, labels):
+    """Poll a Message Batch until it ends and return request index -> parsed duplicates"""
+    while batch.processing_status != "ended":
+        await asyncio.sleep(BATCH_POLL_INTERVAL)
+        batch = await client.messages.batches.retrieve(batch.id)
+
+    found = {}
+    async for entry in await client.messages.batches.results(batch.id):
+        i = int(entry.custom_id.split('-', 1)[1])
+
+        if entry.result.type != "succeeded":
+            print(f"[ERROR] Batch request failed for {labels[i]}: {entry.result.type}")
+            continue
+        try:
+            found[i] = parse_duplicates(entry.result.message)
+        except Exception as e:
+            print(f"[ERROR] Could not parse Claude response for {labels[i]}: {e}")
+
+    return found
+
+
+async def detect_duplicates_batch(requests, client, on_submit=None):
+    """
+    Submit every request as one Message Batch, poll until it ends, and
+    return request key -> parsed duplicates (failed requests are left out).
+    on_submit, if given, is called with the batch id once it is created.
+    """
+    # custom_id must be short and alphanumeric, so map request keys by position
+    keys = list(requests)
+    batch = await client.messages.batches.create(requests=[
+        {"custom_id": f"request-{i}", "params": requests[key][1]}
+        for i, key in enumerate(keys)
+    ])
+    if on_submit:
+        on_submit(batch.id)
+    print(f"  Submitted batch {batch.id} ({len(keys)} requests), polling every {BATCH_POLL_INTERVAL}s...")
+
+    found = await collect_batch(batch, client, [requests[key][0] for key in keys])
+    return {keys[i]: duplicates for i, duplicates in found.items()}
+
+
+def chunk_verdicts(pair_ids, duplicates):
+    """pair_id -> verdict for one answered chunk; unlisted pairs are not duplicates (None)"""
+    verdicts = dict.fromkeys(pair_ids)
+    for duplicate in duplicates:
+        if duplicate.get('pair_id') in verdicts:
+            verdicts[duplicate['pair_id']] = {
+                'confidence': duplicate.get('confidence', 'low'),
+                'reasoning': duplicate.get('reasoning', '')
+            }
+    return verdicts
+
+
+async def classify_pairs(formatted_pairs, client, on_verdicts=None, on_batch=None):
+    """
+    Ask Claude about pair_id -> formatted pair in chunks of PAIRS_PER_PROMPT.
+    Returns pair_id -> verdict ({confidence, reasoning}, or None when not a
+    duplicate) for every pair whose request succeeded. on_verdicts, if given,
+    is called with each answered chunk's verdicts as soon as it is parsed;
+    on_batch with the batch id and pair_id chunks when a batch is submitted.
+    """
+    pair_ids = list(formatted_pairs)
+    chunks = [pair_ids[i:i + PAIRS_PER_PROMPT] for i in range(0, len(pair_ids), PAIRS_PER_PROMPT)]
+    requests = {
+        i: (f"pairs {chunk[0]}-{chunk[-1]}", build_pair_request({pair_id: formatted_pairs[pair_id] for pair_id in chunk}))
+        for i, chunk in enumerate(chunks)
+    }
+
+    verdicts = {}
+
+    def record(i, duplicates):
+        answered_chunk = chunk_verdicts(chunks[i], duplicates)
+        verdicts.update(answered_chunk)
+        if on_verdicts:
+            on_verdicts(answered_chunk)
+
+    if len(requests) >= BATCH_MIN_REQUESTS:
+        answered = await detect_duplicates_batch(
+            requests, client,
+            on_submit=on_batch and (lambda batch_id: on_batch(batch_id, chunks))
         )
+        for i, duplicates in answered.items():
+            record(i, duplicates)
+    else:
+        semaphore = asyncio.Semaphore(CLAUDE_CONCURRENCY)
 
-        # Parse Claude's response
-        response_text = response.content[0].text.strip()
+        async def analyze(i, label, params):
+            async with semaphore:
+                duplicates = await request_duplicates(label, params, client)
+            if duplicates is not None:
+                record(i, duplicates)
 
-        # Try to extract JSON from response
-        if response_text.startswith('['):
-            duplicates = json.loads(response_text)
-        else:
-            # Try to find JSON in the response
-            start_idx = response_text.find('[')
-            end_idx = response_text.rfind(']') + 1
-            if start_idx != -1 and end_idx > start_idx:
-                json_str = response_text[start_idx:end_idx]
-                duplicates = json.loads(json_str)
-            else:
-                duplicates = []
+        print(f"  Classifying {len(pair_ids)} pairs in {len(requests)} request(s)...")
+        await asyncio.gather(*(analyze(i, label, params) for i, (label, params) in requests.items()))
 
-        return duplicates
+    return verdicts
 
-    except Exception as e:
-        print(f"[ERROR] Claude API call failed for {account_name}: {e}")
-        return []
 
+def save_batch_state(batch_id, chunks, keys):
+    """Remember a submitted batch and the cache key of every pair_id in each of its requests"""
+    state = {
+        'batch_id': batch_id,
+        'chunks': [[[pair_id, keys[pair_id]] for pair_id in chunk] for chunk in chunks]
+    }
+    with open(BATCH_STATE_FILE, 'wb') as f:
+        f.write(orjson.dumps(state))
 
-def analyze_all_accounts(grouped_contacts, client):
-    """Analyze each account for duplicates"""
 
-    all_duplicates = {}
-    total_pairs = 0
+async def resume_batch(client, cache_log):
+    """
+    Collect the verdicts of a batch left in flight by an interrupted run into the cache log.
+    Returns False if the batch couldn't be collected; its state file is kept for the next run.
+    """
+    try:
+        with open(BATCH_STATE_FILE, 'rb') as f:
+            state = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return True
+
+    print(f"  Resuming batch {state['batch_id']} from an interrupted run...")
+    chunks = [dict(chunk) for chunk in state['chunks']]
+    try:
+        batch = await client.messages.batches.retrieve(state['batch_id'])
+        found = await collect_batch(batch, client, [f"resumed request {i}" for i in range(len(chunks))])
+    except NotFoundError:
+        # Deleted or past results retention: nothing left to collect
+        print(f"[WARNING] Batch {state['batch_id']} no longer exists, its pairs will be re-classified")
+        found = {}
+    except Exception as e:
+        print(f"[ERROR] Could not collect batch {state['batch_id']}: {e}")
+        print(f"[INFO] Kept {BATCH_STATE_FILE}; re-run to collect it once the API is reachable")
+        return False
+
+    for i, duplicates in found.items():
+        keys = chunks[i]
+        append_response_cache(
+            cache_log,
+            ((keys[pair_id], verdict) for pair_id, verdict in chunk_verdicts(keys, duplicates).items())
+        )
+    os.remove(BATCH_STATE_FILE)
+    return True
+
+
+async def analyze_all_accounts(grouped_contacts, client):
+    """
+    Find candidate pairs locally, then have Claude classify them in chunks.
+    Returns None if an interrupted run's batch couldn't be collected.
+    """
 
     print("\n=== Analyzing Accounts for Duplicates ===\n")
 
-    for account_id, contacts in grouped_contacts.items():
-        account_name = contacts[0].get('AccountName', 'Unknown')
+    candidates = build_candidate_pairs(grouped_contacts)
+    print(f"  {len(candidates)} candidate pair(s) across {len(grouped_contacts)} accounts")
+
+    # Pairs unchanged since an earlier run reuse that run's verdict
+    # (a new batch would overwrite the saved state, so stop while one is uncollected)
+    with open(RESPONSE_CACHE_FILE, 'ab') as cache_log:
+        if not await resume_batch(client, cache_log):
+            return None
+    cache = load_response_cache()
+    formatted = {}
+    keys = {}
+    verdicts = {}
+    for i, (_, account_name, contact1, contact2) in enumerate(candidates):
+        pair_id = f"p{i}"
+        formatted[pair_id] = format_pair_for_comparison(account_name, contact1, contact2)
+        keys[pair_id] = pair_key(formatted[pair_id])
+        if keys[pair_id] in cache:
+            verdicts[pair_id] = cache[keys[pair_id]]['verdict']
+
+    if verdicts:
+        print(f"  Reusing cached verdicts for {len(verdicts)} pair(s)")
+
+    pending = {pair_id: pair for pair_id, pair in formatted.items() if pair_id not in verdicts}
+    if pending:
+        # Only answered pairs are cached, so failed requests are retried next run
+        with open(RESPONSE_CACHE_FILE, 'ab') as cache_log:
+            new_verdicts = await classify_pairs(
+                pending, client,
+                on_verdicts=lambda chunk: append_response_cache(
+                    cache_log, ((keys[pair_id], verdict) for pair_id, verdict in chunk.items())
+                ),
+                on_batch=lambda batch_id, chunks: save_batch_state(batch_id, chunks, keys)
+            )
+        verdicts.update(new_verdicts)
+
+        # The batch's verdicts are cached now, so there is nothing left to resume
+        if os.path.exists(BATCH_STATE_FILE):
+            os.remove(BATCH_STATE_FILE)
 
-        if len(contacts) < 2:
-            print(f"  {account_name}: Only 1 contact, skipping")
+    all_duplicates = {}
+    total_pairs = 0
+    for i, (account_id, account_name, contact1, contact2) in enumerate(candidates):
+        verdict = verdicts.get(f"p{i}")
+        if not verdict:
             continue
 
-        print(f"  Analyzing {account_name} ({len(contacts)} contacts)...")
-
-        duplicates = detect_duplicates_in_account(account_name, contacts, client)
+        account = all_duplicates.setdefault(account_id, {
+            'account_name': account_name,
+            'duplicates': []
+        })
+        account['duplicates'].append({
+            'contact_id_1': contact1['Id'],
+            'contact_id_2': contact2['Id'],
+            **verdict
+        })
+        total_pairs += 1
 
-        if duplicates:
-            all_duplicates[account_id] = {
-                'account_name': account_name,
-                'duplicates': duplicates
-            }
-            total_pairs += len(duplicates)
-            print(f"    Found {len(duplicates)} potential duplicate pair(s)")
-        else:
-            print(f"    No duplicates found")
+    for account_id, data in all_duplicates.items():
+        print(f"  {data['account_name']}: {len(data['duplicates'])} potential duplicate pair(s)")
 
     print(f"\n[OK] Analysis complete: {total_pairs} total duplicate pairs found")
 
     return all_duplicates
 
 
+PAIR_TEMPLATE = """### Duplicate Pair #{idx} - {confidence} Confidence
+
+| Field | Contact A | Contact B |
+|-------|-----------|-----------|
+| **Name** | {first1} {last1} | {first2} {last2} |
+| **Email** | {email1} | {email2} |
+| **Phone** | {phone1} | {phone2} |
+| **Mobile** | {mobile1} | {mobile2} |
+| **Title** | {title1} | {title2} |
+| **Last Modified** | {modified1} | {modified2} |
+| **SFDC ID** | `{id1}` | `{id2}` |
+
+**Why this is a duplicate:** {reasoning}
+
+**Action Required:**
+- Review both contacts
+- Reply with which contact ID to KEEP
+- The other will be marked as Email_Status__c = 'Duplicate'
+
+---
+
+"""
+
+
 def generate_slack_report(all_duplicates, contacts_dict):
     """Generate Slack-ready markdown report"""
 
-    report = []
+    report = io.StringIO()
 
-    report.append("# Contact Deduplication Report")
-    report.append(f"Generated: {json.dumps(None, default=str)}")
-    report.append("")
+    report.write("# Contact Deduplication Report\n")
+    report.write(f"Generated: {json.dumps(None, default=str)}\n")
+    report.write("\n")
 
     if not all_duplicates:
-        report.append("No duplicate contacts found.")
-        return "\n".join(report)
+        report.write("No duplicate contacts found.")
+        return report.getvalue()
 
     total_pairs = sum(len(data['duplicates']) for data in all_duplicates.values())
-    report.append(f"**Total Duplicate Pairs Found: {total_pairs}**")
-    report.append("")
+    report.write(f"**Total Duplicate Pairs Found: {total_pairs}**\n")
+    report.write("\n")
 
     # Group by account
     for account_id, data in all_duplicates.items():
-        account_name = data['account_name']
-        duplicates = data['duplicates']
+        report.write(f"## {data['account_name']}\n")
+        report.write("\n")
 
-        report.append(f"## {account_name}")
-        report.append("")
-
-        for idx, pair in enumerate(duplicates, 1):
+        for idx, pair in enumerate(data['duplicates'], 1):
             contact1 = contacts_dict.get(pair['contact_id_1'], {})
             contact2 = contacts_dict.get(pair['contact_id_2'], {})
 
-            report.append(f"### Duplicate Pair #{idx} - {pair['confidence'].upper()} Confidence")
-            report.append("")
-
             # Side by side comparison
-            report.append("| Field | Contact A | Contact B |")
-            report.append("|-------|-----------|-----------|")
-            report.append(f"| **Name** | {contact1.get('FirstName', '')} {contact1.get('LastName', '')} | {contact2.get('FirstName', '')} {contact2.get('LastName', '')} |")
-            report.append(f"| **Email** | {contact1.get('Email', 'N/A')} | {contact2.get('Email', 'N/A')} |")
-            report.append(f"| **Phone** | {contact1.get('Phone', 'N/A')} | {contact2.get('Phone', 'N/A')} |")
-            report.append(f"| **Mobile** | {contact1.get('MobilePhone', 'N/A')} | {contact2.get('MobilePhone', 'N/A')} |")
-            report.append(f"| **Title** | {contact1.get('Title', 'N/A')} | {contact2.get('Title', 'N/A')} |")
-            report.append(f"| **Last Modified** | {contact1.get('LastModifiedDate', 'N/A')} | {contact2.get('LastModifiedDate', 'N/A')} |")
-            report.append(f"| **SFDC ID** | `{pair['contact_id_1']}` | `{pair['contact_id_2']}` |")
-            report.append("")
-
-            report.append(f"**Why this is a duplicate:** {pair['reasoning']}")
-            report.append("")
-
-            report.append("**Action Required:**")
-            report.append("- Review both contacts")
-            report.append("- Reply with which contact ID to KEEP")
-            report.append("- The other will be marked as Email_Status__c = 'Duplicate'")
-            report.append("")
-            report.append("---")
-            report.append("")
-
-    return "\n".join(report)
+            report.write(PAIR_TEMPLATE.format(
+                idx=idx,
+                confidence=pair['confidence'].upper(),
+                first1=contact1.get('FirstName', ''), last1=contact1.get('LastName', ''),
+                first2=contact2.get('FirstName', ''), last2=contact2.get('LastName', ''),
+                email1=contact1.get('Email', 'N/A'), email2=contact2.get('Email', 'N/A'),
+                phone1=contact1.get('Phone', 'N/A'), phone2=contact2.get('Phone', 'N/A'),
+                mobile1=contact1.get('MobilePhone', 'N/A'), mobile2=contact2.get('MobilePhone', 'N/A'),
+                title1=contact1.get('Title', 'N/A'), title2=contact2.get('Title', 'N/A'),
+                modified1=contact1.get('LastModifiedDate', 'N/A'), modified2=contact2.get('LastModifiedDate', 'N/A'),
+                id1=pair['contact_id_1'], id2=pair['contact_id_2'],
+                reasoning=pair['reasoning'],
+            ))
+
+    # Drop the newline after the last line
+    return report.getvalue()[:-1]
 
 
 if __name__ == '__main__':
@@ -238,11 +611,13 @@ if __name__ == '__main__':
     print(f"[OK] Grouped {len(contacts)} contacts into {len(grouped_contacts)} accounts")
 
     # Initialize Claude client
-    client = Anthropic(api_key=ANTHROPIC_API_KEY)
+    client = AsyncAnthropic(api_key=ANTHROPIC_API_KEY, max_retries=CLAUDE_MAX_RETRIES)
     print("[OK] Claude API client initialized")
 
     # Analyze for duplicates
-    all_duplicates = analyze_all_accounts(grouped_contacts, client)
+    all_duplicates = asyncio.run(analyze_all_accounts(grouped_contacts, client))
+    if all_duplicates is None:
+        exit(1)
 
     # Generate report
     print("\nGenerating Slack-ready report...")
@@ -255,8 +630,8 @@ if __name__ == '__main__':
         'timestamp': None  # Will be serialized as string
     }
 
-    with open('phase3_duplicates.json', 'w') as f:
-        json.dump(results, f, indent=2, default=str)
+    with open('phase3_duplicates.json', 'wb') as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2, default=str))
 
     with open('phase3_slack_report.md', 'w') as f:
         f.write(slack_report)
@@ -4,10 +4,12 @@ Updates Email_Status__c = 'Duplicate' for detected duplicate contacts
 """
 
 from simple_salesforce import Salesforce
-import json
+import orjson
 import os
 from dotenv import load_dotenv
 from datetime import datetime
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 # Load credentials
 load_dotenv()
@@ -16,6 +18,10 @@ SF_USERNAME = os.getenv('SF_USERNAME')
 SF_PASSWORD = os.getenv('SF_PASSWORD')
 SF_SECURITY_TOKEN = os.getenv('SF_SECURITY_TOKEN')
 
+# Bulk API batch limit and number of batches submitted concurrently
+UPDATE_BATCH_SIZE = 10000
+UPDATE_WORKERS = 6
+
 
 def connect_to_salesforce():
     """Connect to Salesforce"""
@@ -34,128 +40,134 @@ def connect_to_salesforce():
 
 def load_duplicates(filename='phase3_duplicates.json'):
     """Load duplicate detection results"""
-    with open(filename, 'r') as f:
-        data = json.load(f)
+    with open(filename, 'rb') as f:
+        data = orjson.loads(f.read())
     print(f"[OK] Loaded duplicates from {filename}")
     return data
 
 
 def load_contacts(filename='phase1_extraction.json'):
     """Load contact data"""
-    with open(filename, 'r') as f:
-        data = json.load(f)
+    with open(filename, 'rb') as f:
+        data = orjson.loads(f.read())
     return {c['Id']: c for c in data['contacts']}
 
 
-def determine_canonical_name(contact1, contact2):
-    """
-    Determine the canonical/best name for the duplicate group
-    Strategy: Pick the more complete name (prefer longer, more formal version)
-
-    Returns: canonical name string
-    """
-    name1 = f"{contact1.get('FirstName', '')} {contact1.get('LastName', '')}".strip()
-    name2 = f"{contact2.get('FirstName', '')} {contact2.get('LastName', '')}".strip()
-
-    # Score each name
-    score1 = 0
-    score2 = 0
-
-    # Prefer longer names (e.g., "Benjamin" over "Ben")
-    score1 += len(name1)
-    score2 += len(name2)
-
-    # Prefer names with more data completeness
-    if contact1.get('Phone'): score1 += 10
-    if contact2.get('Phone'): score2 += 10
+# Name and completeness flags read once per contact, shared by every pair it's in
+ContactMeta = namedtuple('ContactMeta', 'name has_phone has_mobile has_title is_bounced')
 
-    if contact1.get('Title'): score1 += 10
-    if contact2.get('Title'): score2 += 10
 
-    # Return the name with higher score
-    return name1 if score1 >= score2 else name2
-
-
-def generate_justification(contact, other_contact, is_suggested_delete):
-    """Generate a narrative justification explaining why this is likely a duplicate"""
-
-    # Extract names for comparison
-    name1 = f"{contact.get('FirstName', '')} {contact.get('LastName', '')}".strip()
-    name2 = f"{other_contact.get('FirstName', '')} {other_contact.get('LastName', '')}".strip()
+def full_name(contact):
+    """First and last name of a contact"""
+    return f"{contact.get('FirstName', '')} {contact.get('LastName', '')}".strip()
 
-    # Check data completeness
-    has_phone = bool(contact.get('Phone'))
-    has_title = bool(contact.get('Title'))
-    is_bounced = bool(contact.get('EmailBouncedReason'))
 
-    other_has_phone = bool(other_contact.get('Phone'))
-    other_has_title = bool(other_contact.get('Title'))
+def contact_meta(contact):
+    """Name and data-completeness flags of a contact"""
+    return ContactMeta(
+        full_name(contact),
+        bool(contact.get('Phone')),
+        bool(contact.get('MobilePhone')),
+        bool(contact.get('Title')),
+        bool(contact.get('EmailBouncedReason'))
+    )
 
-    # Build narrative justification
-    if is_suggested_delete:
-        # Explain why THIS record should be deleted
-        parts = []
 
-        # Name analysis
-        if name1 != name2:
-            if name1.lower() == name2.lower():
-                parts.append(f"Name capitalization differs from '{name2}'")
-            else:
-                parts.append(f"Likely typo/variant of '{name2}'")
-
-        # Data completeness
-        missing = []
-        if not has_phone and other_has_phone:
-            missing.append("phone")
-        if not has_title and other_has_title:
-            missing.append("title")
+def completeness_score(meta):
+    """Data completeness of a contact: phone, mobile and title count, a bounced email costs 2"""
+    return meta.has_phone + meta.has_mobile + meta.has_title - 2 * meta.is_bounced
 
-        if missing:
-            parts.append(f"missing {' and '.join(missing)}")
 
-        # Email issues
-        if is_bounced:
-            parts.append("email bounced")
+def determine_canonical_name(meta1, meta2):
+    """
+    Determine the canonical/best name for the duplicate group
+    Strategy: Pick the more complete name (prefer longer, more formal version)
 
-        if not parts:
-            parts.append("less complete than other record")
+    Returns: canonical name string
+    """
+    # Prefer longer names (e.g., "Benjamin" over "Ben"), then data completeness
+    score1 = len(meta1.name) + 10 * meta1.has_phone + 10 * meta1.has_title
+    score2 = len(meta2.name) + 10 * meta2.has_phone + 10 * meta2.has_title
 
-        justification = "; ".join(parts).capitalize()
+    # Return the name with higher score
+    return meta1.name if score1 >= score2 else meta2.name
+
+
+def _delete_reasons(flags):
+    """Completeness reasons to delete a record: bit 0 missing phone, bit 1 missing title, bit 2 bounced"""
+    missing = [field for bit, field in ((1, "phone"), (2, "title")) if flags & bit]
+    parts = []
+    if missing:
+        parts.append(f"missing {' and '.join(missing)}")
+    if flags & 4:
+        parts.append("email bounced")
+    return "; ".join(parts)
+
+
+def _keep_justification(flags):
+    """Reasons to keep a record: bit 0 phone, bit 1 title, bit 2 longer name, bit 3 valid email"""
+    has_data = [field for bit, field in ((1, "phone"), (2, "title")) if flags & bit]
+    parts = []
+    if has_data:
+        parts.append(f"Has {' and '.join(has_data)}")
+    if flags & 4:
+        parts.append("more complete name")
+    if flags & 8:
+        parts.append("valid email")
+    return "; ".join(parts) or "More complete record"
+
+
+# Every justification that doesn't quote the other contact's name, indexed by status flags
+DELETE_REASONS = tuple(_delete_reasons(flags) for flags in range(8))
+DELETE_JUSTIFICATIONS = tuple(
+    (reasons or "less complete than other record").capitalize() for reasons in DELETE_REASONS
+)
+KEEP_JUSTIFICATIONS = tuple(_keep_justification(flags) for flags in range(16))
+
+
+def generate_justification(meta, other_meta, is_suggested_delete):
+    """Generate a narrative justification explaining why this is likely a duplicate"""
+    name1, has_phone, _, has_title, is_bounced = meta
+    name2, other_has_phone, _, other_has_title, _ = other_meta
 
-    else:
+    if not is_suggested_delete:
         # Explain why THIS record should be KEPT
-        parts = []
+        flags = has_phone | has_title << 1 | (len(name1) > len(name2)) << 2 | (not is_bounced) << 3
+        return KEEP_JUSTIFICATIONS[flags][:255]  # Truncate to field limit
 
-        # Data completeness
-        has_data = []
-        if has_phone:
-            has_data.append("phone")
-        if has_title:
-            has_data.append("title")
+    # Explain why THIS record should be deleted
+    flags = (other_has_phone and not has_phone) | (other_has_title and not has_title) << 1 | is_bounced << 2
+    if name1 == name2:
+        return DELETE_JUSTIFICATIONS[flags][:255]
 
-        if has_data:
-            parts.append(f"Has {' and '.join(has_data)}")
-
-        # Name quality
-        if name1 != name2 and len(name1) > len(name2):
-            parts.append("more complete name")
-
-        # Email quality
-        if not is_bounced:
-            parts.append("valid email")
-
-        if not parts:
-            parts.append("More complete record")
-
-        justification = "; ".join(parts)
+    # Name analysis quotes the other name, so only this part is built per pair
+    if name1.lower() == name2.lower():
+        justification = f"Name capitalization differs from '{name2}'"
+    else:
+        justification = f"Likely typo/variant of '{name2}'"
+    if DELETE_REASONS[flags]:
+        justification = f"{justification}; {DELETE_REASONS[flags]}"
 
-    return justification[:255]  # Truncate to field limit
+    return justification.capitalize()[:255]
 
 
 def prepare_duplicate_updates(duplicates_data, contacts_dict):
     """Prepare update payloads to mark BOTH contacts in duplicate pairs"""
     updates = []
     decisions = []
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    # Name and completeness flags of every contact that appears in a pair
+    pair_ids = {
+        contact_id
+        for data in duplicates_data['duplicates_by_account'].values()
+        for pair in data['duplicates']
+        for contact_id in (pair['contact_id_1'], pair['contact_id_2'])
+    }
+    metas = {
+        contact_id: contact_meta(contacts_dict[contact_id])
+        for contact_id in pair_ids if contacts_dict.get(contact_id)
+    }
 
     for account_id, data in duplicates_data['duplicates_by_account'].items():
         account_name = data['account_name']
@@ -171,28 +183,20 @@ def prepare_duplicate_updates(duplicates_data, contacts_dict):
                 print(f"[WARNING] Could not find contacts for pair: {contact_id_1}, {contact_id_2}")
                 continue
 
+            meta1 = metas[contact_id_1]
+            meta2 = metas[contact_id_2]
+            name1 = meta1.name
+            name2 = meta2.name
+
             # Determine canonical name for the group
-            canonical_name = determine_canonical_name(contact1, contact2)
+            canonical_name = determine_canonical_name(meta1, meta2)
 
             # Score contacts to determine which to suggest deleting
-            score1 = 0
-            score2 = 0
-
-            # Data completeness scoring
-            if contact1.get('Phone'): score1 += 1
-            if contact2.get('Phone'): score2 += 1
-            if contact1.get('MobilePhone'): score1 += 1
-            if contact2.get('MobilePhone'): score2 += 1
-            if contact1.get('Title'): score1 += 1
-            if contact2.get('Title'): score2 += 1
-
-            # Email bounce penalty
-            if contact1.get('EmailBouncedReason'): score1 -= 2
-            if contact2.get('EmailBouncedReason'): score2 -= 2
+            # (data completeness and email bounce penalty)
+            score1 = completeness_score(meta1)
+            score2 = completeness_score(meta2)
 
             # Name length (prefer longer/more formal)
-            name1 = f"{contact1.get('FirstName', '')} {contact1.get('LastName', '')}".strip()
-            name2 = f"{contact2.get('FirstName', '')} {contact2.get('LastName', '')}".strip()
             if len(name1) > len(name2): score1 += 1
             elif len(name2) > len(name1): score2 += 1
 
@@ -212,11 +216,11 @@ def prepare_duplicate_updates(duplicates_data, contacts_dict):
 
             # Generate justifications
             justification_1 = generate_justification(
-                contact1, contact2,
+                meta1, meta2,
                 is_suggested_delete=(suggested_action_1 == "Delete")
             )
             justification_2 = generate_justification(
-                contact2, contact1,
+                meta2, meta1,
                 is_suggested_delete=(suggested_action_2 == "Delete")
             )
 
@@ -224,7 +228,7 @@ def prepare_duplicate_updates(duplicates_data, contacts_dict):
             update_payload_1 = {
                 'Id': contact_id_1,
                 'Email_Status__c': 'Duplicate',
-                'email_last_updated_date__c': datetime.now().strftime('%Y-%m-%d'),
+                'email_last_updated_date__c': today,
                 'Duplicate_Group_Name__c': canonical_name,
                 'Duplicate_Justification__c': justification_1,
                 'Suggested_Action__c': suggested_action_1,
@@ -234,7 +238,7 @@ def prepare_duplicate_updates(duplicates_data, contacts_dict):
             update_payload_2 = {
                 'Id': contact_id_2,
                 'Email_Status__c': 'Duplicate',
-                'email_last_updated_date__c': datetime.now().strftime('%Y-%m-%d'),
+                'email_last_updated_date__c': today,
                 'Duplicate_Group_Name__c': canonical_name,
                 'Duplicate_Justification__c': justification_2,
                 'Suggested_Action__c': suggested_action_2,
@@ -245,9 +249,6 @@ def prepare_duplicate_updates(duplicates_data, contacts_dict):
             updates.append(update_payload_2)
 
             # Track decision
-            name1 = f"{contact1.get('FirstName', '')} {contact1.get('LastName', '')}".strip()
-            name2 = f"{contact2.get('FirstName', '')} {contact2.get('LastName', '')}".strip()
-
             decisions.append({
                 'account': account_name,
                 'confidence': pair['confidence'],
@@ -276,7 +277,7 @@ def prepare_duplicate_updates(duplicates_data, contacts_dict):
     return updates, decisions
 
 
-def batch_update_contacts(sf, updates):
+def batch_update_contacts(sf, updates, batch_size=UPDATE_BATCH_SIZE):
     """Update contacts in batches"""
     if not updates:
         print("[INFO] No updates needed")
@@ -287,22 +288,37 @@ def batch_update_contacts(sf, updates):
     success_count = 0
     errors = []
 
-    try:
-        results = sf.bulk.Contact.update(updates)
+    def update_batch(i):
+        # Failures are returned so one batch can't stop the rest
+        try:
+            return sf.bulk.Contact.update(updates[i:i + batch_size]), None
+        except Exception as e:
+            return None, e
+
+    # Submit batches as separate bulk jobs, several at a time
+    starts = range(0, len(updates), batch_size)
+    with ThreadPoolExecutor(max_workers=min(UPDATE_WORKERS, len(starts))) as executor:
+        batch_results = list(executor.map(update_batch, starts))
+
+    for i, (results, error) in zip(starts, batch_results):
+        if error is not None:
+            print(f"[ERROR] Batch update failed: {error}")
+            errors.append({
+                'batch': f"{i}-{i+batch_size}",
+                'error': str(error)
+            })
+            continue
 
+        batch = updates[i:i + batch_size]
         for idx, result in enumerate(results):
             if result['success']:
                 success_count += 1
             else:
                 errors.append({
-                    'contact_id': updates[idx]['Id'],
+                    'contact_id': batch[idx]['Id'],
                     'error': result.get('errors', 'Unknown error')
                 })
 
-    except Exception as e:
-        print(f"[ERROR] Batch update failed: {e}")
-        errors.append({'error': str(e)})
-
     print(f"[OK] Successfully marked {success_count} contacts as duplicates")
 
     if errors:
@@ -377,8 +393,8 @@ if __name__ == '__main__':
         'timestamp': datetime.now().isoformat()
     }
 
-    with open('phase4_duplicate_marking.json', 'w') as f:
-        json.dump(result_data, f, indent=2, default=str)
+    with open('phase4_duplicate_marking.json', 'wb') as f:
+        f.write(orjson.dumps(result_data, option=orjson.OPT_INDENT_2))
 
     print("\n[OK] Phase 4 complete!")
     print(f"  Contacts marked as duplicates: {len(updates) - len(errors)}")
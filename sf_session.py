@@ -0,0 +1,85 @@
+"""
+Salesforce session cache shared by the phase scripts and the agent
+Keeps the logged-in session on disk so later runs skip the SOAP login
+"""
+
+import os
+import time
+from functools import partial
+
+import orjson
+from simple_salesforce import Salesforce, SalesforceLogin
+
+SESSION_CACHE_FILE = '.sf_session.json'
+SESSION_CACHE_TTL = 24 * 60 * 60
+
+
+def connect_with_cached_session(username, password, security_token, **salesforce_kwargs):
+    """
+    Salesforce connection for these credentials, reusing the cached session if
+    there is one. A cached session is not checked up front: if it has expired,
+    the first API call gets a 401 and simple_salesforce logs in again (through
+    the login attached here, which also re-caches the new session) and retries.
+
+    Args:
+        salesforce_kwargs: Passed through to Salesforce (e.g. object_pairs_hook)
+
+    Returns:
+        tuple: (Salesforce connection, True if the session came from the cache)
+    """
+    login = partial(_login_and_cache, username, password, security_token)
+
+    cached = _load_session(username)
+    if cached:
+        session_id, instance = cached['session_id'], cached['instance']
+    else:
+        session_id, instance = login()
+
+    sf = Salesforce(instance=instance, session_id=session_id, **salesforce_kwargs)
+    # simple_salesforce only refreshes expired sessions for connections that
+    # carry a login partial, which session_id connections don't get by default
+    sf._salesforce_login_partial = partial(login, session=sf.session)
+    return sf, bool(cached)
+
+
+def _login_and_cache(username, password, security_token, session=None):
+    """SOAP login; returns (session_id, instance) and caches them for later runs"""
+    session_id, instance = SalesforceLogin(
+        username=username,
+        password=password,
+        security_token=security_token,
+        session=session
+    )
+    _save_session(username, session_id, instance)
+    return session_id, instance
+
+
+def _load_session(username):
+    """The cached session for this user, or None if it's missing or past its TTL"""
+    try:
+        with open(SESSION_CACHE_FILE, 'rb') as f:
+            cached = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+
+    if cached.get('username') != username or cached.get('expires', 0) < time.time():
+        return None
+    return cached
+
+
+def _save_session(username, session_id, instance):
+    """Write the session to disk (owner-readable only)"""
+    cached = {
+        'username': username,
+        'instance': instance,
+        'session_id': session_id,
+        'expires': time.time() + SESSION_CACHE_TTL
+    }
+    try:
+        fd = os.open(SESSION_CACHE_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        # The mode above only applies when the file is created
+        os.fchmod(fd, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(orjson.dumps(cached))
+    except OSError as e:
+        print(f"[WARNING] Could not cache Salesforce session: {e}")
@@ -4,8 +4,11 @@ Uses Claude Agent SDK to autonomously process contact deduplication and email va
 Integrated with LangSmith for observability
 """
 
-import json
+import io
 import os
+import orjson
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 from anthropic import Anthropic
@@ -16,6 +19,45 @@ from langsmith_wrapper import save_cost_report, get_cost_summary
 # Load environment variables
 load_dotenv()
 
+# Owners analyzed at once; each owner's Claude calls are I/O-bound and independent
+OWNER_DETECTION_WORKERS = 8
+
+# Report files written at once
+REPORT_WRITE_WORKERS = 8
+
+# Characters in an owner's name that can't appear in a report file name
+_SAFE_NAME_TABLE = str.maketrans(" /", "__")
+
+# Written to the output directory by --plan-only, applied later with --resume
+APPROVAL_MANIFEST_FILE = "approvals_required.json"
+
+# One duplicate pair in an owner's Markdown report
+_PAIR_TEMPLATE = """## Duplicate Pair #{idx} - {confidence} Confidence
+
+**Account:** {account_name}
+**Group Name:** {canonical_name}
+**AI Reasoning:** {reasoning}
+
+| Field | Contact A | Contact B |
+|-------|-----------|-----------|
+| **Name** | {c1[name]} | {c2[name]} |
+| **Email** | {c1[email]} | {c2[email]} |
+| **Phone** | {c1[phone]} | {c2[phone]} |
+| **Title** | {c1[title]} | {c2[title]} |
+| **Justification** | {c1[justification]} | {c2[justification]} |
+| **Suggested Action** | {c1[suggested_action]} | {c2[suggested_action]} |
+| **SFDC ID** | `{c1[id]}` | `{c2[id]}` |
+
+**Next Steps:**
+1. Review both contacts in Salesforce
+2. Verify the suggested action is correct
+3. Update `Suggested_Action__c` field if needed
+4. Check `Duplicate_Reviewed__c` checkbox to mark as reviewed
+
+---
+
+"""
+
 
 class SFDCDeduplicationAgent:
     """
@@ -23,16 +65,19 @@ class SFDCDeduplicationAgent:
     Processes contacts grouped by Account Owner for distributed review.
     """
 
-    def __init__(self, batch_size=None, output_dir="reports", auto_approve=False):
+    def __init__(self, batch_size=None, output_dir="reports", auto_approve=False, plan_only=False):
         self.claude_client = Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
         self.sf_connection = None
         self.batch_size = batch_size
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         self.auto_approve = auto_approve
+        self.plan_only = plan_only
 
         # Progress tracking
-        self.checkpoint_file = self.output_dir / "agent_checkpoint.json"
+        # One JSON line per completed phase; the first phase of a run starts a fresh file
+        self.checkpoint_file = self.output_dir / "agent_checkpoint.jsonl"
+        self._checkpoint_started = False
         self.metrics = {
             "start_time": None,
             "end_time": None,
@@ -68,12 +113,16 @@ class SFDCDeduplicationAgent:
 
             # PHASE 2: Extract Contacts (grouped by Account Owner)
             print("\n[PHASE 2] Extracting contacts grouped by Account Owner...")
+            # Email Task queries for Phase 3 start as soon as each page of contact IDs arrives
+            activity_fetcher = agent_tools.EmailActivityFetcher(self.sf_connection)
             extraction_result = agent_tools.extract_contacts(
                 self.sf_connection,
-                batch_size=self.batch_size
+                batch_size=self.batch_size,
+                on_contact_ids=activity_fetcher.add
             )
 
             if extraction_result["status"] != "success":
+                activity_fetcher.cancel()
                 print(f"[ERROR] {extraction_result['message']}")
                 return
 
@@ -92,8 +141,8 @@ class SFDCDeduplicationAgent:
             # PHASE 3: Email Validation
             print("\n[PHASE 3] Validating email addresses...")
 
-            contact_ids = [c['Id'] for c in extraction_result['all_contacts']]
-            activities = agent_tools.extract_email_activities(self.sf_connection, contact_ids)
+            contacts_dict = {c['Id']: c for c in extraction_result['all_contacts']}
+            activities = activity_fetcher.result()
 
             validation_result = agent_tools.validate_emails(
                 extraction_result['all_contacts'],
@@ -117,27 +166,44 @@ class SFDCDeduplicationAgent:
             all_duplicate_pairs = []
             duplicates_by_owner = {}
 
-            for owner_id, owner_contacts in extraction_result["contacts_by_owner"].items():
-                owner_name = extraction_result["owner_metadata"][owner_id]["owner_name"]
-
-                print(f"  Analyzing {owner_name} ({len(owner_contacts)} contacts)...")
-
-                dup_result = agent_tools.detect_duplicates_for_owner(
-                    owner_id,
-                    owner_contacts,
-                    self.claude_client
-                )
-
+            contacts_by_owner = extraction_result["contacts_by_owner"]
+            owner_names = {
+                owner_id: extraction_result["owner_metadata"][owner_id]["owner_name"]
+                for owner_id in contacts_by_owner
+            }
+            dup_results = {}
+
+            with ThreadPoolExecutor(max_workers=max(1, min(OWNER_DETECTION_WORKERS, len(contacts_by_owner)))) as pool:
+                futures = {}
+                for owner_id, owner_contacts in contacts_by_owner.items():
+                    print(f"  Analyzing {owner_names[owner_id]} ({len(owner_contacts)} contacts)...")
+                    future = pool.submit(
+                        agent_tools.detect_duplicates_for_owner,
+                        owner_id,
+                        owner_contacts,
+                        self.claude_client
+                    )
+                    futures[future] = owner_id
+
+                for future in as_completed(futures):
+                    owner_id = futures[future]
+                    dup_results[owner_id] = future.result()
+
+                    if dup_results[owner_id]["total_pairs"] > 0:
+                        print(f"    -> {owner_names[owner_id]}: found {dup_results[owner_id]['total_pairs']} duplicate pair(s)")
+                    else:
+                        print(f"    -> {owner_names[owner_id]}: no duplicates found")
+
+            # Collect in owner order so reports don't depend on completion order
+            for owner_id in contacts_by_owner:
+                dup_result = dup_results[owner_id]
                 if dup_result["total_pairs"] > 0:
-                    print(f"    -> Found {dup_result['total_pairs']} duplicate pair(s)")
                     all_duplicate_pairs.extend(dup_result["duplicate_pairs"])
 
                     duplicates_by_owner[owner_id] = {
-                        "owner_name": owner_name,
+                        "owner_name": owner_names[owner_id],
                         "duplicate_pairs": dup_result["duplicate_pairs"]
                     }
-                else:
-                    print(f"    -> No duplicates found")
 
             print(f"\n[OK] Total duplicate pairs found: {len(all_duplicate_pairs)}")
             self.metrics["duplicates_found"] = len(all_duplicate_pairs)
@@ -149,11 +215,10 @@ class SFDCDeduplicationAgent:
             })
 
             # PHASE 5: Mark Duplicates for Review
+            marking_result = None
             if len(all_duplicate_pairs) > 0:
                 print("\n[PHASE 5] Preparing duplicate marking...")
 
-                contacts_dict = {c['Id']: c for c in extraction_result['all_contacts']}
-
                 marking_result = agent_tools.mark_duplicates_for_review(
                     all_duplicate_pairs,
                     contacts_dict
@@ -180,103 +245,219 @@ class SFDCDeduplicationAgent:
                     sample_decision = marking_result['decisions'][0]
                     self._print_duplicate_decision(sample_decision)
 
-                if self.auto_approve:
-                    proceed = 'yes'
-                    print("\n[AUTO-APPROVE] Proceeding with duplicate marking...")
-                else:
-                    proceed = input("\nProceed with marking duplicates in Salesforce? (yes/no): ").strip().lower()
-
-                    if proceed != 'yes':
-                        print("[INFO] Duplicate marking cancelled by user")
-                        print("[INFO] Agent stopped. No changes made to Salesforce.")
-                        return
-
-                # Combine email validation + duplicate marking updates
-                all_updates = validation_result['updates'] + marking_result['updates']
+                # Combine email validation + duplicate marking updates (one payload per contact)
+                all_updates = agent_tools.merge_updates_by_id(
+                    validation_result['updates'],
+                    marking_result['updates']
+                )
 
             else:
                 print("\n[PHASE 5] No duplicates to mark")
                 all_updates = validation_result['updates']
 
-            # PHASE 6: Update Salesforce
-            if len(all_updates) > 0:
-                print("\n[PHASE 6] Updating Salesforce...")
-                print(f"\nTotal updates to perform: {len(all_updates)}")
-
-                print("\n" + "=" * 70)
-                print("FINAL APPROVAL REQUIRED")
-                print("=" * 70)
-                print(f"\nReady to update {len(all_updates)} contacts in Salesforce.")
+            if self.plan_only:
+                self._write_approval_manifest(
+                    extraction_result["owner_metadata"],
+                    validation_result["stats"],
+                    duplicates_by_owner,
+                    marking_result,
+                    all_updates
+                )
+                return
 
-                if self.auto_approve:
-                    proceed = 'yes'
-                    print("\n[AUTO-APPROVE] Proceeding with Salesforce update...")
-                else:
-                    proceed = input("\nProceed with Salesforce update? (yes/no): ").strip().lower()
+            # Diff the planned updates against Salesforce while the operator reviews them
+            prefetch = ThreadPoolExecutor(max_workers=1)
+            changed_updates = prefetch.submit(agent_tools.filter_changed_updates, self.sf_connection, all_updates)
+            prefetch.shutdown(wait=False)
 
-                    if proceed != 'yes':
-                        print("[INFO] Salesforce update cancelled by user")
-                        print("[INFO] Agent stopped. No changes made to Salesforce.")
-                        return
+            if marking_result and not self._approve(
+                "Proceed with marking duplicates in Salesforce?",
+                "duplicate marking"
+            ):
+                return
 
-                update_result = agent_tools.update_salesforce_contacts(
-                    self.sf_connection,
-                    all_updates
-                )
+            self._update_and_report(
+                all_updates,
+                changed_updates.result(),
+                extraction_result["owner_metadata"],
+                validation_result["stats"],
+                duplicates_by_owner,
+                marking_result
+            )
 
-                print(f"\n[OK] Salesforce update complete:")
-                print(f"     - Success: {update_result['success_count']}")
-                print(f"     - Errors: {update_result['error_count']}")
+        except Exception as e:
+            print(f"\n[ERROR] Agent failed: {str(e)}")
+            self.metrics["errors"].append(str(e))
+            raise
 
-                self.metrics["sfdc_updates"] = update_result["success_count"]
+    def resume(self, manifest_path):
+        """
+        Apply an approved manifest from a --plan-only run: reconnects to
+        Salesforce and picks up at PHASE 6 without re-extracting or re-detecting.
+        """
+        print("=" * 70)
+        print("SFDC CONTACT DEDUPLICATION & EMAIL VALIDATION AGENT (RESUME)")
+        print("=" * 70)
 
-                if update_result["error_count"] > 0:
-                    self.metrics["errors"] = update_result["errors"]
+        self.metrics["start_time"] = datetime.now().isoformat()
 
-            else:
-                print("\n[PHASE 6] No Salesforce updates needed")
+        try:
+            with open(manifest_path, 'rb') as f:
+                manifest = orjson.loads(f.read())
 
-            # PHASE 7: Generate Reports per Owner
-            print("\n[PHASE 7] Generating reports per Account Owner...")
+            print(f"[OK] Loaded approved plan from {manifest_path} (planned {manifest['created_at']})")
+            for key in ("total_contacts", "total_owners", "emails_validated", "duplicates_found"):
+                self.metrics[key] = manifest["metrics"][key]
 
-            if len(all_duplicate_pairs) > 0:
-                self._generate_owner_reports(duplicates_by_owner, contacts_dict, marking_result)
+            print("\n[PHASE 1] Connecting to Salesforce...")
+            sf_result = agent_tools.connect_to_salesforce()
 
-            # Generate master summary
-            self._generate_master_summary(extraction_result, validation_result, marking_result if len(all_duplicate_pairs) > 0 else None)
+            if sf_result["status"] != "success":
+                print(f"[ERROR] {sf_result['message']}")
+                return
 
-            # Final metrics
-            self.metrics["end_time"] = datetime.now().isoformat()
+            self.sf_connection = sf_result["connection"]
+            print(f"[OK] {sf_result['message']}")
 
-            print("\n" + "=" * 70)
-            print("AGENT WORKFLOW COMPLETE")
-            print("=" * 70)
-            print(f"\nSummary:")
-            print(f"  - Contacts processed: {self.metrics['total_contacts']}")
-            print(f"  - Account Owners: {self.metrics['total_owners']}")
-            print(f"  - Emails validated: {self.metrics['emails_validated']}")
-            print(f"  - Duplicates found: {self.metrics['duplicates_found']}")
-            print(f"  - Salesforce updates: {self.metrics['sfdc_updates']}")
-            print(f"\nReports saved to: {self.output_dir}/")
-
-            # Save LangSmith cost report
-            print("\n[LANGSMITH] Saving cost report...")
-            cost_summary = save_cost_report(output_dir=str(self.output_dir))
-            print(f"\nCost Summary:")
-            print(f"  - Total Cost: ${cost_summary['total_cost']}")
-            print(f"  - Total Tokens: {cost_summary['total_tokens']:,}")
-            print(f"  - Runtime: {cost_summary['runtime_seconds']}s")
-            print(f"  - Cost/Minute: ${cost_summary['cost_per_minute']}")
-            print(f"\nCost by Phase:")
-            for phase, stats in cost_summary['calls_by_phase'].items():
-                if stats['count'] > 0:
-                    print(f"  - {phase}: {stats['count']} calls, ${stats['cost']:.4f}, {stats['tokens']} tokens")
+            # The manifest itself is the approval, so no prompts on this path
+            self.auto_approve = True
+            # Manifests written before updates were merged may repeat a contact
+            all_updates = agent_tools.merge_updates_by_id(manifest["updates"])
+            self._update_and_report(
+                all_updates,
+                agent_tools.filter_changed_updates(self.sf_connection, all_updates),
+                manifest["owner_metadata"],
+                manifest["email_validation_stats"],
+                manifest["duplicates_by_owner"],
+                manifest["marking_result"]
+            )
 
         except Exception as e:
             print(f"\n[ERROR] Agent failed: {str(e)}")
             self.metrics["errors"].append(str(e))
             raise
 
+    def _approve(self, question, action):
+        """Ask the operator to confirm an action; returns False if they decline"""
+        if self.auto_approve:
+            print(f"\n[AUTO-APPROVE] Proceeding with {action}...")
+            return True
+
+        proceed = input(f"\n{question} (yes/no): ").strip().lower()
+        if proceed != 'yes':
+            print(f"[INFO] {action.capitalize()} cancelled by user")
+            print("[INFO] Agent stopped. No changes made to Salesforce.")
+            return False
+        return True
+
+    def _write_approval_manifest(self, owner_metadata, email_stats, duplicates_by_owner, marking_result, all_updates):
+        """Save everything PHASE 6 and 7 need so an approved plan can be applied with --resume"""
+        manifest = {
+            "created_at": datetime.now().isoformat(),
+            "metrics": self.metrics,
+            "owner_metadata": owner_metadata,
+            "email_validation_stats": email_stats,
+            "duplicates_by_owner": duplicates_by_owner,
+            # Updates are stored once, at the top level
+            "marking_result": {
+                key: value for key, value in marking_result.items() if key != "updates"
+            } if marking_result else None,
+            "updates": all_updates
+        }
+
+        manifest_file = self.output_dir / APPROVAL_MANIFEST_FILE
+        with open(manifest_file, 'wb') as f:
+            f.write(orjson.dumps(manifest, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str))
+
+        print("\n" + "=" * 70)
+        print("PLAN SAVED FOR REVIEW")
+        print("=" * 70)
+        print(f"\n[OK] {len(all_updates)} planned updates saved to: {manifest_file}")
+        print(f"[INFO] No changes made to Salesforce. After review, apply with:")
+        print(f"       python sfdc_agent.py --resume {manifest_file}")
+
+    def _update_and_report(self, all_updates, changed_updates, owner_metadata, email_stats, duplicates_by_owner, marking_result):
+        """
+        PHASE 6 and 7: apply the approved updates that still change Salesforce,
+        then write the owner reports, master summary and cost report.
+        """
+        # PHASE 6: Update Salesforce
+        if len(all_updates) > 0:
+            # Skip updates a previous run already applied
+            print(f"\n[INFO] {len(changed_updates)} of {len(all_updates)} updates required")
+            all_updates = changed_updates
+
+        if len(all_updates) > 0:
+            print("\n[PHASE 6] Updating Salesforce...")
+            print(f"\nTotal updates to perform: {len(all_updates)}")
+
+            print("\n" + "=" * 70)
+            print("FINAL APPROVAL REQUIRED")
+            print("=" * 70)
+            print(f"\nReady to update {len(all_updates)} contacts in Salesforce.")
+
+            if not self._approve("Proceed with Salesforce update?", "Salesforce update"):
+                return
+
+            update_result = agent_tools.update_salesforce_contacts(
+                self.sf_connection,
+                all_updates
+            )
+
+            print(f"\n[OK] Salesforce update complete:")
+            print(f"     - Success: {update_result['success_count']}")
+            print(f"     - Errors: {update_result['error_count']}")
+
+            self.metrics["sfdc_updates"] = update_result["success_count"]
+
+            if update_result["error_count"] > 0:
+                self.metrics["errors"] = update_result["errors"]
+
+        else:
+            print("\n[PHASE 6] No Salesforce updates needed")
+
+        # PHASE 7: Generate Reports per Owner
+        print("\n[PHASE 7] Generating reports per Account Owner...")
+
+        confidence_counts = None
+        if marking_result:
+            confidence_counts = self._generate_owner_reports(duplicates_by_owner, marking_result)
+
+        # Generate master summary
+        self._generate_master_summary(
+            owner_metadata,
+            email_stats,
+            marking_result,
+            confidence_counts
+        )
+
+        # Final metrics
+        self.metrics["end_time"] = datetime.now().isoformat()
+
+        print("\n" + "=" * 70)
+        print("AGENT WORKFLOW COMPLETE")
+        print("=" * 70)
+        print(f"\nSummary:")
+        print(f"  - Contacts processed: {self.metrics['total_contacts']}")
+        print(f"  - Account Owners: {self.metrics['total_owners']}")
+        print(f"  - Emails validated: {self.metrics['emails_validated']}")
+        print(f"  - Duplicates found: {self.metrics['duplicates_found']}")
+        print(f"  - Salesforce updates: {self.metrics['sfdc_updates']}")
+        print(f"\nReports saved to: {self.output_dir}/")
+
+        # Save LangSmith cost report
+        print("\n[LANGSMITH] Saving cost report...")
+        cost_summary = save_cost_report(output_dir=str(self.output_dir))
+        print(f"\nCost Summary:")
+        print(f"  - Total Cost: ${cost_summary['total_cost']}")
+        print(f"  - Total Tokens: {cost_summary['total_tokens']:,}")
+        print(f"  - Runtime: {cost_summary['runtime_seconds']}s")
+        print(f"  - Cost/Minute: ${cost_summary['cost_per_minute']}")
+        print(f"\nCost by Phase:")
+        for phase, stats in cost_summary['calls_by_phase'].items():
+            if stats['count'] > 0:
+                print(f"  - {phase}: {stats['count']} calls, ${stats['cost']:.4f}, {stats['tokens']} tokens")
+
     def _print_duplicate_decision(self, decision):
         """Print a formatted duplicate decision"""
         print(f"\nAccount: {decision['account_name']}")
@@ -294,93 +475,94 @@ class SFDCDeduplicationAgent:
         print(f"  Suggested Action: {decision['contact_2']['suggested_action']}")
 
     def _save_checkpoint(self, phase, data):
-        """Save checkpoint data"""
+        """Append this phase's checkpoint data as one line"""
         checkpoint = {
             "phase": phase,
             "timestamp": datetime.now().isoformat(),
             "data": data
         }
 
-        with open(self.checkpoint_file, 'w') as f:
-            json.dump(checkpoint, f, indent=2, default=str)
-
-    def _generate_owner_reports(self, duplicates_by_owner, contacts_dict, marking_result):
-        """Generate separate Markdown report for each Account Owner"""
-        for owner_id, owner_data in duplicates_by_owner.items():
-            owner_name = owner_data["owner_name"]
-            safe_name = owner_name.replace(" ", "_").replace("/", "_")
-
-            report_file = self.output_dir / f"{safe_name}_duplicates.md"
-
-            # Generate markdown report
-            report = []
-            report.append(f"# Duplicate Contacts Report - {owner_name}")
-            report.append(f"\nGenerated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            report.append(f"\n**Total Duplicate Pairs: {len(owner_data['duplicate_pairs'])}**")
-            report.append("\n---\n")
-
-            # Find decisions for this owner
-            owner_decisions = [
-                d for d in marking_result['decisions']
-                if any(pair['contact_id_1'] == d['contact_1']['id'] or pair['contact_id_2'] == d['contact_2']['id']
-                       for pair in owner_data['duplicate_pairs'])
-            ]
+        mode = 'ab' if self._checkpoint_started else 'wb'
+        with open(self.checkpoint_file, mode) as f:
+            f.write(orjson.dumps(checkpoint, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE, default=str))
+        self._checkpoint_started = True
 
-            for idx, decision in enumerate(owner_decisions, 1):
-                report.append(f"## Duplicate Pair #{idx} - {decision['confidence'].upper()} Confidence\n")
-                report.append(f"**Account:** {decision['account_name']}")
-                report.append(f"**Group Name:** {decision['canonical_name']}")
-                report.append(f"**AI Reasoning:** {decision['reasoning']}\n")
-
-                report.append("| Field | Contact A | Contact B |")
-                report.append("|-------|-----------|-----------|")
-                report.append(f"| **Name** | {decision['contact_1']['name']} | {decision['contact_2']['name']} |")
-                report.append(f"| **Email** | {decision['contact_1']['email']} | {decision['contact_2']['email']} |")
-                report.append(f"| **Phone** | {decision['contact_1']['phone']} | {decision['contact_2']['phone']} |")
-                report.append(f"| **Title** | {decision['contact_1']['title']} | {decision['contact_2']['title']} |")
-                report.append(f"| **Justification** | {decision['contact_1']['justification']} | {decision['contact_2']['justification']} |")
-                report.append(f"| **Suggested Action** | {decision['contact_1']['suggested_action']} | {decision['contact_2']['suggested_action']} |")
-                report.append(f"| **SFDC ID** | `{decision['contact_1']['id']}` | `{decision['contact_2']['id']}` |\n")
-
-                report.append("**Next Steps:**")
-                report.append("1. Review both contacts in Salesforce")
-                report.append("2. Verify the suggested action is correct")
-                report.append("3. Update `Suggested_Action__c` field if needed")
-                report.append("4. Check `Duplicate_Reviewed__c` checkbox to mark as reviewed")
-                report.append("\n---\n")
-
-            with open(report_file, 'w') as f:
-                f.write('\n'.join(report))
-
-            print(f"  [OK] Generated report for {owner_name}: {report_file}")
-
-    def _generate_master_summary(self, extraction_result, validation_result, marking_result):
+    def _generate_owner_reports(self, duplicates_by_owner, marking_result):
+        """
+        Generate separate Markdown report for each Account Owner.
+        Returns the decisions counted by confidence level for the master summary.
+        """
+        # Group decisions by the owner tag carried from detection, counting
+        # confidence levels in the same pass
+        decisions_by_owner = defaultdict(list)
+        confidence_counts = Counter({"high": 0, "medium": 0, "low": 0})
+        for d in marking_result['decisions']:
+            decisions_by_owner[d['owner_id']].append(d)
+            confidence_counts[d.get("confidence", "low").lower()] += 1
+
+        generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        # Reports are independent files, so overlap their writes
+        with ThreadPoolExecutor(max_workers=max(1, min(REPORT_WRITE_WORKERS, len(duplicates_by_owner)))) as pool:
+            futures = [
+                pool.submit(self._write_owner_report, owner_data, decisions_by_owner[owner_id], generated_at)
+                for owner_id, owner_data in duplicates_by_owner.items()
+            ]
+            for future in futures:
+                owner_name, report_file = future.result()
+                print(f"  [OK] Generated report for {owner_name}: {report_file}")
+
+        return dict(confidence_counts)
+
+    def _write_owner_report(self, owner_data, owner_decisions, generated_at):
+        """Render and write one owner's Markdown report; returns (owner name, report path)"""
+        owner_name = owner_data["owner_name"]
+        safe_name = owner_name.translate(_SAFE_NAME_TABLE)
+
+        report_file = self.output_dir / f"{safe_name}_duplicates.md"
+
+        report = io.StringIO()
+        report.write(f"# Duplicate Contacts Report - {owner_name}\n")
+        report.write(f"\nGenerated: {generated_at}\n")
+        report.write(f"\n**Total Duplicate Pairs: {len(owner_data['duplicate_pairs'])}**\n")
+        report.write("\n---\n\n")
+
+        for idx, decision in enumerate(owner_decisions, 1):
+            report.write(_PAIR_TEMPLATE.format(
+                idx=idx,
+                confidence=decision['confidence'].upper(),
+                account_name=decision['account_name'],
+                canonical_name=decision['canonical_name'],
+                reasoning=decision['reasoning'],
+                c1=decision['contact_1'],
+                c2=decision['contact_2']
+            ))
+
+        # Drop the newline after the last line
+        with open(report_file, 'w') as f:
+            f.write(report.getvalue()[:-1])
+
+        return owner_name, report_file
+
+    def _generate_master_summary(self, owner_metadata, email_stats, marking_result, confidence_counts=None):
         """Generate master summary JSON file"""
         summary = {
             "generated_at": datetime.now().isoformat(),
             "metrics": self.metrics,
-            "account_owners": extraction_result["owner_metadata"],
-            "email_validation_stats": validation_result["stats"],
+            "account_owners": owner_metadata,
+            "email_validation_stats": email_stats,
             "duplicate_detection": {
                 "total_pairs": marking_result["duplicate_groups"] if marking_result else 0,
-                "by_confidence": self._count_by_confidence(marking_result["decisions"]) if marking_result else {}
+                "by_confidence": confidence_counts or {}
             }
         }
 
         summary_file = self.output_dir / "master_summary.json"
-        with open(summary_file, 'w') as f:
-            json.dump(summary, f, indent=2, default=str)
+        with open(summary_file, 'wb') as f:
+            f.write(orjson.dumps(summary, option=orjson.OPT_INDENT_2, default=str))
 
         print(f"  [OK] Generated master summary: {summary_file}")
 
-    def _count_by_confidence(self, decisions):
-        """Count duplicate pairs by confidence level"""
-        counts = {"high": 0, "medium": 0, "low": 0}
-        for decision in decisions:
-            confidence = decision.get("confidence", "low").lower()
-            counts[confidence] = counts.get(confidence, 0) + 1
-        return counts
-
 
 if __name__ == "__main__":
     import argparse
@@ -389,13 +571,19 @@ if __name__ == "__main__":
     parser.add_argument("--batch-size", type=int, help="Limit number of contacts to process (for testing)")
     parser.add_argument("--output-dir", default="reports", help="Directory for output reports")
     parser.add_argument("--auto-approve", action="store_true", help="Auto-approve all checkpoints (non-interactive)")
+    parser.add_argument("--plan-only", action="store_true", help=f"Stop after planning and save {APPROVAL_MANIFEST_FILE} for offline review")
+    parser.add_argument("--resume", metavar="MANIFEST", help="Apply a reviewed manifest from --plan-only, starting at PHASE 6")
 
     args = parser.parse_args()
 
     agent = SFDCDeduplicationAgent(
         batch_size=args.batch_size,
         output_dir=args.output_dir,
-        auto_approve=args.auto_approve
+        auto_approve=args.auto_approve,
+        plan_only=args.plan_only
     )
 
-    agent.run()
+    if args.resume:
+        agent.resume(args.resume)
+    else:
+        agent.run()
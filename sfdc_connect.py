@@ -3,12 +3,12 @@ Salesforce Contact Deduplication POC
 Connects to SFDC and pulls contact data for duplicate detection
 """
 
-from simple_salesforce import Salesforce
-import json
+import orjson
 import csv
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from sf_session import connect_with_cached_session
 
 # Load credentials from .env file
 load_dotenv()
@@ -18,14 +18,13 @@ SF_PASSWORD = os.getenv('SF_PASSWORD')
 SF_SECURITY_TOKEN = os.getenv('SF_SECURITY_TOKEN')
 
 def connect_to_salesforce():
-    """Connect to Salesforce using username/password/token"""
+    """Connect to Salesforce using username/password/token, reusing the cached session from an earlier run"""
     try:
-        sf = Salesforce(
-            username=SF_USERNAME,
-            password=SF_PASSWORD,
-            security_token=SF_SECURITY_TOKEN
-        )
-        print("✓ Connected to Salesforce successfully")
+        sf, cached = connect_with_cached_session(SF_USERNAME, SF_PASSWORD, SF_SECURITY_TOKEN)
+        if cached:
+            print("✓ Connected to Salesforce (cached session)")
+        else:
+            print("✓ Connected to Salesforce successfully")
         return sf
     except Exception as e:
         print(f"✗ Connection failed: {e}")
@@ -46,8 +45,8 @@ def get_contacts(sf):
     """
 
     try:
-        result = sf.query(query)
-        contacts = result['records']
+        # query() stops after the first page; query_all_iter follows nextRecordsUrl
+        contacts = list(sf.query_all_iter(query))
         print(f"✓ Retrieved {len(contacts)} contacts")
         return contacts
     except Exception as e:
@@ -55,29 +54,28 @@ def get_contacts(sf):
         return []
 
 def save_contacts(contacts, format='both'):
-    """Save contacts to JSON and/or CSV"""
+    """Save contacts to JSON Lines and/or CSV, one record at a time"""
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
 
+    # Salesforce metadata fields are dropped as each record is written
+    def clean(contact):
+        return {k: v for k, v in contact.items() if k != 'attributes'}
+
     if format in ['json', 'both']:
-        json_file = f'contacts_{timestamp}.json'
-        with open(json_file, 'w') as f:
-            json.dump(contacts, f, indent=2, default=str)
+        json_file = f'contacts_{timestamp}.jsonl'
+        with open(json_file, 'wb') as f:
+            for c in contacts:
+                f.write(orjson.dumps(clean(c), option=orjson.OPT_APPEND_NEWLINE))
         print(f"✓ Saved to {json_file}")
 
     if format in ['csv', 'both']:
         csv_file = f'contacts_{timestamp}.csv'
         if contacts:
-            # Remove Salesforce metadata fields
-            clean_contacts = []
-            for c in contacts:
-                clean = {k: v for k, v in c.items() if k != 'attributes'}
-                clean_contacts.append(clean)
-
-            keys = clean_contacts[0].keys()
+            keys = clean(contacts[0]).keys()
             with open(csv_file, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.DictWriter(f, fieldnames=keys)
                 writer.writeheader()
-                writer.writerows(clean_contacts)
+                writer.writerows(clean(c) for c in contacts)
             print(f"✓ Saved to {csv_file}")
 
 def preview_contacts(contacts, limit=5):
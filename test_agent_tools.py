@@ -0,0 +1,83 @@
+"""
+Offline tests for the agent's Salesforce update diffing (no org needed)
+Run with: python -m pytest test_agent_tools.py
+"""
+
+import re
+
+from simple_salesforce.exceptions import SalesforceMalformedRequest
+
+from agent import tools
+
+# Salesforce rejects REST URIs longer than about 16 KB
+SALESFORCE_URI_LIMIT = 16 * 1024
+
+
+class FakeSalesforce:
+    """In-memory Contact table answering the diff queries and applying updates"""
+
+    def __init__(self, contacts):
+        self.contacts = {contact['Id']: dict(contact) for contact in contacts}
+        self.queries = []
+
+    def query_all_iter(self, query):
+        self.queries.append(query)
+        if len(query) > SALESFORCE_URI_LIMIT:
+            raise SalesforceMalformedRequest("URI too long")
+        fields = [field.strip() for field in re.search(r"SELECT (.*) FROM", query).group(1).split(',')]
+        ids = re.findall(r"'(\w+)'", query)
+        for contact_id in ids:
+            if contact_id in self.contacts:
+                yield {field: self.contacts[contact_id].get(field) for field in fields}
+
+    def apply(self, updates):
+        for update in updates:
+            self.contacts[update['Id']].update(update)
+
+
+def _contact_id(n):
+    return f"003{n:015d}"
+
+
+def _plan(contact_ids, duplicate_ids):
+    """Validation updates for every contact plus marking updates for the duplicates"""
+    validation = [
+        {'Id': contact_id, 'Email_Status__c': 'Valid', 'email_last_updated_date__c': '2026-01-01'}
+        for contact_id in contact_ids
+    ]
+    marking = [
+        {'Id': contact_id, 'Email_Status__c': 'Duplicate', 'Duplicate_Group_Name__c': 'Jane Doe'}
+        for contact_id in duplicate_ids
+    ]
+    return tools.merge_updates_by_id(validation, marking)
+
+
+def test_merge_keeps_one_payload_per_contact_with_marking_winning():
+    updates = _plan([_contact_id(1), _contact_id(2)], [_contact_id(2)])
+
+    assert [update['Id'] for update in updates] == [_contact_id(1), _contact_id(2)]
+    assert updates[1]['Email_Status__c'] == 'Duplicate'
+    assert updates[1]['email_last_updated_date__c'] == '2026-01-01'
+
+
+def test_second_run_sends_nothing():
+    contact_ids = [_contact_id(n) for n in range(1000)]
+    sf = FakeSalesforce({'Id': contact_id} for contact_id in contact_ids)
+
+    first = tools.filter_changed_updates(sf, _plan(contact_ids, contact_ids[::3]))
+    assert len(first) == len(contact_ids)
+    sf.apply(first)
+
+    assert tools.filter_changed_updates(sf, _plan(contact_ids, contact_ids[::3])) == []
+    assert all(len(query) <= SALESFORCE_URI_LIMIT for query in sf.queries)
+
+
+def test_retry_sends_only_the_remainder():
+    contact_ids = [_contact_id(n) for n in range(10)]
+    sf = FakeSalesforce({'Id': contact_id} for contact_id in contact_ids)
+
+    planned = _plan(contact_ids, contact_ids[:2])
+    sf.apply(planned[:6])
+
+    remaining = tools.filter_changed_updates(sf, planned)
+    assert [update['Id'] for update in remaining] == contact_ids[6:]
@@ -3,45 +3,72 @@ Quick test script for SFDC Deduplication Agent API
 Run this after starting the server to verify all endpoints work
 """
 
-import requests
+import asyncio
+import atexit
+import httpx
+import orjson
 import time
-import json
 
 BASE_URL = "http://localhost:8000"
 
+# One keep-alive connection for every request in the suite
+client = httpx.Client(base_url=BASE_URL, timeout=30.0)
+atexit.register(client.close)
 
-def test_health():
+# Read-only endpoints, fetched concurrently before their checks run
+READONLY_PATHS = ("/", "/health", "/docs", "/api/dashboard")
+
+# Job status polling: backoff from POLL_INITIAL_WAIT up to POLL_MAX_WAIT, for POLL_TIMEOUT seconds
+POLL_INITIAL_WAIT = 0.1
+POLL_MAX_WAIT = 2.0
+POLL_TIMEOUT = 10.0
+
+
+def pretty(data):
+    """Indented JSON for printing"""
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
+
+
+async def _fetch_readonly():
+    """GET every read-only endpoint at once; returns {path: response}"""
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=30.0) as async_client:
+        responses = await asyncio.gather(*(async_client.get(path) for path in READONLY_PATHS))
+    return dict(zip(READONLY_PATHS, responses))
+
+
+def test_health(response=None):
     """Test health check endpoint"""
     print("\n🔍 Testing /health endpoint...")
-    response = requests.get(f"{BASE_URL}/health")
+    response = response or client.get("/health")
 
     print(f"Status Code: {response.status_code}")
-    print(f"Response: {json.dumps(response.json(), indent=2)}")
+    data = orjson.loads(response.content)
+    print(f"Response: {pretty(data)}")
 
     assert response.status_code == 200
-    assert response.json()["status"] in ["healthy", "degraded"]
+    assert data["status"] in ["healthy", "degraded"]
     print("✅ Health check passed")
 
 
-def test_root():
+def test_root(response=None):
     """Test root endpoint"""
     print("\n🔍 Testing / endpoint...")
-    response = requests.get(f"{BASE_URL}/")
+    response = response or client.get("/")
 
     print(f"Status Code: {response.status_code}")
-    print(f"Response: {json.dumps(response.json(), indent=2)}")
+    print(f"Response: {pretty(orjson.loads(response.content))}")
 
     assert response.status_code == 200
     print("✅ Root endpoint passed")
 
 
-def test_dashboard():
+def test_dashboard(response=None):
     """Test dashboard metrics endpoint"""
     print("\n🔍 Testing /api/dashboard endpoint...")
-    response = requests.get(f"{BASE_URL}/api/dashboard")
+    response = response or client.get("/api/dashboard")
 
     print(f"Status Code: {response.status_code}")
-    print(f"Response: {json.dumps(response.json(), indent=2)}")
+    print(f"Response: {pretty(orjson.loads(response.content))}")
 
     assert response.status_code == 200
     print("✅ Dashboard endpoint passed")
@@ -56,17 +83,18 @@ def test_start_job():
         "auto_approve": True  # Skip human-in-the-loop for test
     }
 
-    response = requests.post(
-        f"{BASE_URL}/api/dedup/start",
+    response = client.post(
+        "/api/dedup/start",
         json=payload
     )
 
     print(f"Status Code: {response.status_code}")
-    print(f"Response: {json.dumps(response.json(), indent=2)}")
+    data = orjson.loads(response.content)
+    print(f"Response: {pretty(data)}")
 
     assert response.status_code == 200
 
-    job_id = response.json()["job_id"]
+    job_id = data["job_id"]
     print(f"✅ Job started with ID: {job_id}")
 
     return job_id
@@ -76,13 +104,17 @@ def test_job_status(job_id):
     """Test getting job status"""
     print(f"\n🔍 Testing GET /api/dedup/status/{job_id} endpoint...")
 
-    # Poll for a few seconds
-    for i in range(5):
-        response = requests.get(f"{BASE_URL}/api/dedup/status/{job_id}")
+    # Poll for a few seconds, quickly at first
+    deadline = time.monotonic() + POLL_TIMEOUT
+    wait = POLL_INITIAL_WAIT
+    attempt = 0
+    while True:
+        attempt += 1
+        response = client.get(f"/api/dedup/status/{job_id}")
 
-        print(f"\nAttempt {i+1}/5:")
+        print(f"\nAttempt {attempt}:")
         print(f"Status Code: {response.status_code}")
-        data = response.json()
+        data = orjson.loads(response.content)
         print(f"Job Status: {data['status']}")
         print(f"Progress: {data['progress']['message']}")
 
@@ -92,31 +124,35 @@ def test_job_status(job_id):
             print(f"✅ Job {data['status']}")
             break
 
-        time.sleep(2)
+        if time.monotonic() + wait > deadline:
+            break
+
+        time.sleep(wait)
+        wait = min(wait * 1.5, POLL_MAX_WAIT)
 
 
 def test_list_jobs():
     """Test listing all jobs"""
     print("\n🔍 Testing GET /api/dedup/jobs endpoint...")
 
-    response = requests.get(f"{BASE_URL}/api/dedup/jobs")
+    response = client.get("/api/dedup/jobs")
 
     print(f"Status Code: {response.status_code}")
-    data = response.json()
+    data = orjson.loads(response.content)
     print(f"Total Jobs: {len(data['jobs'])}")
 
     if data['jobs']:
-        print(f"First Job: {json.dumps(data['jobs'][0], indent=2)}")
+        print(f"First Job: {pretty(data['jobs'][0])}")
 
     assert response.status_code == 200
     print("✅ List jobs passed")
 
 
-def test_docs():
+def test_docs(response=None):
     """Test OpenAPI docs"""
     print("\n🔍 Testing /docs endpoint...")
 
-    response = requests.get(f"{BASE_URL}/docs")
+    response = response or client.get("/docs")
 
     print(f"Status Code: {response.status_code}")
     assert response.status_code == 200
@@ -131,10 +167,11 @@ def run_all_tests():
 
     try:
         # Basic endpoints
-        test_root()
-        test_health()
-        test_docs()
-        test_dashboard()
+        responses = asyncio.run(_fetch_readonly())
+        test_root(responses["/"])
+        test_health(responses["/health"])
+        test_docs(responses["/docs"])
+        test_dashboard(responses["/api/dashboard"])
 
         # Job management
         job_id = test_start_job()
@@ -147,7 +184,7 @@ def run_all_tests():
         print("\nYour API is ready for deployment! 🚀")
         print(f"\nAPI Documentation: {BASE_URL}/docs")
 
-    except requests.exceptions.ConnectionError:
+    except httpx.ConnectError:
         print("\n❌ ERROR: Could not connect to API")
         print(f"\nMake sure the server is running:")
         print("  python main.py")
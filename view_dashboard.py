@@ -3,33 +3,13 @@ LangSmith Cost Dashboard Generator
 Creates an interactive HTML dashboard showing cost tracking, performance metrics, and QA validation
 """
 
-import json
+import io
+import orjson
 from pathlib import Path
 from datetime import datetime
 
-
-def generate_dashboard(reports_dir="reports"):
-    """Generate HTML dashboard from cost and master summary reports"""
-
-    reports_path = Path(reports_dir)
-    cost_report_file = reports_path / "cost_report.json"
-    master_summary_file = reports_path / "master_summary.json"
-
-    # Load reports
-    if not cost_report_file.exists():
-        print(f"[ERROR] Cost report not found: {cost_report_file}")
-        return
-
-    with open(cost_report_file, 'r') as f:
-        cost_data = json.load(f)
-
-    master_data = {}
-    if master_summary_file.exists():
-        with open(master_summary_file, 'r') as f:
-            master_data = json.load(f)
-
-    # Generate HTML
-    html = f"""
+# Page start through the title: doctype, styles and the opening container
+_HTML_HEAD = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -37,124 +17,183 @@ def generate_dashboard(reports_dir="reports"):
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>SFDC Dedup Agent - LangSmith Dashboard</title>
     <style>
-        body {{
+        body {
             font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
             margin: 0;
             padding: 20px;
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: #333;
-        }}
-        .container {{
+        }
+        .container {
             max-width: 1200px;
             margin: 0 auto;
             background: white;
             border-radius: 12px;
             box-shadow: 0 20px 60px rgba(0,0,0,0.3);
             padding: 30px;
-        }}
-        h1 {{
+        }
+        h1 {
             color: #667eea;
             margin-top: 0;
             border-bottom: 3px solid #667eea;
             padding-bottom: 15px;
-        }}
-        h2 {{
+        }
+        h2 {
             color: #764ba2;
             margin-top: 30px;
             border-left: 4px solid #764ba2;
             padding-left: 15px;
-        }}
-        .stats-grid {{
+        }
+        .stats-grid {
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
             gap: 20px;
             margin: 20px 0;
-        }}
-        .stat-card {{
+        }
+        .stat-card {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
             padding: 25px;
             border-radius: 8px;
             box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-        }}
-        .stat-value {{
+        }
+        .stat-value {
             font-size: 36px;
             font-weight: bold;
             margin: 10px 0;
-        }}
-        .stat-label {{
+        }
+        .stat-label {
             font-size: 14px;
             opacity: 0.9;
             text-transform: uppercase;
             letter-spacing: 1px;
-        }}
-        .phase-breakdown {{
+        }
+        .phase-breakdown {
             background: #f8f9fa;
             padding: 20px;
             border-radius: 8px;
             margin: 20px 0;
-        }}
-        .phase-item {{
+        }
+        .phase-item {
             display: flex;
             justify-content: space-between;
             padding: 12px 0;
             border-bottom: 1px solid #dee2e6;
-        }}
-        .phase-item:last-child {{
+        }
+        .phase-item:last-child {
             border-bottom: none;
-        }}
-        .phase-name {{
+        }
+        .phase-name {
             font-weight: 600;
             color: #495057;
-        }}
-        .phase-stats {{
+        }
+        .phase-stats {
             color: #6c757d;
             font-size: 14px;
-        }}
-        .metric-row {{
+        }
+        .metric-row {
             display: flex;
             justify-content: space-between;
             padding: 10px 0;
             border-bottom: 1px solid #e9ecef;
-        }}
-        .metric-label {{
+        }
+        .metric-label {
             font-weight: 500;
-        }}
-        .metric-value {{
+        }
+        .metric-value {
             color: #667eea;
             font-weight: 600;
-        }}
-        .timestamp {{
+        }
+        .timestamp {
             text-align: right;
             color: #6c757d;
             font-size: 12px;
             margin-top: 20px;
-        }}
-        .badge {{
+        }
+        .badge {
             display: inline-block;
             padding: 4px 12px;
             border-radius: 12px;
             font-size: 12px;
             font-weight: 600;
-        }}
-        .badge-success {{
+        }
+        .badge-success {
             background: #28a745;
             color: white;
-        }}
-        .badge-warning {{
+        }
+        .badge-warning {
             background: #ffc107;
             color: #333;
-        }}
-        .badge-info {{
+        }
+        .badge-info {
             background: #17a2b8;
             color: white;
-        }}
+        }
     </style>
 </head>
 <body>
     <div class="container">
         <h1>🤖 SFDC Deduplication Agent - LangSmith Dashboard</h1>
+"""
+
+_HTML_FOOT = """    </div>
+</body>
+</html>
+"""
+
+# One phase in the "Cost by Phase" breakdown
+_PHASE_ITEM_TEMPLATE = """
+            <div class="phase-item">
+                <div>
+                    <span class="phase-name">{name}</span>
+                    <span class="badge badge-info">{count} calls</span>
+                </div>
+                <div class="phase-stats">
+                    ${cost:.4f} | {tokens:,} tokens
+                </div>
+            </div>
+"""
+
+# One confidence level in the "Duplicate Detection" section
+_CONFIDENCE_ROW_TEMPLATE = """
+            <div class="metric-row">
+                <span class="metric-label">{label} Confidence</span>
+                <span class="metric-value badge {badge_class}">{count}</span>
+            </div>
+"""
+
+# Phase keys like "duplicate_detection" shown as "Duplicate Detection"
+_PHASE_NAME_TABLE = str.maketrans("_", " ")
+
+_CONFIDENCE_BADGES = {
+    'high': 'badge-success',
+    'medium': 'badge-warning',
+    'low': 'badge-info'
+}
 
+
+def generate_dashboard(reports_dir="reports"):
+    """Generate HTML dashboard from cost and master summary reports"""
+
+    reports_path = Path(reports_dir)
+    cost_report_file = reports_path / "cost_report.json"
+    master_summary_file = reports_path / "master_summary.json"
+
+    # Load reports
+    if not cost_report_file.exists():
+        print(f"[ERROR] Cost report not found: {cost_report_file}")
+        return
+
+    cost_data = orjson.loads(cost_report_file.read_bytes())
+
+    master_data = {}
+    if master_summary_file.exists():
+        master_data = orjson.loads(master_summary_file.read_bytes())
+
+    # Generate HTML (built in one buffer, written once)
+    html = io.StringIO()
+    html.write(_HTML_HEAD)
+    html.write(f"""
         <h2>💰 Cost Summary</h2>
         <div class="stats-grid">
             <div class="stat-card">
@@ -189,30 +228,27 @@ def generate_dashboard(reports_dir="reports"):
 
         <h2>🔍 Cost by Phase</h2>
         <div class="phase-breakdown">
-"""
+""")
 
-    for phase, stats in cost_data['calls_by_phase'].items():
-        if stats['count'] > 0:
-            html += f"""
-            <div class="phase-item">
-                <div>
-                    <span class="phase-name">{phase.replace('_', ' ').title()}</span>
-                    <span class="badge badge-info">{stats['count']} calls</span>
-                </div>
-                <div class="phase-stats">
-                    ${stats['cost']:.4f} | {stats['tokens']:,} tokens
-                </div>
-            </div>
-"""
+    html.writelines(
+        _PHASE_ITEM_TEMPLATE.format(
+            name=phase.translate(_PHASE_NAME_TABLE).title(),
+            count=stats['count'],
+            cost=stats['cost'],
+            tokens=stats['tokens']
+        )
+        for phase, stats in cost_data['calls_by_phase'].items()
+        if stats['count'] > 0
+    )
 
-    html += """
+    html.write("""
         </div>
-"""
+""")
 
     # Add workflow metrics if available
     if master_data and 'metrics' in master_data:
         metrics = master_data['metrics']
-        html += f"""
+        html.write(f"""
         <h2>📈 Workflow Metrics</h2>
         <div class="stats-grid">
             <div class="stat-card">
@@ -244,12 +280,12 @@ def generate_dashboard(reports_dir="reports"):
                 <span class="metric-value">{len(metrics.get('errors', []))}</span>
             </div>
         </div>
-"""
+""")
 
     # Add email validation stats if available
     if master_data and 'email_validation_stats' in master_data:
         email_stats = master_data['email_validation_stats']
-        html += f"""
+        html.write(f"""
         <h2>📧 Email Validation Stats</h2>
         <div class="phase-breakdown">
             <div class="metric-row">
@@ -265,53 +301,46 @@ def generate_dashboard(reports_dir="reports"):
                 <span class="metric-value">{email_stats.get('Unknown', 0)}</span>
             </div>
         </div>
-"""
+""")
 
     # Add duplicate detection stats if available
     if master_data and 'duplicate_detection' in master_data:
         dup_stats = master_data['duplicate_detection']
-        html += f"""
+        html.write(f"""
         <h2>🔄 Duplicate Detection</h2>
         <div class="phase-breakdown">
             <div class="metric-row">
                 <span class="metric-label">Total Duplicate Pairs</span>
                 <span class="metric-value">{dup_stats.get('total_pairs', 0)}</span>
             </div>
-"""
+""")
 
         if 'by_confidence' in dup_stats:
-            for confidence, count in dup_stats['by_confidence'].items():
-                badge_class = {
-                    'high': 'badge-success',
-                    'medium': 'badge-warning',
-                    'low': 'badge-info'
-                }.get(confidence, 'badge-info')
-
-                html += f"""
-            <div class="metric-row">
-                <span class="metric-label">{confidence.title()} Confidence</span>
-                <span class="metric-value badge {badge_class}">{count}</span>
-            </div>
-"""
+            html.writelines(
+                _CONFIDENCE_ROW_TEMPLATE.format(
+                    label=confidence.title(),
+                    badge_class=_CONFIDENCE_BADGES.get(confidence, 'badge-info'),
+                    count=count
+                )
+                for confidence, count in dup_stats['by_confidence'].items()
+            )
 
-        html += """
+        html.write("""
         </div>
-"""
+""")
 
-    html += f"""
+    html.write(f"""
         <div class="timestamp">
             Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} |
             Report Timestamp: {cost_data.get('timestamp', 'N/A')}
         </div>
-    </div>
-</body>
-</html>
-"""
+""")
+    html.write(_HTML_FOOT)
 
     # Save dashboard
     dashboard_file = reports_path / "dashboard.html"
     with open(dashboard_file, 'w', encoding='utf-8') as f:
-        f.write(html)
+        f.write(html.getvalue())
 
     print(f"[OK] Dashboard generated: {dashboard_file}")
     print(f"\nOpen this file in your browser to view the dashboard:")
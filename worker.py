@@ -0,0 +1,71 @@
+"""
+Job worker for Redis-backed deployments
+Consumes queued deduplication jobs so they run outside the web process
+(start with `python worker.py`; requires REDIS_URL)
+"""
+
+import asyncio
+import logging
+import os
+import socket
+
+from agent.dedup_agent import close_claude_client
+from main import TERMINAL_STATUSES, RedisJobManager, job_manager, run_agent_job
+
+logger = logging.getLogger("worker")
+
+# Jobs this worker runs at once
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+
+# Names this worker's processing list; must stay the same across restarts
+# so jobs in flight when it stopped are requeued when it comes back
+WORKER_ID = os.getenv("WORKER_ID") or socket.gethostname()
+
+
+async def worker_loop():
+    """Take queued jobs and run them, at most WORKER_CONCURRENCY at a time"""
+    if not isinstance(job_manager, RedisJobManager):
+        raise SystemExit("[ERROR] REDIS_URL must be set to run the job worker")
+
+    # Listen for approval decisions submitted through the API
+    await job_manager.start()
+
+    requeued = await job_manager.requeue_unfinished_jobs(WORKER_ID)
+    if requeued:
+        logger.info(f"Requeued {requeued} job(s) left unfinished by the last run of worker {WORKER_ID}")
+    logger.info(f"Worker {WORKER_ID} started (concurrency {WORKER_CONCURRENCY})")
+
+    slots = asyncio.Semaphore(WORKER_CONCURRENCY)
+    running = set()
+
+    async def run(job_id: str):
+        try:
+            # A requeued job may have finished just before the worker stopped
+            job = await job_manager.get_job(job_id)
+            if job and job.get("status") in TERMINAL_STATUSES:
+                logger.info(f"Skipping job {job_id} (already {job['status']})")
+            else:
+                await run_agent_job(job_id)
+            await job_manager.finish_queued_job(WORKER_ID, job_id)
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            await slots.acquire()
+            job_id = await job_manager.next_queued_job(WORKER_ID, timeout=5)
+            if job_id is None:
+                slots.release()
+                continue
+
+            logger.info(f"Picked up job {job_id}")
+            task = asyncio.create_task(run(job_id))
+            running.add(task)
+            task.add_done_callback(running.discard)
+    finally:
+        await job_manager.stop()
+        await asyncio.to_thread(close_claude_client)
+
+
+if __name__ == "__main__":
+    asyncio.run(worker_loop())